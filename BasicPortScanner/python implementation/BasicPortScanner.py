@@ -1,19 +1,210 @@
+import argparse
+import asyncio
 import socket
+import time
 import concurrent.futures
+from typing import AsyncIterator, Awaitable, Callable, Iterable, List, Optional, Tuple, TypeVar
+
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
+
+#port states reported by the asyncio engine
+OPEN = 'open'
+CLOSED = 'closed'
+FILTERED = 'filtered'
+
+#file descriptors kept free for everything but the probes
+FD_HEADROOM = 64
+
+#marks the end of the results queue of iter_bounded
+_DONE = object()
+
+T = TypeVar('T')
+R = TypeVar('R')
+
+
+def raise_fd_limit(wanted):
+    """raise the soft open file limit so that wanted sockets fit, if the hard limit allows
+
+    Args:
+        wanted (int): number of sockets that should be open at once
+    Return:
+        number of sockets that fit in the resulting limit
+    """
+    if resource is None:
+        return wanted
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    needed = wanted + FD_HEADROOM
+    if soft != resource.RLIM_INFINITY and soft < needed:
+        target = needed if hard == resource.RLIM_INFINITY else min(needed, hard)
+        try:
+            resource.setrlimit(resource.RLIMIT_NOFILE, (target, hard))
+            soft = target
+        except (ValueError, OSError):
+            pass
+    if soft == resource.RLIM_INFINITY:
+        return wanted
+    return max(1, min(wanted, soft - FD_HEADROOM))
+
+
+class RateLimiter:
+    """token bucket that spaces probes to a number per second
+
+    Up to a hundredth of a second worth of probes may go out back to back,
+    so the event loop does not have to wake up for every single probe.
+    """
+
+    def __init__(self, rate):
+        """initialize the limiter
+
+        Args:
+            rate (float): probes allowed per second
+        """
+        self.rate = rate
+        self.capacity = max(1.0, rate / 100)
+        self.tokens = self.capacity
+        self.last = None
+
+    async def acquire(self):
+        """wait until one more probe may be sent"""
+        loop = asyncio.get_running_loop()
+        while True:
+            now = loop.time()
+            if self.last is not None:
+                self.tokens = min(self.capacity, self.tokens + (now - self.last) * self.rate)
+            self.last = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return
+            await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+async def iter_bounded(probe: Callable[[T], Awaitable[R]], items: Iterable[T], concurrency,
+                       limiter: Optional[RateLimiter] = None) -> AsyncIterator[R]:
+    """run probe on every item with a bounded number in flight
+
+    Args:
+        probe : coroutine function called with each item
+        items (Iterable): items to probe, consumed lazily
+        concurrency (int): maximum probes in flight, also capped by the open file limit
+        limiter (RateLimiter, optional): limiter every probe waits for before it starts
+    Yield:
+        results of probe in completion order
+    """
+    semaphore = asyncio.Semaphore(raise_fd_limit(concurrency))
+    results = asyncio.Queue()
+    tasks = set()
+
+    async def run(item):
+        try:
+            results.put_nowait(await probe(item))
+        except Exception as e:
+            results.put_nowait(e)
+        finally:
+            semaphore.release()
+
+    async def produce():
+        try:
+            for item in items:
+                await semaphore.acquire()
+                if limiter is not None:
+                    await limiter.acquire()
+                task = asyncio.create_task(run(item))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+            if tasks:
+                await asyncio.wait(set(tasks))
+            results.put_nowait(_DONE)
+        except Exception as e:
+            results.put_nowait(e)
+
+    producer = asyncio.create_task(produce())
+    try:
+        while True:
+            result = await results.get()
+            if result is _DONE:
+                break
+            if isinstance(result, Exception):
+                raise result
+            yield result
+    finally:
+        #stop probing when the caller stops iterating early
+        producer.cancel()
+        for task in list(tasks):
+            task.cancel()
+        await asyncio.gather(producer,*tasks,return_exceptions=True)
+
+
+class RttEstimator:
+    """smoothed round trip time of one host, used to adapt the connect timeout
+
+    Follows the retransmission timer of RFC 6298: the timeout is the smoothed
+    RTT plus four times its variation, measured from answered probes (both
+    accepted and refused connects). Until the first answer arrives the
+    initial timeout is used, and the adapted timeout never exceeds it, so a
+    host that drops every probe costs one initial timeout per wave of
+    concurrent probes instead of one per port.
+    """
+
+    def __init__(self, initial_timeout=1.0, min_timeout=0.1):
+        """initialize the estimator
+
+        Args:
+            initial_timeout (float, optional): timeout before any RTT is measured, also the upper bound.
+            min_timeout (float, optional): lower bound of the adapted timeout.
+        """
+        self.initial_timeout = initial_timeout
+        self.min_timeout = min_timeout
+        self.srtt: Optional[float] = None
+        self.rttvar = 0.0
+
+    def add(self, rtt):
+        """add a measured round trip time in seconds"""
+        if self.srtt is None:
+            self.srtt = rtt
+            self.rttvar = rtt / 2
+        else:
+            self.rttvar = 0.75 * self.rttvar + 0.25 * abs(self.srtt - rtt)
+            self.srtt = 0.875 * self.srtt + 0.125 * rtt
+
+    @property
+    def timeout(self):
+        """current connect timeout in seconds"""
+        if self.srtt is None:
+            return self.initial_timeout
+        #twice the RTT as well, queueing in a busy event loop inflates every sample alike
+        return min(self.initial_timeout, max(self.min_timeout, 2 * self.srtt, self.srtt + 4 * self.rttvar))
+
 
 class PortScanner:
-    def __init__(self,target_ip,start_port=1,end_port=1024):
+    def __init__(self,target_ip,start_port=1,end_port=1024,timeout=1.0,concurrency=2000,adaptive_timeout=True):
         """initialize port scanner with target IP and port range
 
         Args:
             target_ip : IP address to scan
             start_port (int, optional): starting port number (default=1).
             end_port (int, optional): ending port number (default=1024).
+            timeout (float, optional): connect timeout in seconds, the upper bound when adaptive (default=1.0).
+            concurrency (int, optional): maximum connects in flight in the asyncio engine (default=2000).
+            adaptive_timeout (bool, optional): shrink the timeout to the measured RTT of the host (default=True).
         """
         
         self.target_ip = target_ip
         self.start_port = start_port
         self.end_port = end_port
+        self.timeout = timeout
+        self.concurrency = concurrency
+        self.adaptive_timeout = adaptive_timeout
+        self.rtt = RttEstimator(timeout)
+        self.family = None
+        self.address = None
+        #SynScanner the probes go through instead of connects, if any
+        self.syn_scanner = None
+        #ServiceFingerprinter run on every open connection, if any, and its results by port
+        self.fingerprinter = None
+        self.services = {}
         
     def check_port(self,port):
         """
@@ -26,7 +217,7 @@ class PortScanner:
         """
         try:
             sock = socket.socket(socket.AF_INET,socket.SOCK_STREAM)
-            sock.settimeout(1) #1-second timeout
+            sock.settimeout(self.timeout)
             result = sock.connect_ex((self.target_ip,port))
             sock.close()
             
@@ -35,15 +226,100 @@ class PortScanner:
         except Exception :
             return None
     
-    def scan(self, max_threads=100):
+    async def resolve(self):
+        """resolve the target once, before the first probe"""
+        if self.address is None:
+            loop = asyncio.get_running_loop()
+            infos = await loop.getaddrinfo(self.target_ip,None,type=socket.SOCK_STREAM)
+            self.family, _, _, _, sockaddr = infos[0]
+            self.address = sockaddr[0]
+
+    async def probe(self,port) -> Tuple[int,str]:
+        """
+        check the state of a port with a non-blocking connect, or a SYN if syn_scanner is set
+
+        Args:
+            port : port number to check
+        Return:
+            (port, state), state being OPEN, CLOSED or FILTERED
+        """
+        await self.resolve()
+        loop = asyncio.get_running_loop()
+        timeout = self.rtt.timeout if self.adaptive_timeout else self.timeout
+        if self.syn_scanner is not None:
+            if self.family != socket.AF_INET:
+                raise ValueError(f"SYN scans only support IPv4 targets: {self.target_ip}")
+            state, rtt = await self.syn_scanner.probe(self.address,port,timeout)
+            if rtt is not None:
+                self.rtt.add(rtt)
+            return port, state
+        sock = socket.socket(self.family,socket.SOCK_STREAM)
+        try:
+            sock.setblocking(False)
+            start = loop.time()
+            try:
+                await asyncio.wait_for(loop.sock_connect(sock,(self.address,port)),timeout)
+                state = OPEN
+            except ConnectionRefusedError:
+                state = CLOSED
+            except (asyncio.TimeoutError, OSError):
+                #no answer, or an ICMP error such as host unreachable
+                return port, FILTERED
+            self.rtt.add(loop.time() - start)
+            if state == OPEN and self.fingerprinter is not None:
+                #reuse the connection instead of reconnecting to grab the banner
+                self.services[port] = await self.fingerprinter.identify(sock)
+            return port, state
+        finally:
+            sock.close()
+
+    async def iter_scan(self,ports: Optional[Iterable[int]] = None) -> AsyncIterator[Tuple[int,str]]:
+        """
+        probe ports concurrently and yield each result as soon as it is known
+
+        Args:
+            ports (Iterable[int], optional): ports to probe, the configured range by default.
+        Yield:
+            (port, state) in completion order
+        """
+        ports = range(self.start_port,self.end_port+1) if ports is None else ports
+        await self.resolve()
+        async for result in iter_bounded(self.probe,ports,self.concurrency):
+            yield result
+
+    async def scan_async(self, syn=False) -> List[int]:
+        """
+        scan all ports in the specified range with the asyncio engine
+
+        Args:
+            syn (bool, optional): send half-open SYN probes from a raw socket instead of connecting.
+        Return:
+            List of open ports
+        """
+        if not syn:
+            return sorted([port async for port,state in self.iter_scan() if state == OPEN])
+        from SynScanner import SynScanner
+
+        async with SynScanner() as self.syn_scanner:
+            try:
+                return await self.scan_async()
+            finally:
+                self.syn_scanner = None
+
+    def scan(self, max_threads=100, engine='asyncio'):
         """
         scan all ports in the specified range
 
         Args:
-            max_threads (int, optional): maximum number of concurrent threads. Defaults to 100.
+            max_threads (int, optional): maximum number of concurrent threads of the thread engine. Defaults to 100.
+            engine (str, optional): 'asyncio', 'thread' or 'syn' (raw socket, needs root). Defaults to 'asyncio'.
         Return:
-            List of open parameters
+            List of open ports
         """
+        if engine in ('asyncio', 'syn'):
+            return asyncio.run(self.scan_async(syn=engine == 'syn'))
+        if engine != 'thread':
+            raise ValueError(f"Unknown engine: {engine}")
         
         open_ports = []
          # use threadPoolExecutor for concurrent scanning
@@ -60,27 +336,141 @@ class PortScanner:
         return sorted(open_ports)
     
     
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='TCP connect port scanner for hosts, host lists and CIDR ranges')
+    parser.add_argument('targets',nargs='*',help='IP addresses, CIDR ranges such as 10.0.0.0/24, or hostnames')
+    parser.add_argument('-iL','--targets-file',help='File with one target per line')
+    parser.add_argument('-p','--ports',default='1-1024',help='Ports to scan, e.g. 22,80,8000-8100 (default: 1-1024)')
+    parser.add_argument('--concurrency',type=int,default=2000,
+                        help='Maximum connects in flight across all hosts (default: 2000)')
+    parser.add_argument('--rate',type=float,help='Maximum probes per second across all hosts (default: unlimited)')
+    parser.add_argument('--timeout',type=float,default=1.0,
+                        help='Connect timeout in seconds, the upper bound of the adaptive timeout (default: 1)')
+    parser.add_argument('--no-adaptive-timeout',dest='adaptive_timeout',action='store_false',
+                        help='Always wait the full timeout instead of adapting it to the RTT of each host')
+    parser.add_argument('--seed',type=int,help='Seed of the randomized probe order')
+    parser.add_argument('-sS','--syn',action='store_true',
+                        help='Half-open SYN scan from a raw socket (needs root or CAP_NET_RAW, IPv4 only)')
+    parser.add_argument('-sV','--service-detection',action='store_true',
+                        help='Identify the service and version behind open ports on the probe connection')
+    parser.add_argument('--db',help='SQLite file the results are stored in and compared with')
+    parser.add_argument('--diff',action='store_true',
+                        help='Only recheck the ports stored as open and the recently changed hosts, '
+                             'and report state changes (needs --db)')
+    parser.add_argument('--recent',type=float,default=168,
+                        help='Hours a host counts as recently changed in --diff mode (default: 168)')
+    args = parser.parse_args(argv)
+    if args.syn and args.service_detection:
+        parser.error('service detection needs a connection, it cannot be combined with --syn')
+    if args.diff and not args.db:
+        parser.error('--diff needs --db')
+    return args
+
+
+def describe(service):
+    """format a Service as 'name product version', None if there is none"""
+    if service is None:
+        return None
+    return ' '.join(part for part in (service.name,service.product,service.version) if part)
+
+
+def format_change(change):
+    old = f"{change.old_state} ({change.old_service})" if change.old_service else change.old_state
+    new = f"{change.new_state} ({change.new_service})" if change.new_service else change.new_state
+    return f"{change.host}:{change.port} {old} -> {new}"
+
+
+async def run_sweep(sweeper,store=None,pairs=None,changes_only=False):
+    """print open ports, or only state changes, as they are found
+
+    Return:
+        open ports by host and the list of state changes
+    """
+    open_ports = {}
+    changes = []
+    async for host, port, state in sweeper.iter_sweep(pairs):
+        service = sweeper.service(host,port)
+        if store is not None:
+            change = store.record(host,port,state,describe(service))
+            if change is not None:
+                changes.append(change)
+                if changes_only:
+                    print(format_change(change),flush=True)
+        if state == OPEN:
+            if not changes_only:
+                details = f"  {describe(service)}" if service is not None else ''
+                print(f"{host}:{port} is open{details}",flush=True)
+            open_ports.setdefault(host,[]).append(port)
+    return open_ports, changes
+
+
+def diff_pairs(sweeper,store,targeted,recent_hours):
+    """pairs rechecked by --diff: the ports stored as open and every port of recently changed hosts"""
+    rechecks = {pair for pair in store.open_ports() if not targeted or pair[0] in sweeper.hosts}
+    since = time.time() - recent_hours * 3600
+    hosts = [host for host in store.changed_hosts(since) if not targeted or host in sweeper.hosts]
+    pairs = rechecks | {(host,port) for host in hosts for port in sweeper.ports}
+    return sorted(pairs), len(rechecks), hosts
+
+
 def main():
+    from ScanStore import ScanStore
+    from SweepScanner import SweepScanner, parse_ports
+
+    args = parse_args()
+    store = None
     try:
-        #get target ip from the user
-        target_ip = input("Enter target ip address: ")
+        targets = list(args.targets)
+        if args.targets_file:
+            with open(args.targets_file,'r',encoding='utf-8') as f:
+                targets += [line.split('#')[0].strip() for line in f]
+        if not targets and not args.diff:
+            #get target ip from the user
+            targets = [input("Enter target ip address: ")]
         
-        #create and run port scanner
-        scanner = PortScanner(target_ip)
-        open_ports = scanner.scan()
+        #create and run the sweep
+        ports = parse_ports(args.ports)
+        sweeper = SweepScanner(targets,ports,args.concurrency,args.rate,
+                               args.timeout,args.adaptive_timeout,args.seed,args.syn,args.service_detection)
+        store = ScanStore(args.db) if args.db else None
+        pairs = None
+        if args.diff and store.baseline:
+            print(f"No previous scan in {args.db}, running a full scan")
+        elif args.diff:
+            pairs, rechecks, hosts = diff_pairs(sweeper,store,bool(targets),args.recent)
+            print(f"Rechecking {rechecks} stored open ports and {len(hosts)} recently changed hosts "
+                  f"({len(pairs)} probes)")
+        if pairs is None:
+            if not len(sweeper):
+                raise ValueError("No targets to scan")
+            print(f"Scanning {len(sweeper.ports)} ports on {len(sweeper.hosts)} hosts ({len(sweeper)} probes)")
+        if store is not None:
+            store.begin_scan('diff' if pairs is not None else 'full',targets,ports)
+        open_ports, changes = asyncio.run(run_sweep(sweeper,store,pairs,changes_only=pairs is not None))
+        if store is not None:
+            store.finish_scan()
         
         #display results
-        if open_ports:
+        if pairs is not None:
+            print(f"\n{len(changes)} state changes")
+        elif open_ports:
             print("\nOpen Ports: ")
-            for port in open_ports:
-                print(f"Port {port} is open")
+            for host in sorted(open_ports):
+                print(f"{host}: {', '.join(map(str,sorted(open_ports[host])))}")
+            if changes:
+                print("\nState changes since the previous scan:")
+                for change in changes:
+                    print(format_change(change))
         else:
             print("\n No open ports found")
     except KeyboardInterrupt:
         print("\nScanning interrupted by user")
     except Exception as e:
         print(f"An error occurred: {e}")
+    finally:
+        if store is not None:
+            store.close()
         
         
 if __name__=="__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,165 @@
+import json
+import sqlite3
+import time
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from BasicPortScanner import CLOSED, OPEN
+from SweepScanner import UNRESOLVED
+
+_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS scans (
+    id INTEGER PRIMARY KEY,
+    mode TEXT NOT NULL,
+    targets TEXT NOT NULL,
+    ports TEXT NOT NULL,
+    started REAL NOT NULL,
+    finished REAL
+);
+CREATE TABLE IF NOT EXISTS ports (
+    host TEXT NOT NULL,
+    port INTEGER NOT NULL,
+    state TEXT NOT NULL,
+    service TEXT,
+    first_seen REAL NOT NULL,
+    last_seen REAL NOT NULL,
+    last_changed REAL NOT NULL,
+    PRIMARY KEY (host, port)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS changes (
+    scan_id INTEGER NOT NULL REFERENCES scans(id),
+    host TEXT NOT NULL,
+    port INTEGER NOT NULL,
+    old_state TEXT,
+    new_state TEXT NOT NULL,
+    old_service TEXT,
+    new_service TEXT,
+    time REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS changes_time ON changes (time);
+'''
+
+#pending writes are committed in batches of this many rows
+COMMIT_EVERY = 1000
+
+
+class Change(NamedTuple):
+    host: str
+    port: int
+    old_state: Optional[str]
+    new_state: str
+    old_service: Optional[str]
+    new_service: Optional[str]
+
+
+class ScanStore:
+    """SQLite store of scan results keyed by host and port
+
+    Only ports that have been seen open are stored, so a sweep of a mostly
+    closed network stays small: a port without a row has never been open.
+    The known states are loaded once per run, closed results for ports
+    without a row never touch the database, and every state change is
+    appended to the changes table of the scan that saw it. The first
+    finished scan is the baseline: what it finds is stored but not reported
+    as changes.
+    """
+
+    def __init__(self, path):
+        """open or create the store
+
+        Args:
+            path (str): path of the SQLite database
+        """
+        self.path = path
+        self.db = sqlite3.connect(path)
+        self.db.execute('PRAGMA journal_mode=WAL')
+        self.db.executescript(_SCHEMA)
+        self.known: Dict[Tuple[str, int], Tuple[str, Optional[str]]] = {
+            (host, port): (state, service)
+            for host, port, state, service in self.db.execute('SELECT host, port, state, service FROM ports')
+        }
+        self.scan_id: Optional[int] = None
+        self.baseline = not self.has_previous_scan()
+        self.pending = 0
+
+    def has_previous_scan(self) -> bool:
+        """whether a scan has already finished against this store"""
+        return self.db.execute('SELECT 1 FROM scans WHERE finished IS NOT NULL LIMIT 1').fetchone() is not None
+
+    def begin_scan(self, mode, targets: Iterable[str], ports: Iterable[int]) -> int:
+        """record the start of a scan and return its id"""
+        cursor = self.db.execute('INSERT INTO scans (mode, targets, ports, started) VALUES (?, ?, ?, ?)',
+                                 (mode, json.dumps(list(targets)), json.dumps(list(ports)), time.time()))
+        self.db.commit()
+        self.scan_id = cursor.lastrowid
+        return self.scan_id
+
+    def finish_scan(self):
+        """record the end of the current scan and commit every pending write"""
+        self.db.execute('UPDATE scans SET finished = ? WHERE id = ?', (time.time(), self.scan_id))
+        self.db.commit()
+        self.pending = 0
+        self.baseline = False
+
+    def open_ports(self) -> List[Tuple[str, int]]:
+        """return the (host, port) pairs whose last known state is open"""
+        return [key for key, (state, _) in self.known.items() if state == OPEN]
+
+    def changed_hosts(self, since) -> List[str]:
+        """return the hosts that had a state change at or after a timestamp"""
+        rows = self.db.execute('SELECT DISTINCT host FROM changes WHERE time >= ?', (since,))
+        return [host for host, in rows]
+
+    def record(self, host, port, state, service: Optional[str] = None) -> Optional[Change]:
+        """
+        store the result of one probe
+
+        Args:
+            host (str): probed host
+            port (int): probed port
+            state (str): OPEN, CLOSED, FILTERED or UNRESOLVED
+            service (str, optional): identified service, if service detection ran
+        Return:
+            the Change if the state or the service differs from the last known one, None otherwise
+        """
+        if state == UNRESOLVED:
+            #a failed lookup says nothing about the port: keep its last state, and its recheck
+            return None
+        key = (host, port)
+        known = self.known.get(key)
+        if known is None and state != OPEN:
+            return None
+        now = time.time()
+        if known is None:
+            old_state, old_service = CLOSED, None
+            self.db.execute('INSERT INTO ports VALUES (?, ?, ?, ?, ?, ?, ?)',
+                            (host, port, state, service, now, now, now))
+        else:
+            old_state, old_service = known
+            if service is None:
+                service = old_service
+            if state == old_state and service == old_service:
+                if state == OPEN:
+                    self.db.execute('UPDATE ports SET last_seen = ? WHERE host = ? AND port = ?', (now, host, port))
+                    self._written()
+                return None
+            self.db.execute('UPDATE ports SET state = ?, service = ?, last_seen = ?, last_changed = ? '
+                            'WHERE host = ? AND port = ?', (state, service, now, now, host, port))
+        self.known[key] = (state, service)
+        if self.baseline:
+            self._written()
+            return None
+        change = Change(host, port, old_state, state, old_service, service)
+        self.db.execute('INSERT INTO changes VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                        (self.scan_id, host, port, old_state, state, old_service, service, now))
+        self._written()
+        return change
+
+    def _written(self):
+        self.pending += 1
+        if self.pending >= COMMIT_EVERY:
+            self.db.commit()
+            self.pending = 0
+
+    def close(self):
+        self.db.commit()
+        self.db.close()
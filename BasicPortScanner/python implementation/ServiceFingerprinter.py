@@ -0,0 +1,121 @@
+import asyncio
+import re
+from typing import List, NamedTuple, Optional, Pattern, Tuple
+
+#bytes of a response kept and matched
+MAX_BANNER_SIZE = 4096
+
+#probe sent when the service does not talk first
+GET_PROBE = b'GET / HTTP/1.0\r\n\r\n'
+
+
+class Service(NamedTuple):
+    name: str
+    product: Optional[str]
+    version: Optional[str]
+    banner: bytes
+
+
+#(service, default product, pattern), tried in order on the response; the
+#optional named groups product and version fill in the rest
+SIGNATURES: List[Tuple[str, Optional[str], bytes]] = [
+    ('ssh', None, rb'^SSH-[\d.]+-(?P<product>[A-Za-z]+)[_-]?(?P<version>[\w.]+)?'),
+    ('ftp', None, rb'^220[ -][^\r\n]*?(?P<product>vsFTPd|ProFTPD|Pure-FTPd|FileZilla Server)[ (v]*(?P<version>\d[\w.]*)?'),
+    ('smtp', None, rb'^220[ -][^\r\n]*?E?SMTP[ ]*(?P<product>Postfix|Exim|Sendmail)?[ ]*(?P<version>\d[\w.]*)?'),
+    ('ftp', None, rb'^220[ -][^\r\n]*FTP'),
+    ('pop3', None, rb'^\+OK(?:[^\r\n]*?(?P<product>Dovecot|Cyrus|Courier))?'),
+    ('imap', None, rb'^\* OK(?:[^\r\n]*?(?P<product>Dovecot|Cyrus|Courier))?'),
+    ('mysql', 'MySQL', rb'^.\x00\x00\x00\x0a(?P<version>\d[\d.]*)(?:-(?P<product>MariaDB))?'),
+    ('vnc', None, rb'^RFB (?P<version>\d{3}\.\d{3})'),
+    ('telnet', None, rb'^\xff[\xfb-\xfe]'),
+    ('http', None, rb'^HTTP/[\d.]+ \d{3}(?:.*?\r\nServer:[ ]*(?P<product>[^/\r\n ]+)(?:/(?P<version>[^\s]+))?)?'),
+    ('ssl', None, rb'^\x15\x03[\x00-\x04]\x00\x02\x02'),
+    ('redis', 'Redis', rb'^-ERR (?:wrong number of arguments|unknown command)'),
+]
+
+#compiled once, matching a response is a handful of anchored regexes
+_COMPILED: List[Tuple[str, Optional[str], Pattern[bytes]]] = [
+    (name, product, re.compile(pattern, re.DOTALL | re.IGNORECASE)) for name, product, pattern in SIGNATURES
+]
+
+
+def match_service(response) -> Optional[Service]:
+    """
+    identify a service from the first bytes it sent
+
+    Args:
+        response (bytes): banner or answer to a probe
+    Return:
+        the matching Service, None if no signature matches
+    """
+    for name, default_product, pattern in _COMPILED:
+        match = pattern.match(response)
+        if match is None:
+            continue
+        groups = match.groupdict()
+        product = groups.get('product')
+        version = groups.get('version')
+        return Service(name,
+                       product.decode('latin-1') if product else default_product,
+                       version.decode('latin-1') if version else None,
+                       response)
+    return None
+
+
+class ServiceFingerprinter:
+    """banner grabbing on the connection a connect probe has just opened
+
+    The service gets a short window to talk first (SSH, FTP, SMTP and the
+    like send a banner right away). If it stays silent a small HTTP request
+    is sent instead, which also draws recognizable answers out of TLS and
+    Redis servers. No extra connection is ever made.
+    """
+
+    def __init__(self, banner_timeout=0.5, read_timeout=2.0):
+        """initialize the fingerprinter
+
+        Args:
+            banner_timeout (float, optional): seconds to wait for the service to talk first (default=0.5).
+            read_timeout (float, optional): seconds to wait for the answer to the probe (default=2.0).
+        """
+        self.banner_timeout = banner_timeout
+        self.read_timeout = read_timeout
+
+    async def _read(self, sock, timeout):
+        """read until the response looks complete, the peer closes or the timeout expires"""
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        data = b''
+        while len(data) < MAX_BANNER_SIZE:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                break
+            try:
+                chunk = await asyncio.wait_for(loop.sock_recv(sock, MAX_BANNER_SIZE - len(data)), remaining)
+            except (asyncio.TimeoutError, OSError):
+                break
+            if not chunk:
+                break
+            data += chunk
+            #wait for the whole header of HTTP answers, their Server line names the product
+            if b'\r\n\r\n' in data or (not data.startswith(b'HTTP/') and match_service(data) is not None):
+                break
+        return data
+
+    async def identify(self, sock) -> Service:
+        """
+        fingerprint the service behind a connected non-blocking socket
+
+        Args:
+            sock (socket.socket): connected socket, left open
+        Return:
+            the identified Service, named 'unknown' if nothing matched
+        """
+        response = await self._read(sock, self.banner_timeout)
+        if not response:
+            try:
+                await asyncio.get_running_loop().sock_sendall(sock, GET_PROBE)
+            except OSError:
+                return Service('unknown', None, None, b'')
+            response = await self._read(sock, self.read_timeout)
+        return match_service(response) or Service('unknown', None, None, response[:256])
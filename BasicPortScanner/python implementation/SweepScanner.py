@@ -0,0 +1,346 @@
+import asyncio
+import bisect
+import hashlib
+import ipaddress
+import random
+import socket
+from collections import OrderedDict
+from typing import AsyncIterator, Dict, Iterable, Iterator, List, Optional, Sequence, Set, Tuple
+
+from BasicPortScanner import OPEN, PortScanner, RateLimiter, iter_bounded
+from ServiceFingerprinter import Service, ServiceFingerprinter
+
+#state of the probes of a hostname that does not resolve
+UNRESOLVED = 'unresolved'
+#scanners of hosts without a probe in flight kept for their RTT estimate
+IDLE_SCANNERS = 4096
+
+
+def parse_ports(spec):
+    """parse a port list such as 22,80,8000-8100
+
+    Args:
+        spec (str): comma-separated ports and inclusive ranges
+    Return:
+        sorted list of unique ports
+    """
+    ports = set()
+    for part in spec.split(','):
+        part = part.strip()
+        if not part:
+            continue
+        first, _, last = part.partition('-')
+        first = int(first)
+        last = int(last) if last else first
+        if not 1 <= first <= last <= 65535:
+            raise ValueError(f"Invalid port range: {part}")
+        ports.update(range(first, last + 1))
+    if not ports:
+        raise ValueError("No ports to scan")
+    return sorted(ports)
+
+
+class TargetSet:
+    """hosts of several addresses, CIDR ranges and hostnames, addressable by index
+
+    Ranges are kept as (first address, count) pairs, so a /16 costs a single
+    entry instead of 65534 strings.
+    """
+
+    def __init__(self, targets: Iterable[str]):
+        """parse the targets
+
+        Args:
+            targets (Iterable[str]): IP addresses, CIDR ranges such as 10.0.0.0/16, or hostnames
+        """
+        self.ranges: List[Tuple[object, int, int]] = []
+        self.offsets: List[int] = []
+        total = 0
+        for target in targets:
+            target = target.strip()
+            if not target:
+                continue
+            try:
+                network = ipaddress.ip_network(target, strict=False)
+            except ValueError:
+                #a hostname, resolved when it is probed
+                entry = (target, 0, 1)
+            else:
+                first = int(network.network_address)
+                count = network.num_addresses
+                #skip the network and broadcast addresses like ip_network.hosts()
+                if network.version == 4 and network.prefixlen < 31:
+                    first, count = first + 1, count - 2
+                elif network.version == 6 and network.prefixlen < 127:
+                    first, count = first + 1, count - 1
+                entry = (network.version, first, count)
+            self.offsets.append(total)
+            self.ranges.append(entry)
+            total += entry[2]
+        self.size = total
+
+    def __len__(self):
+        return self.size
+
+    def __contains__(self, host):
+        try:
+            address = ipaddress.ip_address(host)
+        except ValueError:
+            return any(kind == host for kind, _, _ in self.ranges)
+        value = int(address)
+        return any(kind == address.version and first <= value < first + count
+                   for kind, first, count in self.ranges)
+
+    def __getitem__(self, index):
+        if not 0 <= index < self.size:
+            raise IndexError(index)
+        i = bisect.bisect_right(self.offsets, index) - 1
+        kind, first, _ = self.ranges[i]
+        if isinstance(kind, str):
+            return kind
+        address = first + index - self.offsets[i]
+        return str(ipaddress.IPv4Address(address) if kind == 4 else ipaddress.IPv6Address(address))
+
+
+class RandomPermutation:
+    """pseudo-random permutation of range(size) computed one index at a time
+
+    A small Feistel network over the next even power of two, with cycle
+    walking back into the range, so a sweep of billions of (host, port)
+    pairs is shuffled without storing them.
+    """
+
+    ROUNDS = 4
+
+    def __init__(self, size, seed=None):
+        """initialize the permutation
+
+        Args:
+            size (int): number of indexes to permute
+            seed (int, optional): seed of the order, random by default
+        """
+        self.size = size
+        bits = max(2, (size - 1).bit_length())
+        bits += bits % 2
+        self.half_bits = bits // 2
+        self.half_mask = (1 << self.half_bits) - 1
+        seed = random.SystemRandom().getrandbits(64) if seed is None else seed
+        self.keys = [hashlib.blake2b(f"{seed}:{i}".encode(), digest_size=8).digest() for i in range(self.ROUNDS)]
+
+    def __len__(self):
+        return self.size
+
+    def _round(self, value, key):
+        digest = hashlib.blake2b(value.to_bytes(8, 'little'), digest_size=8, key=key).digest()
+        return int.from_bytes(digest, 'little') & self.half_mask
+
+    def _encrypt(self, value):
+        left, right = value >> self.half_bits, value & self.half_mask
+        for key in self.keys:
+            left, right = right, left ^ self._round(right, key)
+        return (left << self.half_bits) | right
+
+    def __getitem__(self, index):
+        if not 0 <= index < self.size:
+            raise IndexError(index)
+        value = self._encrypt(index)
+        while value >= self.size:
+            value = self._encrypt(value)
+        return value
+
+    def __iter__(self) -> Iterator[int]:
+        return (self[i] for i in range(self.size))
+
+
+class SweepScanner:
+    """scanner of many hosts sharing one concurrency and packet rate budget
+
+    Every (host, port) pair of the sweep is probed once, in a random order
+    that interleaves hosts, so no host sees a burst of connects. Each host
+    has its own PortScanner, and with it its own RTT estimate and adaptive
+    timeout, while it has probes in flight or results not yet consumed.
+    The randomized order spreads a host's probes over the whole sweep, so
+    a host then moves to a bounded pool of idle scanners, keeping its RTT
+    estimate for its next probe unless IDLE_SCANNERS more recent hosts
+    push it out: memory follows the concurrency, not the number of targets.
+    A hostname is resolved once, and one that does not resolve is skipped.
+    """
+
+    def __init__(self, targets: Iterable[str], ports: Sequence[int], concurrency=2000, rate=None,
+                 timeout=1.0, adaptive_timeout=True, seed=None, syn=False, service_detection=False):
+        """initialize the sweep
+
+        Args:
+            targets (Iterable[str]): IP addresses, CIDR ranges or hostnames
+            ports (Sequence[int]): ports to probe on every host
+            concurrency (int, optional): maximum connects in flight across all hosts (default=2000).
+            rate (float, optional): maximum probes per second across all hosts, unlimited by default.
+            timeout (float, optional): connect timeout in seconds, the upper bound when adaptive (default=1.0).
+            adaptive_timeout (bool, optional): adapt each host's timeout to its measured RTT (default=True).
+            seed (int, optional): seed of the probe order, random by default.
+            syn (bool, optional): send half-open SYN probes from one raw socket instead of connecting.
+            service_detection (bool, optional): fingerprint open ports on the probe connection.
+        """
+        if syn and service_detection:
+            raise ValueError("Service detection needs connect probes")
+        self.hosts = TargetSet(targets)
+        self.ports = list(ports)
+        self.concurrency = concurrency
+        self.rate = rate
+        self.timeout = timeout
+        self.adaptive_timeout = adaptive_timeout
+        self.seed = seed
+        self.syn = syn
+        self.syn_scanner = None
+        self.fingerprinter = ServiceFingerprinter() if service_detection else None
+        #scanners of the hosts with outstanding probes, started and not yet consumed
+        self.scanners: Dict[str, PortScanner] = {}
+        self.outstanding: Dict[str, int] = {}
+        #least recently used first
+        self.idle: 'OrderedDict[str, PortScanner]' = OrderedDict()
+        #resolutions in flight, resolved hostnames, and hostnames known not to resolve
+        self.resolving: Dict[str, asyncio.Future] = {}
+        self.addresses: Dict[str, Tuple[int, str]] = {}
+        self.unresolved: Set[str] = set()
+
+    def __len__(self):
+        return len(self.hosts) * len(self.ports)
+
+    def scanner(self, host) -> PortScanner:
+        """return the scanner of a host, taken back from the idle ones or created"""
+        scanner = self.scanners.get(host)
+        if scanner is None:
+            scanner = self.idle.pop(host, None)
+            if scanner is None:
+                scanner = PortScanner(host, timeout=self.timeout, concurrency=self.concurrency,
+                                      adaptive_timeout=self.adaptive_timeout)
+                scanner.fingerprinter = self.fingerprinter
+                try:
+                    address = ipaddress.ip_address(host)
+                    scanner.family = socket.AF_INET if address.version == 4 else socket.AF_INET6
+                    scanner.address = host
+                except ValueError:
+                    if host in self.addresses:
+                        scanner.family, scanner.address = self.addresses[host]
+            scanner.syn_scanner = self.syn_scanner
+            self.scanners[host] = scanner
+        return scanner
+
+    def release(self, host, port):
+        """
+        count one consumed result of a host, idling its scanner after the last outstanding one
+
+        Args:
+            host (str): host of the result
+            port (int): port of the result, whose identified service is dropped
+        """
+        scanner = self.scanners.get(host)
+        if scanner is not None:
+            scanner.services.pop(port, None)
+        outstanding = self.outstanding.get(host, 0)
+        if outstanding > 1:
+            self.outstanding[host] = outstanding - 1
+            return
+        self.outstanding.pop(host, None)
+        self.scanners.pop(host, None)
+        if scanner is not None and host not in self.unresolved:
+            self.idle[host] = scanner
+            if len(self.idle) > IDLE_SCANNERS:
+                self.idle.popitem(last=False)
+
+    async def resolve(self, host) -> Optional[PortScanner]:
+        """return the scanner of a host once its address is known, None if it does not resolve"""
+        if host in self.unresolved:
+            return None
+        scanner = self.scanner(host)
+        if scanner.address is None:
+            #concurrent probes of the host wait for a single lookup
+            resolution = self.resolving.get(host)
+            if resolution is None:
+                resolution = self.resolving[host] = asyncio.ensure_future(scanner.resolve())
+            try:
+                await asyncio.shield(resolution)
+            except OSError:
+                self.unresolved.add(host)
+                return None
+            finally:
+                if resolution.done():
+                    self.resolving.pop(host, None)
+            #hostnames are listed one by one in the targets, so this stays small
+            self.addresses[host] = (scanner.family, scanner.address)
+        return scanner
+
+    def service(self, host, port) -> Optional[Service]:
+        """return the service identified on a port, if service detection is enabled"""
+        scanner = self.scanners.get(host)
+        return scanner.services.get(port) if scanner is not None else None
+
+    def probes(self, pairs: Optional[Sequence[Tuple[str, int]]] = None) -> Iterator[Tuple[str, int]]:
+        """yield every (host, port) pair of the sweep, or the given pairs, in randomized order"""
+        if pairs is not None:
+            for index in RandomPermutation(len(pairs), self.seed):
+                yield pairs[index]
+            return
+        num_hosts = len(self.hosts)
+        for index in RandomPermutation(len(self), self.seed):
+            port_index, host_index = divmod(index, num_hosts)
+            yield self.hosts[host_index], self.ports[port_index]
+
+    async def probe(self, target: Tuple[str, int]) -> Tuple[str, int, str]:
+        """probe one port of one host"""
+        host, port = target
+        #released once the result has been consumed
+        self.outstanding[host] = self.outstanding.get(host, 0) + 1
+        scanner = await self.resolve(host)
+        if scanner is None:
+            return host, port, UNRESOLVED
+        _, state = await scanner.probe(port)
+        return host, port, state
+
+    async def iter_sweep(self, pairs: Optional[Sequence[Tuple[str, int]]] = None) -> AsyncIterator[Tuple[str, int, str]]:
+        """
+        probe the whole sweep and yield each result as soon as it is known
+
+        Args:
+            pairs (Sequence[Tuple[str, int]], optional): (host, port) pairs probed instead of
+                every port of every target, e.g. the ports a previous scan found open.
+        Yield:
+            (host, port, state) in completion order; the service identified on a port
+            can be read until the consumer asks for the next result
+        """
+        limiter = RateLimiter(self.rate) if self.rate else None
+        if not self.syn:
+            async for result in iter_bounded(self.probe, self.probes(pairs), self.concurrency, limiter):
+                yield result
+                self.release(result[0], result[1])
+            return
+        from SynScanner import SynScanner
+
+        async with SynScanner() as self.syn_scanner:
+            try:
+                async for result in iter_bounded(self.probe, self.probes(pairs), self.concurrency, limiter):
+                    yield result
+                    self.release(result[0], result[1])
+            finally:
+                self.syn_scanner = None
+                #the idle scanners would hold on to the closed raw socket
+                self.scanners.clear()
+                self.outstanding.clear()
+                self.idle.clear()
+
+    async def sweep_async(self) -> Dict[str, List[int]]:
+        """
+        run the sweep and collect the open ports
+
+        Return:
+            sorted open ports of every host with at least one
+        """
+        open_ports: Dict[str, List[int]] = {}
+        async for host, port, state in self.iter_sweep():
+            if state == OPEN:
+                open_ports.setdefault(host, []).append(port)
+        return {host: sorted(ports) for host, ports in open_ports.items()}
+
+    def sweep(self) -> Dict[str, List[int]]:
+        """synchronous wrapper of sweep_async"""
+        return asyncio.run(self.sweep_async())
@@ -0,0 +1,192 @@
+import asyncio
+import random
+import socket
+import struct
+from typing import Dict, Optional, Tuple
+
+from BasicPortScanner import CLOSED, FILTERED, OPEN
+
+TCP_SYN = 0x02
+TCP_RST = 0x04
+TCP_ACK = 0x10
+
+#20-byte TCP header followed by an MSS option, like the SYN of a normal connect
+_TCP_HEADER = struct.Struct('!HHIIBBHHH')
+_MSS_OPTION = struct.pack('!BBH', 2, 4, 1460)
+_PSEUDO_HEADER = struct.Struct('!4s4sBBH')
+
+RECEIVE_BUFFER_SIZE = 8 * 1024 * 1024
+
+
+def checksum(data):
+    """internet checksum (RFC 1071) of data"""
+    if len(data) % 2:
+        data += b'\0'
+    total = sum(struct.unpack(f'!{len(data) // 2}H', data))
+    while total >> 16:
+        total = (total & 0xffff) + (total >> 16)
+    return ~total & 0xffff
+
+
+def build_syn(source, destination, source_port, port, seq):
+    """build the TCP header of a SYN probe, the kernel adds the IP header
+
+    Args:
+        source (bytes): packed source IPv4 address
+        destination (bytes): packed destination IPv4 address
+        source_port (int): source port of the scan
+        port (int): probed port
+        seq (int): sequence number the reply acknowledges plus one
+    Return:
+        TCP segment with its checksum
+    """
+    length = _TCP_HEADER.size + len(_MSS_OPTION)
+    header = _TCP_HEADER.pack(source_port, port, seq, 0, (length // 4) << 4, TCP_SYN, 1024, 0, 0)
+    segment = header + _MSS_OPTION
+    pseudo = _PSEUDO_HEADER.pack(source, destination, 0, socket.IPPROTO_TCP, length)
+    return segment[:16] + struct.pack('!H', checksum(pseudo + segment)) + segment[18:]
+
+
+class SynScanner:
+    """half-open (SYN) scanner sharing one raw socket between all probes
+
+    Each probe sends a single SYN and registers itself in a table of
+    outstanding probes keyed by (address, port). A reader callback on the
+    event loop parses every incoming TCP segment and resolves the matching
+    probe: SYN-ACK means open, RST means closed and no answer within the
+    timeout means filtered. The kernel answers SYN-ACKs with a RST since no
+    socket owns the scan's source port, so connections are never completed
+    and no file descriptor is used per probe.
+
+    Needs root or CAP_NET_RAW and only probes IPv4 targets. Linux delivers
+    every incoming TCP segment to a raw TCP socket, which is what this
+    relies on; it works against the loopback interface as well.
+    """
+
+    def __init__(self, retries=1):
+        """initialize the scanner, the raw socket is opened by open()
+
+        Args:
+            retries (int, optional): SYNs resent to a port that did not answer (default=1).
+        """
+        self.retries = retries
+        self.sock: Optional[socket.socket] = None
+        self.port_reservation: Optional[socket.socket] = None
+        self.source_port = 0
+        self.pending: Dict[Tuple[bytes, int], Tuple[int, asyncio.Future]] = {}
+        self.sources: Dict[str, bytes] = {}
+        self.sent = 0
+        self.received = 0
+
+    async def open(self):
+        """open the raw socket and start reading replies"""
+        try:
+            self.sock = socket.socket(socket.AF_INET, socket.SOCK_RAW, socket.IPPROTO_TCP)
+        except PermissionError:
+            raise PermissionError("SYN scans need root or CAP_NET_RAW") from None
+        self.sock.setblocking(False)
+        #every TCP segment of the host lands in this socket, a small buffer drops replies
+        for option in (getattr(socket, 'SO_RCVBUFFORCE', None), socket.SO_RCVBUF):
+            try:
+                self.sock.setsockopt(socket.SOL_SOCKET, option, RECEIVE_BUFFER_SIZE)
+                break
+            except (OSError, TypeError):
+                continue
+        #keep the source port bound so no local connection picks it while the
+        #kernel resets the SYN-ACKs sent to it
+        self.port_reservation = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.port_reservation.bind(('0.0.0.0', 0))
+        self.source_port = self.port_reservation.getsockname()[1]
+        asyncio.get_running_loop().add_reader(self.sock.fileno(), self._on_readable)
+        return self
+
+    def close(self):
+        """stop reading replies and release the sockets"""
+        if self.sock is not None:
+            asyncio.get_running_loop().remove_reader(self.sock.fileno())
+            self.sock.close()
+            self.sock = None
+        if self.port_reservation is not None:
+            self.port_reservation.close()
+            self.port_reservation = None
+        for _, future in self.pending.values():
+            future.cancel()
+        self.pending.clear()
+
+    async def __aenter__(self):
+        return await self.open()
+
+    async def __aexit__(self, *exc_info):
+        self.close()
+
+    def source_address(self, address) -> bytes:
+        """return the packed local address the kernel routes to address from"""
+        source = self.sources.get(address)
+        if source is None:
+            with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as probe:
+                probe.connect((address, 9))
+                source = socket.inet_aton(probe.getsockname()[0])
+            self.sources[address] = source
+        return source
+
+    def _on_readable(self):
+        """match every queued TCP segment against the outstanding probes"""
+        while True:
+            try:
+                packet = self.sock.recv(65535)
+            except (BlockingIOError, InterruptedError):
+                return
+            header_length = (packet[0] & 0x0f) * 4
+            if len(packet) < header_length + 14:
+                continue
+            port, destination_port, _, ack = struct.unpack_from('!HHII', packet, header_length)
+            if destination_port != self.source_port:
+                continue
+            flags = packet[header_length + 13]
+            if flags & TCP_RST:
+                state = CLOSED
+            elif flags & (TCP_SYN | TCP_ACK) == TCP_SYN | TCP_ACK:
+                state = OPEN
+            else:
+                #our own SYNs, seen on loopback
+                continue
+            probe = self.pending.get((packet[12:16], port))
+            if probe is None or ack != (probe[0] + 1) & 0xffffffff:
+                continue
+            self.received += 1
+            if not probe[1].done():
+                probe[1].set_result(state)
+
+    async def probe(self, address, port, timeout) -> Tuple[str, Optional[float]]:
+        """send a SYN to a port and wait for its answer
+
+        Args:
+            address (str): IPv4 address of the host
+            port (int): port to probe
+            timeout (float): seconds to wait for an answer to each SYN
+        Return:
+            (state, round trip time in seconds or None if there was no answer)
+        """
+        if self.sock is None:
+            raise RuntimeError("SynScanner is not open")
+        loop = asyncio.get_running_loop()
+        destination = socket.inet_aton(address)
+        source = self.source_address(address)
+        key = (destination, port)
+        try:
+            for _ in range(self.retries + 1):
+                seq = random.getrandbits(32)
+                future = loop.create_future()
+                self.pending[key] = (seq, future)
+                start = loop.time()
+                await loop.sock_sendto(self.sock, build_syn(source, destination, self.source_port, port, seq),
+                                       (address, 0))
+                self.sent += 1
+                try:
+                    state = await asyncio.wait_for(future, timeout)
+                except asyncio.TimeoutError:
+                    continue
+                return state, loop.time() - start
+            return FILTERED, None
+        finally:
+            self.pending.pop(key, None)
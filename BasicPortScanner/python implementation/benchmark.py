@@ -0,0 +1,408 @@
+import argparse
+import asyncio
+import concurrent.futures
+import json
+import os
+import platform
+import random
+import selectors
+import socket
+import subprocess
+import sys
+import threading
+import time
+from typing import Dict, List, Optional, Sequence, Set, Tuple
+
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
+
+from BasicPortScanner import CLOSED, FILTERED, OPEN, PortScanner, raise_fd_limit
+
+RESULTS_VERSION = 1
+
+ENGINES = ('thread', 'asyncio', 'syn')
+
+#seconds between two samples of the open file descriptors of a run
+FD_SAMPLE_INTERVAL = 0.005
+
+
+class FakeNetwork:
+    """pool of loopback listeners laid out as open, closed and filtered ports
+
+    Open ports are listeners whose connections are accepted and closed right
+    away by a background thread. Closed ports have no listener, so the
+    kernel answers with a RST. Filtered ports are listeners with a backlog
+    of zero whose only queue slot is taken by a connection that is never
+    accepted: Linux drops every further SYN to a full accept queue, so
+    probes get no answer at all and wait for their timeout, exactly as
+    behind a dropping firewall. The layout is a seeded shuffle of the range.
+    """
+
+    def __init__(self, address='127.0.0.2', first_port=20000, size=10000, open_ratio=0.05,
+                 filtered_ratio=0.01, seed=0):
+        """lay out the ports, the listeners are started by start()
+
+        Args:
+            address (str, optional): loopback address the listeners bind to (default='127.0.0.2').
+            first_port (int, optional): first port of the range (default=20000).
+            size (int, optional): number of ports in the range (default=10000).
+            open_ratio (float, optional): share of open ports (default=0.05).
+            filtered_ratio (float, optional): share of filtered ports (default=0.01).
+            seed (int, optional): seed of the layout (default=0).
+        """
+        if not 1 <= first_port <= first_port + size - 1 <= 65535:
+            raise ValueError(f"Invalid port range: {first_port}+{size}")
+        ports = list(range(first_port, first_port + size))
+        random.Random(seed).shuffle(ports)
+        num_open = round(size * open_ratio)
+        num_filtered = round(size * filtered_ratio)
+        self.address = address
+        self.first_port = first_port
+        self.last_port = first_port + size - 1
+        self.open_ports: Set[int] = set(ports[:num_open])
+        self.filtered_ports: Set[int] = set(ports[num_open:num_open + num_filtered])
+        self.sockets: List[socket.socket] = []
+        self.selector: Optional[selectors.BaseSelector] = None
+        self.stopped = threading.Event()
+        self.acceptor: Optional[threading.Thread] = None
+
+    def __len__(self):
+        return self.last_port - self.first_port + 1
+
+    def start(self):
+        """bind every listener and start accepting on the open ports"""
+        raise_fd_limit(len(self.open_ports) + 2 * len(self.filtered_ports))
+        self.selector = selectors.DefaultSelector()
+        try:
+            for port in sorted(self.open_ports):
+                listener = self._listen(port, socket.SOMAXCONN)
+                listener.setblocking(False)
+                self.selector.register(listener, selectors.EVENT_READ)
+            for port in sorted(self.filtered_ports):
+                self._listen(port, 0)
+                #fill the accept queue, this connection is never accepted
+                filler = socket.create_connection((self.address, port), timeout=1.0)
+                self.sockets.append(filler)
+        except OSError:
+            self.stop()
+            raise
+        self.acceptor = threading.Thread(target=self._accept, daemon=True)
+        self.acceptor.start()
+        return self
+
+    def _listen(self, port, backlog):
+        listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.sockets.append(listener)
+        listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        try:
+            listener.bind((self.address, port))
+        except OSError as e:
+            raise OSError(e.errno, f"Cannot listen on {self.address}:{port}: {e.strerror}") from None
+        listener.listen(backlog)
+        return listener
+
+    def _accept(self):
+        while not self.stopped.is_set():
+            for key, _ in self.selector.select(0.1):
+                while True:
+                    try:
+                        connection, _ = key.fileobj.accept()
+                    except (BlockingIOError, InterruptedError):
+                        break
+                    except OSError:
+                        #the listener was closed by stop()
+                        break
+                    connection.close()
+
+    def stop(self):
+        """stop accepting and close every listener"""
+        self.stopped.set()
+        if self.acceptor is not None:
+            self.acceptor.join()
+            self.acceptor = None
+        if self.selector is not None:
+            self.selector.close()
+            self.selector = None
+        for sock in self.sockets:
+            sock.close()
+        self.sockets.clear()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+
+class FdSampler:
+    """background thread recording the peak number of open file descriptors"""
+
+    def __init__(self, interval=FD_SAMPLE_INTERVAL):
+        self.interval = interval
+        self.peak: Optional[int] = None
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+
+    @staticmethod
+    def count() -> Optional[int]:
+        """open file descriptors of this process, None where /proc is missing"""
+        try:
+            return len(os.listdir('/proc/self/fd'))
+        except OSError:
+            return None
+
+    def _run(self):
+        while True:
+            count = self.count()
+            if count is None:
+                return
+            self.peak = max(self.peak or 0, count)
+            if self.stopped.wait(self.interval):
+                return
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stopped.set()
+        self.thread.join()
+
+
+def percentile(sorted_values: Sequence[float], fraction) -> Optional[float]:
+    """nearest-rank percentile of already sorted values"""
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, max(0, round(fraction * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def scan_threads(scanner: PortScanner, ports: Sequence[int], concurrency) -> Tuple[Dict[int, str], List[float]]:
+    """the thread engine of PortScanner.scan with every check_port timed
+
+    check_port only tells open from not open, so closed and filtered ports
+    are both reported as closed.
+    """
+    def timed(port):
+        start = time.perf_counter()
+        result = scanner.check_port(port)
+        return port, result is not None, time.perf_counter() - start
+
+    states = {}
+    latencies = []
+    with concurrent.futures.ThreadPoolExecutor(max_workers=concurrency) as executor:
+        futures = [executor.submit(timed, port) for port in ports]
+        for future in concurrent.futures.as_completed(futures):
+            port, is_open, latency = future.result()
+            states[port] = OPEN if is_open else CLOSED
+            latencies.append(latency)
+    return states, latencies
+
+
+async def scan_async(scanner: PortScanner, ports: Sequence[int], syn) -> Tuple[Dict[int, str], List[float]]:
+    """the asyncio or syn engine of PortScanner with every probe timed"""
+    latencies = []
+    probe = scanner.probe
+
+    async def timed(port):
+        start = time.perf_counter()
+        try:
+            return await probe(port)
+        finally:
+            latencies.append(time.perf_counter() - start)
+
+    #iter_scan looks the probe up on the instance
+    scanner.probe = timed
+    states = {}
+    if syn:
+        from SynScanner import SynScanner
+
+        async with SynScanner() as scanner.syn_scanner:
+            async for port, state in scanner.iter_scan(ports):
+                states[port] = state
+    else:
+        async for port, state in scanner.iter_scan(ports):
+            states[port] = state
+    return states, latencies
+
+
+def run_one(spec: dict) -> dict:
+    """scan the fake network once in this process and return the measurements
+
+    Args:
+        spec (dict): address, port range, engine, concurrency and timeout of the run
+    Returns:
+        dict: Scan duration, per probe latencies, states found, peak open files and peak RSS
+    """
+    ports = range(spec['first_port'], spec['last_port'] + 1)
+    scanner = PortScanner(spec['address'], spec['first_port'], spec['last_port'], spec['timeout'],
+                          spec['concurrency'], spec['adaptive_timeout'])
+    raise_fd_limit(spec['concurrency'])
+    with FdSampler() as sampler:
+        start = time.perf_counter()
+        if spec['engine'] == 'thread':
+            states, latencies = scan_threads(scanner, ports, spec['concurrency'])
+        else:
+            states, latencies = asyncio.run(scan_async(scanner, ports, spec['engine'] == 'syn'))
+        scan_s = time.perf_counter() - start
+    latencies.sort()
+    return {
+        'scan_s': scan_s,
+        'p50_ms': percentile(latencies, 0.5) * 1000,
+        'p99_ms': percentile(latencies, 0.99) * 1000,
+        'open': sorted(port for port, state in states.items() if state == OPEN),
+        'filtered': sorted(port for port, state in states.items() if state == FILTERED),
+        'fd_peak': sampler.peak,
+        # ru_maxrss is in KiB on Linux
+        'peak_rss_kb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss if resource is not None else None,
+    }
+
+
+def spawn(spec: dict) -> dict:
+    """run one spec in a fresh interpreter, so memory and open files are its own"""
+    process = subprocess.run([sys.executable, __file__, '--run-one', json.dumps(spec)],
+                             capture_output=True, text=True,
+                             cwd=os.path.dirname(os.path.abspath(__file__)))
+    if process.returncode:
+        error = process.stderr.strip().splitlines()
+        raise RuntimeError(error[-1] if error else f"run exited with status {process.returncode}")
+    return json.loads(process.stdout.splitlines()[-1])
+
+
+def benchmark(network: FakeNetwork, engines: Sequence[str], concurrencies: Sequence[int], timeout,
+              adaptive_timeout=True, repeat=1) -> List[dict]:
+    """scan the fake network with every engine and concurrency, one result per combination
+
+    The fastest of the repeated runs is kept. Ports found in the wrong state
+    are counted against the layout, the thread engine is only checked on
+    open ports since it cannot tell closed from filtered.
+    """
+    results = []
+    for engine in engines:
+        for concurrency in concurrencies:
+            spec = {
+                'address': network.address,
+                'first_port': network.first_port,
+                'last_port': network.last_port,
+                'engine': engine,
+                'concurrency': concurrency,
+                'timeout': timeout,
+                'adaptive_timeout': adaptive_timeout,
+            }
+            try:
+                runs = [spawn(spec) for _ in range(repeat)]
+            except RuntimeError as e:
+                print(f"{engine:7} x{concurrency:<5} skipped: {e}", file=sys.stderr)
+                continue
+            run = min(runs, key=lambda r: r['scan_s'])
+            found_open = set(run['open'])
+            wrong = len(found_open ^ network.open_ports)
+            if engine != 'thread':
+                wrong += len(set(run['filtered']) ^ network.filtered_ports)
+            result = {
+                'engine': engine,
+                'concurrency': concurrency,
+                'ports': len(network),
+                'open_ports': len(network.open_ports),
+                'filtered_ports': len(network.filtered_ports),
+                'timeout': timeout,
+                'adaptive_timeout': adaptive_timeout,
+                'scan_s': run['scan_s'],
+                'ports_per_s': len(network) / run['scan_s'],
+                'p50_ms': run['p50_ms'],
+                'p99_ms': run['p99_ms'],
+                'wrong_states': wrong,
+                'fd_peak': max((r['fd_peak'] or 0) for r in runs) or None,
+                'peak_rss_kb': max((r['peak_rss_kb'] or 0) for r in runs) or None,
+            }
+            results.append(result)
+            print(f"{engine:7} x{concurrency:<5} {result['ports_per_s']:>10,.0f} ports/s  "
+                  f"p50 {result['p50_ms']:7.2f}ms  p99 {result['p99_ms']:8.2f}ms  "
+                  f"fds {result['fd_peak']}  rss {result['peak_rss_kb']} KiB  wrong {wrong}", file=sys.stderr)
+    return results
+
+
+def result_key(result: dict) -> Tuple:
+    return result['engine'], result['concurrency'], result['ports']
+
+
+def compare(results: List[dict], baseline_file: str, threshold: float) -> int:
+    """print the throughput change against a baseline results file
+
+    Returns:
+        int: Number of runs whose throughput dropped by more than threshold
+    """
+    with open(baseline_file, 'r', encoding='utf-8') as f:
+        baseline = {result_key(r): r for r in json.load(f)['results']}
+    regressions = 0
+    for result in results:
+        old = baseline.get(result_key(result))
+        if old is None:
+            continue
+        change = result['ports_per_s'] / old['ports_per_s'] - 1
+        regressed = change < -threshold
+        regressions += regressed
+        print(f"{' '.join(map(str, result_key(result)))}: {change:+.1%}{'  REGRESSION' if regressed else ''}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the port scanner engines against loopback listeners')
+    parser.add_argument('--output', help='Results JSON file (default: benchmark-<timestamp>.json)')
+    parser.add_argument('--address', default='127.0.0.2',
+                        help='Loopback address the fake network listens on (default: 127.0.0.2)')
+    parser.add_argument('--first-port', type=int, default=20000, help='First port of the fake network (default: 20000)')
+    parser.add_argument('--ports', type=int, default=10000, help='Number of ports scanned (default: 10000)')
+    parser.add_argument('--open', type=float, default=0.05, help='Share of open ports (default: 0.05)')
+    parser.add_argument('--filtered', type=float, default=0.01,
+                        help='Share of filtered ports that never answer (default: 0.01)')
+    parser.add_argument('--engines', default=','.join(ENGINES),
+                        help=f'Comma-separated engines, syn needs root (default: {",".join(ENGINES)})')
+    parser.add_argument('--concurrency', default='100,1000,5000',
+                        help='Comma-separated concurrency levels (default: 100,1000,5000)')
+    parser.add_argument('--timeout', type=float, default=0.5,
+                        help='Connect timeout in seconds, what filtered ports cost (default: 0.5)')
+    parser.add_argument('--no-adaptive-timeout', dest='adaptive_timeout', action='store_false',
+                        help='Always wait the full timeout in the asyncio and syn engines')
+    parser.add_argument('--seed', type=int, default=0, help='Seed of the port layout (default: 0)')
+    parser.add_argument('--repeat', type=int, default=1, help='Runs per combination, the fastest is kept (default: 1)')
+    parser.add_argument('--compare', metavar='BASELINE', help='Compare the throughput with a previous results file')
+    parser.add_argument('--threshold', type=float, default=0.1,
+                        help='Throughput drop reported as a regression (default: 0.1)')
+    parser.add_argument('--run-one', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run_one:
+        print(json.dumps(run_one(json.loads(args.run_one))))
+        return
+
+    engines = [engine for engine in args.engines.split(',') if engine]
+    unknown = [engine for engine in engines if engine not in ENGINES]
+    if unknown:
+        parser.error(f"unknown engines: {', '.join(unknown)}")
+    concurrencies = sorted({int(n) for n in args.concurrency.split(',')})
+
+    with FakeNetwork(args.address, args.first_port, args.ports, args.open, args.filtered, args.seed) as network:
+        print(f"Fake network on {network.address}:{network.first_port}-{network.last_port}: "
+              f"{len(network.open_ports)} open, {len(network.filtered_ports)} filtered", file=sys.stderr)
+        results = benchmark(network, engines, concurrencies, args.timeout, args.adaptive_timeout, args.repeat)
+    output = args.output or time.strftime('benchmark-%Y%m%d-%H%M%S.json')
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump({
+            'version': RESULTS_VERSION,
+            'created': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'results': results,
+        }, f, indent=2)
+    print(f"Results written to {output}", file=sys.stderr)
+
+    if args.compare and compare(results, args.compare, args.threshold):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
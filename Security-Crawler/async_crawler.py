@@ -0,0 +1,283 @@
+import argparse
+import asyncio
+import heapq
+import urllib.parse
+from collections import deque
+
+import aiohttp
+
+from crawler import ALLOWED_DOMAINS, SEED_URLS, Crawler
+from robots_cache import robots_url
+
+
+class AsyncCrawler(Crawler):
+    """
+    Concurrent crawler running on asyncio and aiohttp.
+
+    URLs taken from the frontier are queued per host, and a pool of workers
+    always takes the host whose politeness delay expired first. The delay therefore applies
+    between two pages of the same host, while different hosts are fetched
+    in parallel. All requests share one aiohttp session whose connector keeps
+    connections alive between the pages of a host and caps the connections
+    open at once. robots.txt files are fetched on the same session, once per
+    host while their cache entry is fresh, and a Crawl-delay they set
+    lengthens the delay of their host.
+    """
+
+    KEEPALIVE_TIMEOUT = 60  # seconds an idle connection is kept, longer than the politeness delay
+    BUFFER_LIMIT = 10_000  # URLs taken from the frontier into the host queues at most
+    HOST_BUFFER = 100  # URLs of one host in its queue at most, the rest wait in its backlog
+    BACKLOG_LIMIT = 100_000  # URLs of saturated hosts held in their backlogs at most
+
+    def __init__(self, seed_urls, allowed_domains, output_dir="crawled_data", concurrency=10,
+                 max_pages=None, timeout=10, robots_cache_file=None):
+        """
+        Initialize the AsyncCrawler.
+
+        Args:
+            seed_urls (list): List of starting URLs.
+            allowed_domains (list): List of domains to stay within.
+            output_dir (str, optional): Directory to save crawled data. Defaults to "crawled_data".
+            concurrency (int, optional): Pages fetched at once across all hosts. Defaults to 10.
+            max_pages (int, optional): Stop after saving this many pages. Defaults to no limit.
+            timeout (float, optional): Timeout of each request in seconds. Defaults to 10.
+            robots_cache_file (str, optional): JSON file keeping the robots.txt rules between runs.
+        """
+        super().__init__(seed_urls, allowed_domains, output_dir, robots_cache_file)
+        self.concurrency = concurrency
+        self.max_pages = max_pages
+        self.timeout = timeout
+        self.host_queues = {}  # host -> deque of URLs taken from the frontier for that host
+        self.buffered = 0  # URLs in the host queues
+        self.backlogs = {}  # host -> deque of its URLs past HOST_BUFFER, moved to its queue as it drains
+        self.backlogged = 0  # URLs in the backlogs
+        self.schedule = []  # heap of (time the host may be fetched again, host) for idle hosts with URLs
+        self.next_fetch = {}  # host -> earliest time of its next fetch
+        self.busy_hosts = set()  # hosts a worker is fetching from, they are out of the schedule
+        self.robots_locks = {}  # robots.txt URL -> lock held while it is fetched
+        self.active = 0
+        self.wakeup = None
+
+    @staticmethod
+    def get_host(url):
+        """
+        Return the host a URL is queued under.
+
+        Args:
+            url (str): URL.
+
+        Returns:
+            str: Lowercase network location of the URL.
+        """
+        return urllib.parse.urlsplit(url).netloc.lower()
+
+    def enqueue(self, url):
+        """
+        Queue a URL in the frontier unless it was queued before.
+
+        Args:
+            url (str): URL to crawl.
+        """
+        if self.frontier.add(url) and self.wakeup is not None:
+            self.wakeup.set()
+
+    def can_refill(self):
+        """whether the frontier has URLs and both the buffer and the backlogs have room"""
+        return bool(self.frontier) and self.buffered < self.BUFFER_LIMIT and self.backlogged < self.BACKLOG_LIMIT
+
+    def refill(self):
+        """
+        Move URLs from the frontier to the queues of their hosts.
+
+        A host has at most HOST_BUFFER URLs queued, so that one large site
+        cannot take the whole buffer while the other hosts wait behind it in
+        the frontier. Its next URLs are kept in memory in its backlog, never
+        returned to the frontier, and refilling stops once the buffer or the
+        backlogs are full until pages are fetched.
+        """
+        while self.can_refill():
+            url = self.frontier.pop()
+            host = self.get_host(url)
+            queue = self.host_queues.setdefault(host, deque())
+            if len(queue) >= self.HOST_BUFFER:
+                self.backlogs.setdefault(host, deque()).append(url)
+                self.backlogged += 1
+                continue
+            if not queue and host not in self.busy_hosts:
+                heapq.heappush(self.schedule, (self.next_fetch.get(host, 0), host))
+            queue.append(url)
+            self.buffered += 1
+
+    async def can_crawl_async(self, session, url):
+        """
+        Check if crawling is allowed by robots.txt, fetching it without blocking the event loop.
+
+        Args:
+            session (aiohttp.ClientSession): Session of the crawl.
+            url (str): URL to check.
+
+        Returns:
+            bool: True if crawling is allowed, False otherwise.
+        """
+        rules = self.robots.lookup(url)
+        if rules is None:
+            key = robots_url(url)
+            # the workers on other URLs of the host wait for the first fetch instead of repeating it
+            async with self.robots_locks.setdefault(key, asyncio.Lock()):
+                rules = self.robots.lookup(url)
+                if rules is None:
+                    try:
+                        async with session.get(key) as response:
+                            body = await response.content.read(self.robots.MAX_SIZE) if response.status == 200 else b''
+                            rules = self.robots.store(url, response.status, body)
+                    except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                        print(f"Error reading robots.txt from {key}: {e}")
+                        rules = self.robots.store(url, None)
+        return rules.can_fetch(self.USER_AGENT, url)
+
+    def done(self):
+        """whether the crawl is over: nothing queued and nothing in flight, or the page limit reached"""
+        if self.max_pages is not None and self.page_count >= self.max_pages:
+            return True
+        return not self.schedule and not self.active and not self.frontier
+
+    async def fetch(self, session, url):
+        """
+        Fetch, parse and save one page, and queue its links.
+
+        Args:
+            session (aiohttp.ClientSession): Session of the crawl.
+            url (str): URL of the page.
+        """
+        if not self.in_allowed_domains(url):
+            print(f"Skipping URL outside allowed domains: {url}")
+            return
+
+        if not await self.can_crawl_async(session, url):
+            print(f"Robots.txt disallows crawling: {url}")
+            return
+
+        try:
+            print(f"Crawling: {url}")
+            async with session.get(url) as response:
+                response.raise_for_status()
+                # undecodable bytes must not end the crawl, like requests' lenient decoding
+                html_content = await response.text(errors='replace')
+                # relative links resolve against the final URL, after redirects such as /docs -> /docs/
+                base_url = str(response.url)
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            print(f"Error crawling (request failed) {url}: {e}")
+            return
+
+        try:
+            # parsing is CPU bound, keep the event loop serving the other workers
+            page = await asyncio.get_running_loop().run_in_executor(None, self.parse_page, base_url, html_content)
+            if page:
+                article_text, links = page
+                if self.max_pages is None or self.page_count < self.max_pages:
+                    self.save_page(url, article_text)
+                for link in links:
+                    self.enqueue(link)
+            else:
+                print(f"Skipping text/link extraction for {url} due to BeautifulSoup parsing error.")
+        except Exception as e:
+            print(f"Error processing (other) {url}: {e}")
+
+    async def worker(self, session):
+        """
+        Fetch pages from the host whose delay expired first until the crawl is over.
+
+        Args:
+            session (aiohttp.ClientSession): Session of the crawl.
+        """
+        loop = asyncio.get_running_loop()
+        while True:
+            if self.can_refill():
+                self.refill()
+            if self.done():
+                break
+            if not self.schedule:
+                # only a page in flight can queue more URLs
+                self.wakeup.clear()
+                await self.wakeup.wait()
+                continue
+            ready_at, host = self.schedule[0]
+            delay = ready_at - loop.time()
+            if delay > 0:
+                self.wakeup.clear()
+                try:
+                    await asyncio.wait_for(self.wakeup.wait(), delay)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            heapq.heappop(self.schedule)
+            queue = self.host_queues[host]
+            url = queue.popleft()
+            self.buffered -= 1
+            backlog = self.backlogs.get(host)
+            if backlog:
+                queue.append(backlog.popleft())
+                self.buffered += 1
+                self.backlogged -= 1
+                if not backlog:
+                    del self.backlogs[host]
+            self.busy_hosts.add(host)
+            self.active += 1
+            try:
+                await self.fetch(session, url)
+            except Exception as e:
+                # one bad page must not stop this worker, nor the gather of the crawl
+                print(f"Error processing (other) {url}: {e}")
+            finally:
+                self.active -= 1
+                self.busy_hosts.discard(host)
+                self.next_fetch[host] = loop.time() + self.politeness_delay(url)
+                if queue:
+                    heapq.heappush(self.schedule, (self.next_fetch[host], host))
+                else:
+                    del self.host_queues[host]
+                if len(self.next_fetch) > self.BUFFER_LIMIT:
+                    # forget the hosts whose delay is over
+                    now = loop.time()
+                    self.next_fetch = {other: ready for other, ready in self.next_fetch.items() if ready > now}
+                self.wakeup.set()
+        # let the idle workers see that the crawl is over
+        self.wakeup.set()
+
+    async def crawl(self):
+        """
+        Run the crawl with a pool of workers sharing one session.
+        """
+        self.wakeup = asyncio.Event()
+        connector = aiohttp.TCPConnector(limit=self.concurrency, keepalive_timeout=self.KEEPALIVE_TIMEOUT)
+        async with aiohttp.ClientSession(connector=connector,
+                                         headers={'User-Agent': self.USER_AGENT},
+                                         timeout=aiohttp.ClientTimeout(total=self.timeout)) as session:
+            await asyncio.gather(*(self.worker(session) for _ in range(self.concurrency)))
+
+    def run_crawler(self):
+        """
+        Run the main crawling loop.
+        """
+        try:
+            asyncio.run(self.crawl())
+        finally:
+            self.robots.save()
+            self.frontier.close()
+        print("Crawling finished.")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Concurrent security-focused web crawler')
+    parser.add_argument('--concurrency', type=int, default=10,
+                        help='Pages fetched at once across all hosts (default: 10)')
+    parser.add_argument('--max-pages', type=int, help='Stop after saving this many pages')
+    parser.add_argument('--output-dir', default='security_crawl_data_oop',
+                        help='Directory the page texts are saved in (default: security_crawl_data_oop)')
+    parser.add_argument('--robots-cache', default='robots_cache.json',
+                        help='JSON file keeping robots.txt rules between runs (default: robots_cache.json)')
+    args = parser.parse_args()
+
+    crawler = AsyncCrawler(SEED_URLS, ALLOWED_DOMAINS, args.output_dir, args.concurrency, args.max_pages,
+                           robots_cache_file=args.robots_cache)
+    crawler.run_crawler()
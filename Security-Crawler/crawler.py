@@ -2,10 +2,11 @@ import requests
 from bs4 import BeautifulSoup
 import urllib.parse
 import time
-from urllib.robotparser import RobotFileParser
-from collections import deque
 import os
 
+from frontier import Frontier
+from robots_cache import RobotsCache, robots_url
+
 class Crawler:
     """
     A scalable web crawler for security-focused data collection.
@@ -14,7 +15,7 @@ class Crawler:
     USER_AGENT = "SecurityLLMCrawler/1.2 (+your-email@example.com)"  # Replace with your contact
     DEFAULT_CRAWL_DELAY = 2  # seconds
 
-    def __init__(self, seed_urls, allowed_domains, output_dir="crawled_data"):
+    def __init__(self, seed_urls, allowed_domains, output_dir="crawled_data", robots_cache_file=None):
         """
         Initialize the Crawler.
 
@@ -22,13 +23,15 @@ class Crawler:
             seed_urls (list): List of starting URLs.
             allowed_domains (list): List of domains to stay within.
             output_dir (str, optional): Directory to save crawled data. Defaults to "crawled_data".
+            robots_cache_file (str, optional): JSON file keeping the robots.txt rules between runs.
         """
         self.seed_urls = seed_urls
         self.allowed_domains = allowed_domains
         self.output_dir = output_dir
-        self.url_queue = deque(seed_urls)
-        self.visited_urls = set()
+        self.frontier = Frontier(seed_urls)
         self.crawl_delay = self.DEFAULT_CRAWL_DELAY
+        self.page_count = 0
+        self.robots = RobotsCache(self.USER_AGENT, path=robots_cache_file)
         os.makedirs(self.output_dir, exist_ok=True)
 
     @staticmethod
@@ -42,28 +45,128 @@ class Crawler:
         Returns:
             str: robots.txt URL.
         """
-        parsed_url = urllib.parse.urlparse(url)
-        return urllib.parse.urljoin(f"{parsed_url.scheme}://{parsed_url.netloc}", "/robots.txt")
+        return robots_url(url)
 
     def can_crawl(self, url):
         """
         Check if crawling is allowed by robots.txt for the given URL.
 
+        The robots.txt of each host is fetched once and cached; hosts without one
+        are crawled freely, hosts whose robots.txt is unreachable not at all.
+
         Args:
             url (str): URL to check.
 
         Returns:
             bool: True if crawling is allowed, False otherwise.
         """
-        robots_url = self.get_robots_url(url)
-        rp = RobotFileParser()
-        rp.set_url(robots_url)
+        return self.robots.get(url).can_fetch(self.USER_AGENT, url)
+
+    def politeness_delay(self, url):
+        """
+        Return the delay to wait after fetching a URL before fetching from its host again.
+
+        Args:
+            url (str): URL fetched.
+
+        Returns:
+            float: The crawl delay, or the Crawl-delay of the host's robots.txt if longer.
+        """
+        return max(self.crawl_delay, self.robots.crawl_delay(url) or 0)
+
+    def in_allowed_domains(self, url):
+        """
+        Check if a URL belongs to one of the allowed domains.
+
+        Args:
+            url (str): URL to check.
+
+        Returns:
+            bool: True if the URL is inside the allowed domains.
+        """
+        return any(domain in url for domain in self.allowed_domains)
+
+    @staticmethod
+    def extract_text(url, soup):
+        """
+        Extract the article text of a parsed page.
+
+        Args:
+            url (str): URL of the page, selecting the site-specific extraction.
+            soup (BeautifulSoup): Parsed page.
+
+        Returns:
+            str: Extracted text, one block per line.
+        """
+        article_text = ""
+
+        # **--- Conditional Text Extraction based on Website ---**
+        if "thehackernews.com" in url:
+            # For thehackernews.com, extract titles and descriptions
+            titles = soup.find_all('h2', class_='home-title')
+            descriptions = soup.find_all('div', class_='home-desc')
+
+            for title in titles:
+                article_text += title.text.strip() + "\n"
+            for desc in descriptions:
+                article_text += desc.text.strip() + "\n"
+            return article_text
+
+        # securityweek.com, nist.gov, darkreading.com and other websites: <p> tags for now,
+        # add site-specific selectors here based on inspection
+        for p in soup.find_all('p'):
+            article_text += p.text.strip() + "\n"
+        return article_text
+
+    def extract_links(self, url, soup):
+        """
+        Extract the links of a parsed page that stay within the allowed domains.
+
+        Args:
+            url (str): URL of the page, the base of relative links.
+            soup (BeautifulSoup): Parsed page.
+
+        Returns:
+            list: Absolute URLs within the allowed domains.
+        """
+        links = []
+        for link in soup.find_all('a', href=True):
+            absolute_url = urllib.parse.urljoin(url, link['href'])
+            if self.in_allowed_domains(absolute_url):
+                links.append(absolute_url)
+        return links
+
+    def parse_page(self, url, html_content):
+        """
+        Parse a fetched page into its text and links.
+
+        Args:
+            url (str): URL of the page.
+            html_content (str): HTML of the page.
+
+        Returns:
+            tuple: (text, links), or None if the HTML could not be parsed.
+        """
         try:
-            rp.read()  # Might raise errors if robots.txt is unavailable
-            return rp.can_fetch(self.USER_AGENT, url)
-        except Exception as e:
-            print(f"Error reading robots.txt from {robots_url}: {e}")
-            return True  # Be permissive if robots.txt is unavailable (or handle more strictly)
+            soup = BeautifulSoup(html_content, 'html.parser')
+        except Exception as soup_error:
+            print(f"Error parsing HTML with BeautifulSoup for {url}: {soup_error}")
+            return None
+        return self.extract_text(url, soup), self.extract_links(url, soup)
+
+    def save_page(self, url, article_text):
+        """
+        Save the text extracted from a page to the next numbered file.
+
+        Args:
+            url (str): URL of the page.
+            article_text (str): Extracted text.
+        """
+        self.page_count += 1
+        filename = os.path.join(self.output_dir, f"page_{self.page_count}.txt")
+        with open(filename, 'w', encoding='utf-8') as f:
+            f.write(f"URL: {url}\n\n")
+            f.write(article_text)
 
     def crawl_page(self, url):
         """
@@ -72,17 +175,12 @@ class Crawler:
         Args:
             url (str): URL of the page to crawl.
         """
-        if url in self.visited_urls:
-            return
-
-        if not any(domain in url for domain in self.allowed_domains):
+        if not self.in_allowed_domains(url):
             print(f"Skipping URL outside allowed domains: {url}")
-            self.visited_urls.add(url)
             return
 
         if not self.can_crawl(url):
             print(f"Robots.txt disallows crawling: {url}")
-            self.visited_urls.add(url)
             return
 
         try:
@@ -90,69 +188,18 @@ class Crawler:
             headers = {'User-Agent': self.USER_AGENT}
             response = requests.get(url, headers=headers, timeout=10)
             response.raise_for_status()
-            html_content = response.text
-
-            soup = None
-            try:
-                soup = BeautifulSoup(html_content, 'html.parser')
-            except Exception as soup_error:
-                print(f"Error parsing HTML with BeautifulSoup for {url}: {soup_error}")
-                soup = None
-
-            article_text = "" # Initialize outside the if soup block
-
-            if soup:
-                # **--- Conditional Text Extraction based on Website ---**
-                if "thehackernews.com" in url:
-                    # For thehackernews.com, extract titles and descriptions
-                    titles = soup.find_all('h2', class_='home-title')
-                    descriptions = soup.find_all('div', class_='home-desc')
-
-                    for title in titles:
-                        article_text += title.text.strip() + "\n"
-                    for desc in descriptions:
-                        article_text += desc.text.strip() + "\n"
-
-                elif "securityweek.com" in url: # Example for securityweek.com - adjust selectors based on inspection
-                    # Add specific selectors for securityweek.com if needed, else fall through to default
-                    paragraphs = soup.find_all('p') # Default to <p> tags for securityweek.com for now
-
-                elif "nist.gov" in url: # Example for nist.gov - adjust selectors based on inspection
-                    # Add specific selectors for nist.gov if needed, else fall through to default
-                    paragraphs = soup.find_all('p') # Default to <p> tags for nist.gov for now
-
-                elif "darkreading.com" in url: # Example for darkreading.com - adjust selectors based on inspection
-                    # Add specific selectors for darkreading.com if needed, else fall through to default
-                    paragraphs = soup.find_all('p') # Default to <p> tags for darkreading.com for now
-
-                else:
-                    # Default: Extract <p> tags (for other websites, adjust as needed)
-                    paragraphs = soup.find_all('p')
-                    for p in paragraphs:
-                        article_text += p.text.strip() + "\n"
-
-                if "thehackernews.com" not in url: # Only loop through paragraphs if not thehackernews (already handled titles/descriptions)
-                    if 'paragraphs' in locals(): # Check if paragraphs variable is defined (might not be in all conditions)
-                        for p in paragraphs:
-                            article_text += p.text.strip() + "\n"
-
-                # Save the extracted text
-                filename = os.path.join(self.output_dir, f"page_{len(self.visited_urls) + 1}.txt")
-                with open(filename, 'w', encoding='utf-8') as f:
-                    f.write(f"URL: {url}\n\n")
-                    f.write(article_text)
-
-                # **--- Extract Links (No changes needed here) ---**
-                links = soup.find_all('a', href=True)
+
+            # relative links resolve against the final URL, after redirects such as /docs -> /docs/
+            page = self.parse_page(response.url, response.text)
+            if page:
+                article_text, links = page
+                self.save_page(url, article_text)
                 for link in links:
-                    absolute_url = urllib.parse.urljoin(url, link['href'])
-                    if any(domain in absolute_url for domain in self.allowed_domains) and absolute_url not in self.visited_urls:
-                        self.url_queue.append(absolute_url)
+                    self.frontier.add(link)
             else:
                 print(f"Skipping text/link extraction for {url} due to BeautifulSoup parsing error.")
 
-            self.visited_urls.add(url)
-            time.sleep(self.crawl_delay)
+            time.sleep(self.politeness_delay(url))
 
         except requests.exceptions.RequestException as e:
             print(f"Error crawling (request failed) {url}: {e}")
@@ -162,27 +209,35 @@ class Crawler:
     def run_crawler(self):
         """
         Run the main crawling loop.
+
+        Each URL is crawled once: the frontier drops links to pages already queued.
         """
-        while self.url_queue:
-            current_url = self.url_queue.popleft()
-            self.crawl_page(current_url)
+        try:
+            while self.frontier:
+                current_url = self.frontier.pop()
+                self.crawl_page(current_url)
+        finally:
+            self.robots.save()
+            self.frontier.close()
         print("Crawling finished.")
 
 
+SEED_URLS = [
+    "https://www.securityweek.com/",
+    "https://thehackernews.com/",
+    "https://www.nist.gov/nvd",
+    "https://www.darkreading.com/"
+]
+ALLOWED_DOMAINS = [
+    "securityweek.com",
+    "thehackernews.com",
+    "nist.gov",
+    "nvd.nist.gov",
+    "darkreading.com"
+]
+
+
 if __name__ == "__main__":
-    seed_urls = [
-        "https://www.securityweek.com/",
-        "https://thehackernews.com/",
-        "https://www.nist.gov/nvd",
-        "https://www.darkreading.com/"
-    ]
-    allowed_domains = [
-        "securityweek.com",
-        "thehackernews.com",
-        "nist.gov",
-        "nvd.nist.gov",
-        "darkreading.com"
-    ]
-
-    crawler = Crawler(seed_urls, allowed_domains, output_dir="security_crawl_data_oop")
-    crawler.run_crawler()
\ No newline at end of file
+    crawler = Crawler(SEED_URLS, ALLOWED_DOMAINS, output_dir="security_crawl_data_oop",
+                      robots_cache_file="robots_cache.json")
+    crawler.run_crawler()
@@ -0,0 +1,209 @@
+import hashlib
+import os
+import sqlite3
+import tempfile
+import urllib.parse
+from collections import deque
+
+DEFAULT_PORTS = {'http': 80, 'https': 443}
+
+
+def canonicalize_url(url):
+    """
+    Normalize a URL so that the spellings of one page compare equal.
+
+    The scheme and host are lowercased, a default port, the fragment and a
+    trailing slash of the path are dropped, and the query parameters are
+    sorted by name, keeping their encoding and the order of repeated names.
+
+    Args:
+        url (str): Absolute URL.
+
+    Returns:
+        str: Canonical URL.
+    """
+    parts = urllib.parse.urlsplit(url.strip())
+    scheme = parts.scheme.lower()
+    netloc = parts.netloc
+    userinfo, at, hostport = netloc.rpartition('@')
+    hostport = hostport.lower()
+    try:
+        port = parts.port
+    except ValueError:
+        port = None
+    if port is not None and port == DEFAULT_PORTS.get(scheme):
+        hostport = hostport.rsplit(':', 1)[0]
+    netloc = f"{userinfo}{at}{hostport}"
+    path = parts.path.rstrip('/') or '/'
+    params = sorted((param for param in parts.query.split('&') if param), key=lambda param: param.split('=', 1)[0])
+    return urllib.parse.urlunsplit((scheme, netloc, path, '&'.join(params), ''))
+
+
+def url_hash(url):
+    """
+    Return the 64-bit fingerprint a URL is remembered by.
+
+    Args:
+        url (str): Canonical URL.
+
+    Returns:
+        int: Signed 64-bit hash, the range of an SQLite integer.
+    """
+    return int.from_bytes(hashlib.blake2b(url.encode('utf-8'), digest_size=8).digest(), 'big', signed=True)
+
+
+class Frontier:
+    """
+    First-in first-out queue of the URLs to crawl, each URL queued at most once.
+
+    The canonical form of a URL is only its key: it is checked against the
+    keys of every URL queued before, so links to pages already crawled or
+    waiting are dropped on the spot, while the URL itself is queued as found,
+    less its fragment, since it is fetched and relative links resolve against
+    it (the canonical /docs is not the directory /docs/). The
+    fingerprints of the URLs seen and the queue itself are held in memory up
+    to memory_limit entries each, then move to an SQLite file, so memory stays
+    flat however many URLs the crawl discovers. Fingerprints are 64-bit
+    hashes: unlike a Bloom filter no page is skipped by a false positive,
+    short of a hash collision.
+    """
+
+    MEMORY_LIMIT = 500_000  # URLs seen, and URLs queued, kept in memory before moving to disk
+    COMMIT_INTERVAL = 10_000  # writes to the SQLite file between two commits
+
+    def __init__(self, urls=(), memory_limit=MEMORY_LIMIT, path=None):
+        """
+        Initialize the Frontier.
+
+        Args:
+            urls (iterable, optional): URLs queued first.
+            memory_limit (int, optional): Entries of the seen set and of the queue kept in memory.
+            path (str, optional): SQLite file used past the limit, a temporary file removed by close by default.
+        """
+        self.memory_limit = memory_limit
+        self.path = path
+        self.temporary = path is None
+        self.db = None
+        self.seen = set()  # fingerprints of the URLs queued so far, until they move to disk
+        self.queue = deque()  # head of the queue, older than any URL queued on disk
+        self.size = 0
+        self.on_disk = 0  # URLs queued on disk
+        self.writes = 0
+        for url in urls:
+            self.add(url)
+
+    def open_store(self):
+        """
+        Create the SQLite file the seen set and the tail of the queue spill to.
+        """
+        if self.temporary:
+            fd, self.path = tempfile.mkstemp(prefix='frontier-', suffix='.sqlite')
+            os.close(fd)
+        self.db = sqlite3.connect(self.path)
+        # scratch data, rebuilt by every crawl: no journal, no syncing
+        self.db.execute("PRAGMA journal_mode=OFF")
+        self.db.execute("PRAGMA synchronous=OFF")
+        self.db.execute("DROP TABLE IF EXISTS seen")
+        self.db.execute("DROP TABLE IF EXISTS queue")
+        self.db.execute("CREATE TABLE seen (hash INTEGER PRIMARY KEY)")
+        self.db.execute("CREATE TABLE queue (id INTEGER PRIMARY KEY AUTOINCREMENT, url TEXT NOT NULL)")
+
+    def written(self, count=1):
+        """commit the SQLite file every COMMIT_INTERVAL writes"""
+        self.writes += count
+        if self.writes >= self.COMMIT_INTERVAL:
+            self.db.commit()
+            self.writes = 0
+
+    def mark_seen(self, url):
+        """
+        Record a URL as seen.
+
+        Args:
+            url (str): Canonical URL.
+
+        Returns:
+            bool: True if the URL was not seen before.
+        """
+        fingerprint = url_hash(url)
+        if self.seen is not None:
+            if fingerprint in self.seen:
+                return False
+            self.seen.add(fingerprint)
+            if len(self.seen) > self.memory_limit:
+                if self.db is None:
+                    self.open_store()
+                self.db.executemany("INSERT OR IGNORE INTO seen VALUES (?)", ((value,) for value in self.seen))
+                self.written(len(self.seen))
+                self.seen = None
+            return True
+        cursor = self.db.execute("INSERT OR IGNORE INTO seen VALUES (?)", (fingerprint,))
+        self.written()
+        return cursor.rowcount == 1
+
+    def add(self, url):
+        """
+        Queue a URL unless it was queued before.
+
+        Args:
+            url (str): Absolute URL.
+
+        Returns:
+            bool: True if the URL was queued.
+        """
+        if not self.mark_seen(canonicalize_url(url)):
+            return False
+        self.push(urllib.parse.urldefrag(url.strip())[0])
+        return True
+
+    def push(self, url):
+        """
+        Queue a URL at the back without checking it against the seen set.
+
+        Args:
+            url (str): URL to crawl.
+        """
+        if not self.on_disk and len(self.queue) < self.memory_limit:
+            self.queue.append(url)
+        else:
+            if self.db is None:
+                self.open_store()
+            self.db.execute("INSERT INTO queue (url) VALUES (?)", (url,))
+            self.written()
+            self.on_disk += 1
+        self.size += 1
+
+    def pop(self):
+        """
+        Take the URL queued first.
+
+        Returns:
+            str: URL as queued, without its fragment.
+
+        Raises:
+            IndexError: If the frontier is empty.
+        """
+        if not self.queue and self.on_disk:
+            rows = self.db.execute("SELECT id, url FROM queue ORDER BY id LIMIT ?", (self.memory_limit,)).fetchall()
+            self.db.execute("DELETE FROM queue WHERE id <= ?", (rows[-1][0],))
+            self.written(len(rows))
+            self.queue.extend(url for _, url in rows)
+            self.on_disk -= len(rows)
+        url = self.queue.popleft()
+        self.size -= 1
+        return url
+
+    def __len__(self):
+        return self.size
+
+    def close(self):
+        """
+        Close the SQLite file, removing it if it is temporary.
+        """
+        if self.db is None:
+            return
+        self.db.close()
+        self.db = None
+        if self.temporary:
+            os.remove(self.path)
+            self.path = None
@@ -0,0 +1,202 @@
+import json
+import os
+import time
+import urllib.parse
+from urllib.robotparser import RobotFileParser
+
+import requests
+
+
+def robots_url(url):
+    """
+    Construct the robots.txt URL for a given website URL.
+
+    Args:
+        url (str): Website URL.
+
+    Returns:
+        str: robots.txt URL, also the key of the host in the cache.
+    """
+    parsed_url = urllib.parse.urlparse(url)
+    return urllib.parse.urljoin(f"{parsed_url.scheme}://{parsed_url.netloc.lower()}", "/robots.txt")
+
+
+class RobotsCache:
+    """
+    robots.txt rules of every host, fetched once and kept until they expire.
+
+    Hosts answering 404 or another client error are cached as allowing
+    everything, 401 and 403 as disallowing everything, like RobotFileParser
+    does. A server error or an unreachable robots.txt means a complete
+    disallow (RFC 9309), cached for a shorter time so that the host is
+    retried later but not asked again for every URL.
+    Entries hold the raw robots.txt text and can be saved to and loaded
+    from a JSON file between runs.
+    """
+
+    TTL = 24 * 3600  # seconds a fetched robots.txt, or its absence, is trusted
+    ERROR_TTL = 3600  # seconds a failed fetch, disallowing everything, is cached
+    MAX_SIZE = 500 * 1024  # bytes of robots.txt parsed at most
+
+    def __init__(self, user_agent, ttl=TTL, error_ttl=ERROR_TTL, path=None):
+        """
+        Initialize the RobotsCache.
+
+        Args:
+            user_agent (str): User agent the rules are checked for.
+            ttl (float, optional): Seconds a robots.txt answer is cached. Defaults to 24 hours.
+            error_ttl (float, optional): Seconds a failed fetch is cached. Defaults to 1 hour.
+            path (str, optional): JSON file the cache is loaded from, if it exists, and saved to.
+        """
+        self.user_agent = user_agent
+        self.ttl = ttl
+        self.error_ttl = error_ttl
+        self.path = path
+        self.entries = {}  # robots.txt URL -> {'status': HTTP status or None, 'text': str, 'expires': timestamp}
+        self.parsers = {}  # robots.txt URL -> RobotFileParser built from its entry
+        if path and os.path.exists(path):
+            self.load(path)
+
+    def lookup(self, url):
+        """
+        Return the cached rules of the host of a URL.
+
+        Args:
+            url (str): URL on the host.
+
+        Returns:
+            RobotFileParser: Rules of the host, or None if they are not cached or expired.
+        """
+        key = robots_url(url)
+        entry = self.entries.get(key)
+        if entry is None or entry['expires'] <= time.time():
+            return None
+        parser = self.parsers.get(key)
+        if parser is None:
+            parser = self.parsers[key] = self._build_parser(entry)
+        return parser
+
+    def store(self, url, status, body=b''):
+        """
+        Cache the answer to a robots.txt request.
+
+        Args:
+            url (str): URL on the host.
+            status (int): HTTP status of the answer, None if the request failed.
+            body (bytes, optional): Body of the answer.
+
+        Returns:
+            RobotFileParser: Rules of the host.
+        """
+        key = robots_url(url)
+        entry = {
+            'status': status,
+            'text': body[:self.MAX_SIZE].decode('utf-8', errors='replace') if status == 200 else '',
+            'expires': time.time() + (self.error_ttl if self._failed(status) else self.ttl),
+        }
+        self.entries[key] = entry
+        parser = self.parsers[key] = self._build_parser(entry)
+        return parser
+
+    @staticmethod
+    def _failed(status):
+        """whether a robots.txt request failed: no answer or a server error"""
+        return status is None or status >= 500
+
+    @classmethod
+    def _build_parser(cls, entry):
+        parser = RobotFileParser()
+        status = entry['status']
+        if status in (401, 403) or cls._failed(status):
+            parser.disallow_all = True
+        elif status == 200:
+            parser.parse(entry['text'].splitlines())
+        else:
+            # no robots.txt: everything is allowed
+            parser.allow_all = True
+        return parser
+
+    def fetch(self, url, timeout=10):
+        """
+        Download the robots.txt of the host of a URL and cache it.
+
+        Args:
+            url (str): URL on the host.
+            timeout (float, optional): Request timeout in seconds. Defaults to 10.
+
+        Returns:
+            RobotFileParser: Rules of the host.
+        """
+        key = robots_url(url)
+        try:
+            response = requests.get(key, headers={'User-Agent': self.user_agent}, timeout=timeout)
+        except requests.exceptions.RequestException as e:
+            print(f"Error reading robots.txt from {key}: {e}")
+            return self.store(url, None)
+        return self.store(url, response.status_code, response.content)
+
+    def get(self, url):
+        """
+        Return the rules of the host of a URL, fetching them if they are not cached.
+
+        Args:
+            url (str): URL on the host.
+
+        Returns:
+            RobotFileParser: Rules of the host.
+        """
+        return self.lookup(url) or self.fetch(url)
+
+    def crawl_delay(self, url):
+        """
+        Return the delay the host of a URL asks for between two requests.
+
+        Args:
+            url (str): URL on the host.
+
+        Returns:
+            float: Crawl-delay, or the interval of Request-rate, in seconds; None if the
+            host sets neither or its rules are not cached.
+        """
+        parser = self.lookup(url)
+        if parser is None:
+            return None
+        delay = parser.crawl_delay(self.user_agent)
+        if delay is not None:
+            return float(delay)
+        rate = parser.request_rate(self.user_agent)
+        if rate is not None and rate.requests:
+            return rate.seconds / rate.requests
+        return None
+
+    def load(self, path):
+        """
+        Load the unexpired entries of a JSON file written by save.
+
+        Args:
+            path (str): JSON file.
+        """
+        with open(path, 'r', encoding='utf-8') as f:
+            entries = json.load(f)
+        now = time.time()
+        for key, entry in entries.items():
+            if entry['expires'] > now:
+                self.entries[key] = entry
+                self.parsers.pop(key, None)
+
+    def save(self, path=None):
+        """
+        Save the unexpired entries to a JSON file.
+
+        Args:
+            path (str, optional): JSON file, the path the cache was created with by default.
+        """
+        path = path or self.path
+        if not path:
+            return
+        now = time.time()
+        entries = {key: entry for key, entry in self.entries.items() if entry['expires'] > now}
+        temporary = f"{path}.tmp"
+        with open(temporary, 'w', encoding='utf-8') as f:
+            json.dump(entries, f)
+        os.replace(temporary, path)
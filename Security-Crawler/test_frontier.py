@@ -0,0 +1,81 @@
+import contextlib
+import functools
+import glob
+import io
+import os
+import tempfile
+import threading
+import unittest
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+
+from async_crawler import AsyncCrawler
+from crawler import Crawler
+from frontier import Frontier, canonicalize_url
+
+
+class QuietHandler(SimpleHTTPRequestHandler):
+
+    def log_message(self, format, *args):
+        pass
+
+
+class FrontierTest(unittest.TestCase):
+
+    def test_canonical_key_dedupes_spellings(self):
+        frontier = Frontier()
+        self.assertTrue(frontier.add("HTTP://Example.com:80/docs/?b=2&a=1#top"))
+        self.assertFalse(frontier.add("http://example.com/docs?a=1&b=2"))
+        self.assertEqual(len(frontier), 1)
+        self.assertEqual(canonicalize_url("http://example.com/docs/"), "http://example.com/docs")
+
+    def test_queued_url_keeps_its_path(self):
+        frontier = Frontier(["http://example.com/docs/#intro"])
+        self.assertEqual(frontier.pop(), "http://example.com/docs/")
+
+
+class DirectoryPageTest(unittest.TestCase):
+    """a directory page's relative links resolve below the directory"""
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        os.makedirs(os.path.join(self.root, "docs"))
+        with open(os.path.join(self.root, "docs", "index.html"), "w") as f:
+            f.write('<html><p>docs</p><a href="intro.html">intro</a></html>')
+        with open(os.path.join(self.root, "docs", "intro.html"), "w") as f:
+            f.write('<html><p>intro</p></html>')
+        handler = functools.partial(QuietHandler, directory=self.root)
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.base = f"http://127.0.0.1:{self.server.server_address[1]}"
+        self.output_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def crawled_urls(self):
+        urls = set()
+        for path in glob.glob(os.path.join(self.output_dir, "page_*.txt")):
+            with open(path, encoding="utf-8") as f:
+                urls.add(f.readline().strip().removeprefix("URL: "))
+        return urls
+
+    def check(self, crawler):
+        crawler.crawl_delay = 0
+        with contextlib.redirect_stdout(io.StringIO()):
+            crawler.run_crawler()
+        self.assertIn(f"{self.base}/docs/intro.html", self.crawled_urls())
+
+    def test_directory_seed(self):
+        self.check(Crawler([f"{self.base}/docs/"], ["127.0.0.1"], self.output_dir))
+
+    def test_redirected_directory_seed(self):
+        # /docs is redirected to /docs/, links resolve against the final URL
+        self.check(Crawler([f"{self.base}/docs"], ["127.0.0.1"], self.output_dir))
+
+    def test_async_directory_seed(self):
+        self.check(AsyncCrawler([f"{self.base}/docs/"], ["127.0.0.1"], self.output_dir, concurrency=2))
+
+
+if __name__ == '__main__':
+    unittest.main()
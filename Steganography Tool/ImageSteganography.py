@@ -1,96 +1,239 @@
-from PIL import Image
-import numpy as numpy
 import argparse
+import json
+import struct
+from typing import Optional
 
-class ImageSteganography:
-    def __init__(self):
-        self.delimiter = "$$END$$"
-
-    def text_to_binary(self,text):
-        """convert text to binary string"""
-        binary = ''.join(format(ord(char),'08b') for char in text)
-        return binary + ''.join(format(ord(char),'08b') for char in self.delimiter)
-
-    def binary_to_text(self,binary):
-        """convert binary string to text"""
-        text = ''
-        #convert each 8 bits to a character
-        for i in range(0,len(binary),8):
-            byte = binary[i:i+8]
-            text += chr(int(byte,2))
-            #check for delimiter
-            if text.endswith(self.delimiter):
-                return text[:-len(self.delimiter)]
-        return text
+import numpy as np
+from PIL import Image
 
-    def hide_message(self,image_path:str,message:str,output_path:str)->bool:
-        """hide message in image"""
-        try:
-            #load image
-            img = image.open(image_path)
+#length of the payload in bytes, stored big-endian in front of it
+HEADER = struct.Struct('>I')
+HEADER_BITS = HEADER.size * 8
 
-            #conever image to numpy array
-            pixels = numpy.array(img)
+#modes whose pixels round-trip through a uint8 array unchanged, others are converted to RGB
+SUPPORTED_MODES = ('L', 'RGB', 'RGBA')
 
-            #convert message to binary
-            binary_message = self.text_to_binary(message)
 
-            if len(binary_message) > pixels.size:
-                raise ValueError("Message too long for this image")
+#bits per channel value that may be replaced, more become visible
+MAX_BITS = 4
 
-            #Flatten the array
-            pixels = pixels.flatten()
 
-            #modify the least significant bits
-            for i in range(len(binary_message)):
-                pixels[i] = (pixels[i] & ~1) | int(binary_message[i])
+class ImageSteganography:
+    """hide text in the least significant bits of pixel channels
+
+    The payload is the UTF-8 encoded message behind a 32-bit length header.
+    It is cut into groups of `bits` bits, most significant first, and each
+    group replaces the low bits of one value of the selected channels, in
+    row-major order. With the defaults (one bit, every channel) each bit
+    goes to the next channel value. Pixels are processed in bands of whole
+    rows cropped from the decoded image and pasted back, and only the rows
+    the payload spans are touched, so memory stays at the decoded image
+    plus one band whatever the band size.
+    """
+
+    def __init__(self,band_rows=None,bits=1,channels=None):
+        """initialize the tool
+
+        Args:
+            band_rows (int, optional): rows processed at a time, all the rows the payload spans by default.
+            bits (int, optional): low bits replaced in every channel value, 1 to 4 (default=1).
+            channels (str, optional): channels used, such as 'RGB' or 'B', every channel of the image by default.
+        """
+        if not 1 <= bits <= MAX_BITS:
+            raise ValueError(f"Bits per channel must be between 1 and {MAX_BITS}")
+        self.band_rows = band_rows
+        self.bits = bits
+        self.channels = channels.upper() if channels else None
+
+    def selected_channels(self,bands)->list:
+        """indexes of the channels used among the band names of an image"""
+        if self.channels is None:
+            return list(range(len(bands)))
+        selected = [i for i, band in enumerate(bands) if band in self.channels]
+        if not selected:
+            raise ValueError(f"Image has none of the channels {self.channels} (it has {''.join(bands)})")
+        return selected
+
+    def capacity_of(self,img:Image.Image)->int:
+        """number of message bytes an opened image holds, read from its header only"""
+        bands = img.getbands() if img.mode in SUPPORTED_MODES else ('R','G','B')
+        slots = img.width * img.height * len(self.selected_channels(bands))
+        return max(0,slots * self.bits // 8 - HEADER.size)
+
+    def capacity(self,image_path:str)->int:
+        """number of message bytes an image holds, without decoding its pixels"""
+        with Image.open(image_path) as img:
+            return self.capacity_of(img)
+
+    def load_image(self,image_path:str)->Image.Image:
+        """open an image in a mode whose pixels round-trip through a uint8 array"""
+        img = Image.open(image_path)
+        if img.mode not in SUPPORTED_MODES:
+            img = img.convert('RGB')
+        return img
+
+    def load_pixels(self,image_path:str)->np.ndarray:
+        """load an image as a uint8 array of shape (height, width[, channels])"""
+        return np.array(self.load_image(image_path))
+
+    def encode_payload(self,message:str)->bytes:
+        """return the length header followed by the UTF-8 message"""
+        data = message.encode('utf-8')
+        return HEADER.pack(len(data)) + data
+
+    def bands(self,img:Image.Image,start:int,stop:int):
+        """
+        split the rows holding a range of slots into bands, a slot being one value of a selected channel
+
+        Args:
+            img (Image): image in one of SUPPORTED_MODES
+            start (int): index of the first slot in row-major order
+            stop (int): index after the last slot
+        Yield:
+            (crop box of the band, index of its first slot)
+        """
+        width, height = img.size
+        row_slots = width * len(self.selected_channels(img.getbands()))
+        first_row = start // row_slots
+        end_row = min(height, -(-stop // row_slots))
+        step = self.band_rows or max(1, end_row - first_row)
+        for top in range(first_row, end_row, step):
+            yield (0, top, width, min(top + step, end_row)), top * row_slots
+
+    def read_bits(self,img:Image.Image,start:int,stop:int)->bytes:
+        """pack the payload bits [start, stop) into bytes, stop - start being a multiple of 8"""
+        selected = self.selected_channels(img.getbands())
+        shifts = np.arange(self.bits - 1,-1,-1,dtype=np.uint8)
+        chunks = []
+        pending = np.empty(0,dtype=np.uint8)
+        for box, offset in self.bands(img,start // self.bits,-(-stop // self.bits)):
+            band = np.asarray(img.crop(box))
+            if band.ndim == 2:
+                band = band[:,:,np.newaxis]
+            values = band[:,:,selected].reshape(-1)
+            #the low bits of each value, most significant first
+            bits = ((values[:,np.newaxis] >> shifts) & 1).reshape(-1)
+            first = offset * self.bits
+            bits = bits[max(0,start - first):stop - first]
+            if pending.size:
+                bits = np.concatenate((pending,bits))
+            usable = bits.size - bits.size % 8
+            chunks.append(np.packbits(bits[:usable]).tobytes())
+            pending = bits[usable:]
+        return b''.join(chunks)
 
-            #reshape array back to original shape
-            pixels = pixels.reshape(img.size[1],img.size[0],-1)
+    def hide_message(self,image_path:str,message:str,output_path:str)->bool:
+        """hide message in image"""
+        try:
+            payload = np.frombuffer(self.encode_payload(message),dtype=np.uint8)
+            if payload.size - HEADER.size > self.capacity(image_path):
+                raise ValueError("Message too long for this image")
 
-            #save image
-            result_img = Image.fromarray(pixels)
-            result_img.save(output_path)
+            img = self.load_image(image_path)
+            selected = self.selected_channels(img.getbands())
+            total = payload.size * 8
+            slots = -(-total // self.bits)
+            weights = (1 << np.arange(self.bits - 1,-1,-1)).astype(np.uint8)
+            mask = np.uint8(0xff ^ ((1 << self.bits) - 1))
+
+            #replace the low bits one band at a time
+            for box, offset in self.bands(img,0,slots):
+                band = np.array(img.crop(box))
+                shaped = band[:,:,np.newaxis] if band.ndim == 2 else band
+                values = shaped[:,:,selected].reshape(-1)
+                count = min(values.size,slots - offset)
+                first, last = offset * self.bits, (offset + count) * self.bits
+                bits = np.unpackbits(payload[first // 8:-(-last // 8)])[first % 8:first % 8 + last - first]
+                #the last group is padded with zeros
+                bits = np.pad(bits,(0,last - first - bits.size))
+                values[:count] &= mask
+                values[:count] |= (bits.reshape(-1,self.bits) * weights).sum(axis=1,dtype=np.uint8)
+                shaped[:,:,selected] = values.reshape(shaped.shape[0],shaped.shape[1],len(selected))
+                img.paste(Image.fromarray(band),box)
+
+            #save image, without the metadata of the carrier
+            img.info = {}
+            img.save(output_path)
             return True
         except Exception as e:
             print(f"Error hiding message: {e}")
             return False
 
+    def extract(self,img:Image.Image)->Optional[str]:
+        """return the message hidden in an image opened by load_image, None if there is none"""
+        available = img.width * img.height * len(self.selected_channels(img.getbands())) * self.bits
+        if available < HEADER_BITS:
+            return None
+
+        #read the length, then exactly the bits of the message
+        length, = HEADER.unpack(self.read_bits(img,0,HEADER_BITS))
+        if HEADER_BITS + 8 * length > available:
+            return None
+        try:
+            return self.read_bits(img,HEADER_BITS,HEADER_BITS + 8 * length).decode('utf-8')
+        except UnicodeDecodeError:
+            return None
+
     def reveal_message(self,image_path:str)->str:
         """extract hidden message from an image"""
         try:
-            #load the image
-            img = Image.open(image_path)
-            pixels = np.array(img)
-
-            #extract the LSB of each pixel
-            binary_message = ''
-            pixels = pixels.flatten()
-
-            for pixel in pixels:
-                binary_message += str(pixel & 1)
-                #try to convert to text periodically
-                if len(binary_message) % 8 ==0:
-                    text = self.binary_to_text(binary_message)
-                    if self.delimiter in text:
-                        return text
-            return "No hidden messaeg found"
+            message = self.extract(self.load_image(image_path))
+            return "No hidden message found" if message is None else message
         except Exception as e:
             return f"Error revealing message: {e}"
 
 def main():
     parser = argparse.ArgumentParser(description='Image Steganography Tool')
-    parser.add_argument('--mode', choices=['hide', 'reveal'], required=True,
-                      help='Operation mode: hide or reveal')
-    parser.add_argument('--image', required=True,
-                      help='Path to the image file')
+    parser.add_argument('--mode', choices=['hide', 'reveal', 'capacity', 'scan'], required=True,
+                      help='Operation mode: hide, reveal, show the capacity of an image, '
+                           'or scan a directory for hidden payloads')
+    parser.add_argument('--image',
+                      help='Path to the image file (required for hide, reveal and capacity mode)')
+    parser.add_argument('--dir',
+                      help='Directory scanned recursively (required for scan mode)')
     parser.add_argument('--message', 
                       help='Message to hide (required for hide mode)')
     parser.add_argument('--output',
                       help='Output image path (required for hide mode)')
+    parser.add_argument('--band-rows', type=int,
+                      help='Process the image this many rows at a time to bound memory on huge images')
+    parser.add_argument('--bits', type=int, default=1,
+                      help='Low bits used in every channel value, 1 to 4 (default: 1)')
+    parser.add_argument('--channels',
+                      help='Channels used, such as RGB or B (default: every channel of the image)')
+    parser.add_argument('--workers', type=int,
+                      help='Processes analyzing images in scan mode (default: CPU count)')
     
     args = parser.parse_args()
-    stego = ImageSteganography()
+    if args.band_rows:
+        #huge carriers are what banded processing is for, lift Pillow's decompression bomb limit
+        Image.MAX_IMAGE_PIXELS = None
+    try:
+        stego = ImageSteganography(args.band_rows,args.bits,args.channels)
+    except ValueError as e:
+        print(f"Error: {e}")
+        return
+
+    if args.mode == 'scan':
+        if not args.dir:
+            print("Error: Directory is required for scan mode")
+            return
+        from Steganalysis import scan_directory
+
+        #one JSON object per image, as soon as it is analyzed
+        for result in scan_directory(args.dir,args.workers,stego):
+            print(json.dumps(result),flush=True)
+        return
+    if not args.image:
+        print("Error: Image path is required for hide, reveal and capacity mode")
+        return
+
+    if args.mode == 'capacity':
+        try:
+            print(f"{args.image} holds up to {stego.capacity(args.image)} bytes")
+        except Exception as e:
+            print(f"Error reading image: {e}")
+        return
 
     if args.mode == 'hide':
         if not args.message or not args.output:
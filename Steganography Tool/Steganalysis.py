@@ -0,0 +1,213 @@
+import math
+import os
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, as_completed, wait
+from typing import Iterable, Iterator, Optional
+
+import numpy as np
+
+from ImageSteganography import ImageSteganography
+
+#formats whose pixels keep their least significant bits when saved
+IMAGE_EXTENSIONS = ('.png', '.bmp', '.tif', '.tiff', '.gif', '.webp', '.ppm', '.pgm')
+
+#the chi-square attack runs on this many consecutive windows of the channel values
+CHI_SQUARE_WINDOWS = 20
+
+#p-value above which a window's value pairs count as equalized by embedding
+CHI_SQUARE_THRESHOLD = 0.95
+
+#estimated share of LSBs replaced above which RS analysis flags an image
+RS_THRESHOLD = 0.1
+
+#pixel groups RS analysis samples at most, evenly spread over the image
+RS_MAX_GROUPS = 1 << 20
+
+#RS discrimination mask over groups of four neighbouring values
+RS_MASK = np.array([0, 1, 1, 0], dtype=bool)
+
+#images queued per pool process, so results stream while the walk goes on
+QUEUED_PER_WORKER = 4
+
+
+def chi_square_pvalues(chi2:np.ndarray,df:np.ndarray)->np.ndarray:
+    """upper tail probability of the chi-square distribution (Wilson-Hilferty approximation)"""
+    df = np.maximum(df,1)
+    scale = 2 / (9 * df)
+    z = (np.cbrt(chi2 / df) - (1 - scale)) / np.sqrt(scale)
+    return np.array([0.5 * math.erfc(value / math.sqrt(2)) for value in z])
+
+
+def chi_square_attack(flat:np.ndarray,windows:int = CHI_SQUARE_WINDOWS)->np.ndarray:
+    """
+    Westfeld and Pfitzmann's chi-square attack on consecutive windows of channel values
+
+    LSB replacement equalizes the counts of each value pair (2k, 2k+1), so
+    the p-value of the observed pair counts against their mean goes to 1
+    over the embedded part of the image.
+
+    Args:
+        flat (np.ndarray): channel values in embedding order
+        windows (int, optional): number of windows the values are split into
+    Return:
+        p-value of each window, from the start of the image
+    """
+    size = flat.size // windows
+    if size == 0:
+        return np.zeros(0)
+    counts = np.stack([np.bincount(flat[i * size:(i + 1) * size],minlength=256) for i in range(windows)])
+    pairs = counts.reshape(windows,128,2).astype(np.float64)
+    expected = pairs.mean(axis=2)
+    used = expected > 0
+    with np.errstate(divide='ignore',invalid='ignore'):
+        chi2 = np.where(used,((pairs[:,:,0] - expected) ** 2) / expected,0).sum(axis=1)
+    return chi_square_pvalues(chi2,used.sum(axis=1) - 1)
+
+
+def _regular_singular(groups:np.ndarray,flipped:np.ndarray)->float:
+    """R - S: share of groups the flipping makes more regular minus less regular"""
+    before = np.abs(np.diff(groups,axis=1)).sum(axis=1)
+    after = np.abs(np.diff(flipped,axis=1)).sum(axis=1)
+    return (np.count_nonzero(after > before) - np.count_nonzero(after < before)) / len(groups)
+
+
+def rs_analysis(pixels:np.ndarray,max_groups:int = RS_MAX_GROUPS)->Optional[float]:
+    """
+    Fridrich's RS analysis of LSB replacement
+
+    Args:
+        pixels (np.ndarray): uint8 array of shape (height, width[, channels])
+        max_groups (int, optional): groups of four horizontal neighbours sampled at most
+    Return:
+        estimated share of channel values whose LSB was replaced, None if the image is too small
+    """
+    if pixels.ndim == 2:
+        pixels = pixels[:,:,np.newaxis]
+    height, width, channels = pixels.shape
+    usable = width - width % 4
+    if usable == 0:
+        return None
+    #groups run along rows within one channel, whole rows are sampled before copying
+    row_step = max(1,height * channels * (usable // 4) // max_groups)
+    groups = pixels[::row_step,:usable,:].transpose(2,0,1).reshape(-1,4).astype(np.int16)
+
+    def flip(values,mask):
+        #F1 swaps 2k and 2k+1, F-1 swaps 2k-1 and 2k
+        positive = values.copy()
+        positive[:,mask] ^= 1
+        negative = values.copy()
+        negative[:,mask] = ((negative[:,mask] + 1) ^ 1) - 1
+        return positive, negative
+
+    positive, negative = flip(groups,RS_MASK)
+    d0 = _regular_singular(groups,positive)
+    dn0 = _regular_singular(groups,negative)
+    inverted = groups ^ 1
+    positive, negative = flip(inverted,RS_MASK)
+    d1 = _regular_singular(inverted,positive)
+    dn1 = _regular_singular(inverted,negative)
+
+    #2(d1 + d0)x^2 + (dn0 - dn1 - d1 - 3d0)x + d0 - dn0 = 0
+    a = 2 * (d1 + d0)
+    b = dn0 - dn1 - d1 - 3 * d0
+    c = d0 - dn0
+    if abs(a) < 1e-12:
+        if abs(b) < 1e-12:
+            return 0.0
+        roots = [-c / b]
+    else:
+        discriminant = b * b - 4 * a * c
+        if discriminant < 0:
+            #near full embedding a and b go to 0 and noise can turn the roots, one negative and
+            #one positive of large magnitude, into a complex pair: keep their magnitude
+            roots = [-math.sqrt(c / a)]
+        else:
+            roots = [(-b + math.sqrt(discriminant)) / (2 * a),(-b - math.sqrt(discriminant)) / (2 * a)]
+    #the root of smaller magnitude whose estimate x / (x - 1/2) is a share, else the estimate
+    #nearest to [0, 1]: towards 1 as the roots grow apart at near full embedding
+    estimates = [x / (x - 0.5) if x != 0.5 else 1.0 for x in sorted(roots,key=abs)]
+    estimate = min(estimates,key=lambda p: max(0.0,-p,p - 1.0))
+    return float(min(1.0,max(0.0,estimate)))
+
+
+_worker_stego: Optional[ImageSteganography] = None
+
+
+def _init_worker(stego:ImageSteganography)->None:
+    """keep the extraction settings in every pool process"""
+    global _worker_stego
+    _worker_stego = stego
+
+
+def analyze_image(path:str,stego:Optional[ImageSteganography] = None)->dict:
+    """
+    run the detectors and try to extract a payload from one image
+
+    Args:
+        path (str): path of the image
+        stego (ImageSteganography, optional): extraction settings, those of the pool process by default
+    Return:
+        JSON-serializable result, with an error key if the image could not be read
+    """
+    stego = stego or _worker_stego or ImageSteganography()
+    try:
+        img = stego.load_image(path)
+        pixels = np.asarray(img)
+        pvalues = chi_square_attack(pixels.reshape(-1))
+        rs = rs_analysis(pixels)
+        message = stego.extract(img)
+    except Exception as e:
+        return {'path': path,'error': str(e)}
+    #leading windows that look embedded, the share of the image the payload likely spans
+    embedded = pvalues >= CHI_SQUARE_THRESHOLD
+    leading = len(pvalues) if embedded.all() else int(np.argmin(embedded))
+    chi_p = float(pvalues[0]) if len(pvalues) else None
+    payload = message or None
+    return {
+        'path': path,
+        'width': img.width,
+        'height': img.height,
+        'mode': img.mode,
+        'chi_square_p': chi_p,
+        'chi_square_fraction': leading / len(pvalues) if len(pvalues) else None,
+        'rs_estimate': rs,
+        'payload_bytes': len(payload.encode('utf-8')) if payload else 0,
+        'payload': payload,
+        'suspicious': bool(payload or (chi_p is not None and chi_p >= CHI_SQUARE_THRESHOLD)
+                           or (rs is not None and rs >= RS_THRESHOLD)),
+    }
+
+
+def iter_images(root:str,extensions:Iterable[str] = IMAGE_EXTENSIONS)->Iterator[str]:
+    """yield the paths of the images under a directory, in a stable order"""
+    extensions = tuple(extension.lower() for extension in extensions)
+    for directory, subdirectories, files in os.walk(root):
+        subdirectories.sort()
+        for name in sorted(files):
+            if name.lower().endswith(extensions):
+                yield os.path.join(directory,name)
+
+
+def scan_directory(root:str,workers:Optional[int] = None,
+                   stego:Optional[ImageSteganography] = None)->Iterator[dict]:
+    """
+    analyze every image under a directory in a process pool
+
+    Args:
+        root (str): directory walked recursively
+        workers (int, optional): pool processes, the CPU count by default
+        stego (ImageSteganography, optional): extraction settings
+    Yield:
+        the result of analyze_image for each image, in completion order
+    """
+    workers = workers or os.cpu_count() or 1
+    with ProcessPoolExecutor(max_workers=workers,initializer=_init_worker,
+                             initargs=(stego or ImageSteganography(),)) as executor:
+        pending = set()
+        for path in iter_images(root):
+            pending.add(executor.submit(analyze_image,path))
+            if len(pending) >= workers * QUEUED_PER_WORKER:
+                done, pending = wait(pending,return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield future.result()
+        for future in as_completed(pending):
+            yield future.result()
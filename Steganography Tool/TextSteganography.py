@@ -1,68 +1,297 @@
 import argparse
-from typing import Tuple
+import json
+import os
+import re
+from typing import Iterable, Iterator, Optional, Tuple
+
+#zero-width code points of each alphabet size, every symbol carrying log2(size) bits: the invisible
+#math operators and deprecated format characters, which ordinary text never holds, unlike the zero
+#width space and non-joiner (web copy, Persian), the joiner (emoji), the word joiner and U+FEFF (BOM)
+ALPHABETS = {
+    2: '\u2062\u2063',
+    4: '\u2061\u2062\u2063\u2064',
+    8: '\u2061\u2062\u2063\u2064\u206a\u206b\u206c\u206d',
+}
+
+#format code of the positional notation used for each symbol size, and the symbols per digit
+_DIGIT_FORMATS = {1: ('b', 1), 2: ('x', 2), 3: ('o', 1)}
+
+#the frame length is a LEB128 varint of at most this many bytes
+MAX_LENGTH_BYTES = 5
+
+#bytes read at a time when scanning files
+CHUNK_SIZE = 1 << 20
+
+_WORD = re.compile(r'\S+')
+
+
+def iter_files(root:str)->Iterator[str]:
+    """yield the paths of the files under a directory, in a stable order"""
+    for directory, subdirectories, files in os.walk(root):
+        subdirectories.sort()
+        for name in sorted(files):
+            yield os.path.join(directory,name)
+
+
+def parse_length(data:bytes)->Optional[Tuple[int,int]]:
+    """
+    read the varint length at the start of a frame
+
+    Return:
+        (size of the varint, length), None if data ends inside the varint
+    Raise:
+        ValueError if the varint is longer than MAX_LENGTH_BYTES
+    """
+    length = 0
+    for i, byte in enumerate(data[:MAX_LENGTH_BYTES]):
+        length |= (byte & 0x7f) << (7 * i)
+        if not byte & 0x80:
+            return i + 1, length
+    if len(data) >= MAX_LENGTH_BYTES:
+        raise ValueError("Invalid frame length")
+    return None
+
 
 class TextSteganography:
-    """zero width characters for encoding"""
-    ZERO_WIDTH_CHARS = {
-        '0': '\u200b',
-        '1': '\u200c',
-    }
-
-    @staticmethod
-    def text_to_binary(text: str)->str:
-        """convert text to binary string"""
-        return ''.join(format(ord(char),'08b') for char in text)
-
-    @staticmethod
-    def binary_to_text(binary: str)->str:
-        """convert binary string to text"""
-        return ''.join(chr(int(binary[i:i+8],2)) for i in range(0,len(binary),8))
+    """hide UTF-8 text in zero-width characters spread over the words of a cover text
+
+    The secret is framed as its length (a LEB128 varint) followed by its
+    UTF-8 bytes. The frame is written with an alphabet of 2, 4 or 8
+    zero-width code points, so every invisible character carries 1 to 3
+    bits, and the characters are shared out over the ends of words across
+    the whole cover text. Converting between bytes and symbols goes through
+    Python's linear power-of-two base conversions and str.translate tables,
+    and extraction stops reading as soon as the framed length is complete.
+    """
+
+    def __init__(self,symbols=8):
+        """initialize the encoder
+
+        Args:
+            symbols (int, optional): size of the zero-width alphabet, 2, 4 or 8 (default=8).
+        """
+        if symbols not in ALPHABETS:
+            raise ValueError(f"Alphabet size must be one of {', '.join(map(str,ALPHABETS))}")
+        self.alphabet = ALPHABETS[symbols]
+        self.bits = symbols.bit_length() - 1
+        self.digit_format, per_digit = _DIGIT_FORMATS[self.bits]
+        #each digit of the notation stands for per_digit symbols
+        self.encode_table = str.maketrans({
+            format(value,self.digit_format): ''.join(self.alphabet[(value >> (self.bits * (per_digit - 1 - i))) & (symbols - 1)]
+                                                     for i in range(per_digit))
+            for value in range(1 << (self.bits * per_digit))
+        })
+        self.decode_table = str.maketrans({char: str(value) for value, char in enumerate(self.alphabet)})
+        self.strip_table = str.maketrans('','',self.alphabet)
+        self.run = re.compile('[' + self.alphabet + ']+')
+        #the same runs in UTF-8 encoded text; spelled out as one character then more so that re
+        #can skip to the possible first bytes
+        self.encoded_chars = [char.encode('utf-8') for char in self.alphabet]
+        char = b'(?:' + b'|'.join(map(re.escape,self.encoded_chars)) + b')'
+        self.run_bytes = re.compile(char + char + b'*')
+        self.longest_char = max(map(len,self.encoded_chars))
+        #a chunk is only searched for runs if it holds one of these leading bytes
+        self.prefixes = sorted({char[:-1] for char in self.encoded_chars})
+        self.header_symbols = -(-8 * MAX_LENGTH_BYTES // self.bits)
+
+    def encode_bytes(self,data:bytes)->str:
+        """convert bytes to zero-width symbols, the last one padded with zero bits"""
+        if not data:
+            return ''
+        count = -(-8 * len(data) // self.bits)
+        value = int.from_bytes(data,'big') << (count * self.bits - 8 * len(data))
+        per_digit = _DIGIT_FORMATS[self.bits][1]
+        return format(value,self.digit_format).zfill(count // per_digit).translate(self.encode_table)
+
+    def decode_bytes(self,hidden:str)->bytes:
+        """convert zero-width symbols back to bytes, an incomplete last byte is dropped"""
+        size = len(hidden) * self.bits // 8
+        if not size:
+            return b''
+        value = int(hidden.translate(self.decode_table),len(self.alphabet))
+        return (value >> (len(hidden) * self.bits - 8 * size)).to_bytes(size,'big')
+
+    def frame_symbols(self,hidden:str)->Optional[int]:
+        """number of symbols of the whole frame starting hidden, None while its length is incomplete"""
+        header = parse_length(self.decode_bytes(hidden[:self.header_symbols]))
+        if header is None:
+            return None
+        return -(-8 * sum(header) // self.bits)
 
     def hide_message(self,secret_message:str,cover_text:str)->str:
         """hide secret message within cover text using zero-width characters"""
-        binary_secret = self.text_to_binary(secret_message)
+        data = secret_message.encode('utf-8')
+        length = len(data)
+        header = bytearray()
+        while True:
+            header.append((length & 0x7f) | (0x80 if length > 0x7f else 0))
+            length >>= 7
+            if not length:
+                break
+        hidden_text = self.encode_bytes(bytes(header) + data)
 
-        #convert binary to zero-width characters
-        hidden_text = ''.join(self.ZERO_WIDTH_CHARS[bit] for bit in binary_secret)
+        #spread the hidden text evenly over the ends of the words
+        cover_text = cover_text.translate(self.strip_table)
+        ends = [match.end() for match in _WORD.finditer(cover_text)]
+        if not ends:
+            raise ValueError("Cover text needs at least one word")
+        slots = min(len(ends),len(hidden_text))
+        share, extra = divmod(len(hidden_text),slots)
+        pieces = []
+        last = used = 0
+        for i in range(slots):
+            end = ends[i * len(ends) // slots]
+            size = share + (i < extra)
+            pieces.append(cover_text[last:end])
+            pieces.append(hidden_text[used:used + size])
+            last, used = end, used + size
+        pieces.append(cover_text[last:])
+        return ''.join(pieces)
 
-        #insert the hidden text after the first character of the cover text
-        return cover_text[0] + hidden_text + cover_text[1:]
+    def read_frame(self,runs:Iterable[str])->Tuple[Optional[str],int]:
+        """
+        decode the frame held by consecutive runs of zero-width characters, reading no further than it
+
+        Args:
+            runs (Iterable[str]): runs of alphabet characters in text order
+        Return:
+            (the message, None if there is no valid frame; symbols read)
+        """
+        parts = []
+        count = 0
+        needed = None
+        for run in runs:
+            parts.append(run)
+            count += len(run)
+            if needed is None:
+                try:
+                    needed = self.frame_symbols(''.join(parts))
+                except ValueError:
+                    return None, count
+            if needed is not None and count >= needed:
+                break
+        if needed is None or count < needed:
+            return None, count
+        data = self.decode_bytes(''.join(parts)[:needed])
+        header_size, _ = parse_length(data)
+        try:
+            return data[header_size:].decode('utf-8'), count
+        except UnicodeDecodeError:
+            return None, count
 
     def reveal_message(self,steganographic_text:str)->str:
         """Extract hidden message from steganographic text"""
-        #create reverse mapping of zero-width characters
-        reverse_map = {v: k for k,v in self.ZERO_WIDTH_CHARS.items()}
+        message, _ = self.read_frame(match.group() for match in self.run.finditer(steganographic_text))
+        return "No hidden message found" if message is None else message
+
+    def scan_file(self,path:str,chunk_size:int = CHUNK_SIZE)->Optional[dict]:
+        """
+        look for a zero-width payload in a file, reading it in chunks
+
+        Chunks without the leading bytes of any alphabet character are
+        skipped with a plain substring search, and reading stops once a frame is complete,
+        so memory stays flat and only the hidden characters are kept.
 
-        #extract the hidden binary message
-        binary_message = ''
-        for char in steganographic_text:
-            if char in reverse_map:
-                binary_message += reverse_map[char]
+        Args:
+            path (str): file to scan, decoded as UTF-8
+            chunk_size (int, optional): bytes read at a time
+        Return:
+            None if the file has no zero-width characters, else its path, the byte offset
+            of the first one, the number read and the decoded message (None if undecodable)
+        """
+        first = []
 
+        def runs():
+            offset = 0
+            carry = b''
+            with open(path,'rb') as f:
+                while True:
+                    chunk = f.read(chunk_size)
+                    data = carry + chunk
+                    if not data:
+                        return
+                    start = offset - len(carry)
+                    offset += len(chunk)
+                    #keep a character cut at the end of the chunk for the next one
+                    keep = 0
+                    if chunk:
+                        keep = next((n for n in range(self.longest_char - 1,0,-1)
+                                     if any(char.startswith(data[-n:]) for char in self.encoded_chars)),0)
+                    carry = data[len(data) - keep:]
+                    data = data[:len(data) - keep]
+                    if any(prefix in data for prefix in self.prefixes):
+                        for match in self.run_bytes.finditer(data):
+                            if not first:
+                                first.append(start + match.start())
+                            yield match.group().decode('utf-8')
+                    if not chunk:
+                        return
 
-        #convert binary back to text
+        reader = runs()
         try:
-            return self.binary_to_text(binary_message)
-        except:
-            return "No hidden message found"
+            message, count = self.read_frame(reader)
+        finally:
+            reader.close()
+        if not first:
+            return None
+        return {'path': path,'offset': first[0],'characters': count,'message': message}
+
+    def scan(self,paths:Iterable[str],chunk_size:int = CHUNK_SIZE)->Iterator[dict]:
+        """
+        scan files and directory trees for zero-width payloads
+
+        Args:
+            paths (Iterable[str]): files, and directories walked recursively
+            chunk_size (int, optional): bytes read at a time
+        Yield:
+            the result of scan_file for every file holding zero-width characters,
+            or its path and an error if it could not be read
+        """
+        for path in paths:
+            files = iter_files(path) if os.path.isdir(path) else [path]
+            for file in files:
+                try:
+                    result = self.scan_file(file,chunk_size)
+                except OSError as e:
+                    yield {'path': file,'error': str(e)}
+                    continue
+                if result is not None:
+                    yield result
+
 
 def main():
     parser = argparse.ArgumentParser(description='Text Steganography Tool')
-    parser.add_argument('--mode',choices=['hide','reveal'],required=True,help='Operation mode: hide or reveal')
+    parser.add_argument('--mode',choices=['hide','reveal','scan'],required=True,
+                        help='Operation mode: hide, reveal, or scan files for zero-width payloads')
     parser.add_argument('--message', help='Secret message to hide (required for hide mode)')
     parser.add_argument('--cover', help='Cover text (required for hide mode)')
     parser.add_argument('--stego-text', help='Steganographic text (required for reveal mode)')
-    
+    parser.add_argument('--path', action='append',
+                        help='File or directory to scan, can be repeated (required for scan mode)')
+    parser.add_argument('--symbols', type=int, choices=sorted(ALPHABETS), default=8,
+                        help='Zero-width characters in the alphabet, 8 packs 3 bits in each (default: 8)')
+
     args = parser.parse_args()
-    stego = TextSteganography()
+    stego = TextSteganography(args.symbols)
 
     if args.mode == 'hide':
         if not args.message or not args.cover:
             print("Error: Both message and cover text are required for hide mode")
             return
-        result = stego.hide_message(args.message,args.cover)
+        try:
+            result = stego.hide_message(args.message,args.cover)
+        except ValueError as e:
+            print(f"Error: {e}")
+            return
         print("\nSteganographic text: ")
         print(result)
+    elif args.mode == 'scan':
+        if not args.path:
+            print("Error: At least one path is required for scan mode")
+            return
+        #one JSON object per file holding zero-width characters
+        for result in stego.scan(args.path):
+            print(json.dumps(result,ensure_ascii=False),flush=True)
     else:
         if not args.stego_text:
             print("Error: Steganographic text is required for reveal mode")
@@ -74,4 +303,4 @@ def main():
 
 
 if __name__ == '__main__':
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,48 @@
+import unittest
+
+import numpy as np
+from PIL import Image
+
+from Steganalysis import RS_THRESHOLD, rs_analysis
+
+
+def smooth_cover(seed:int,size:int = 256)->np.ndarray:
+    """natural-looking RGB cover: upscaled random colours with a little sensor noise"""
+    rng = np.random.default_rng(seed)
+    small = (rng.random((16,16,3)) * 255).astype(np.uint8)
+    big = np.asarray(Image.fromarray(small).resize((size,size),Image.BICUBIC)).astype(np.int16)
+    return np.clip(big + rng.integers(-2,3,big.shape),0,255).astype(np.uint8)
+
+
+def embed_random(pixels:np.ndarray,rate:float,seed:int)->np.ndarray:
+    """replace the LSB of a share of the channel values with random bits"""
+    rng = np.random.default_rng(seed)
+    flat = pixels.reshape(-1).copy()
+    count = int(rate * flat.size)
+    positions = rng.permutation(flat.size)[:count]
+    flat[positions] = (flat[positions] & 0xFE) | rng.integers(0,2,count,dtype=np.uint8)
+    return flat.reshape(pixels.shape)
+
+
+class RSAnalysisTest(unittest.TestCase):
+
+    SEEDS = range(5)
+
+    def test_clean_cover(self):
+        for seed in self.SEEDS:
+            self.assertLess(rs_analysis(smooth_cover(seed)),RS_THRESHOLD)
+
+    def test_half_embedding(self):
+        for seed in self.SEEDS:
+            self.assertAlmostEqual(rs_analysis(embed_random(smooth_cover(seed),0.5,seed)),0.5,delta=0.1)
+
+    def test_near_full_embedding(self):
+        #the smaller root leaves [0, 1] or the roots turn complex here, which used to read as clean
+        for rate in (0.95,1.0):
+            for seed in self.SEEDS:
+                with self.subTest(rate=rate,seed=seed):
+                    self.assertGreater(rs_analysis(embed_random(smooth_cover(seed),rate,seed)),0.8)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,126 @@
+import json
+import sys
+import time
+from typing import IO, Optional, Sequence
+
+
+def format_duration(seconds: float) -> str:
+    """format a number of seconds as a short human readable duration"""
+    seconds = int(seconds)
+    days, seconds = divmod(seconds, 86400)
+    hours, seconds = divmod(seconds, 3600)
+    minutes, seconds = divmod(seconds, 60)
+    if days:
+        return f"{days}d{hours:02d}h"
+    if hours:
+        return f"{hours}h{minutes:02d}m"
+    return f"{minutes}m{seconds:02d}s"
+
+
+def format_rate(rate: float) -> str:
+    """format a rate with a k/M suffix"""
+    if rate >= 1e6:
+        return f"{rate / 1e6:.1f}M"
+    if rate >= 1e3:
+        return f"{rate / 1e3:.1f}k"
+    return f"{rate:.0f}"
+
+
+class CrackMetrics:
+    """throughput, progress and ETA of a cracking run
+
+    Workers only bump counters in the shared progress array; all rates and
+    percentages are computed here, off the hot loop, each time the monitor
+    thread takes a sample. Progress is measured in shard units (wordlist
+    bytes or keyspace indexes) and the rate in checked candidates.
+    """
+
+    def __init__(self, shards: Sequence[Sequence[int]], json_file: Optional[str] = None,
+                 stream: Optional[IO[str]] = None):
+        """initialize the metrics
+
+        Args:
+            shards (Sequence[Sequence[int]]): [start, end, offset, rule_index] of each shard
+            json_file (Optional[str], optional): File JSON lines samples are appended to.
+            stream (Optional[IO[str]], optional): Stream the progress line is written to (default: stderr).
+        """
+        self.bounds = [(shard[0], shard[1]) for shard in shards]
+        self.total_units = sum(end - start for start, end in self.bounds) or 1
+        self.json_file = json_file
+        self.stream = stream if stream is not None else sys.stderr
+        self.start_time = time.perf_counter()
+        self.last_time = self.start_time
+        self.last_checked = [0] * len(shards)
+        self.last_units = None
+        self.unit_rate = 0.0
+        self.sample_data: Optional[dict] = None
+        self.line_written = False
+
+    def sample(self, positions: Sequence[int], checked: Sequence[int]) -> dict:
+        """compute the metrics since the previous sample
+
+        Args:
+            positions (Sequence[int]): Resume offset of each shard
+            checked (Sequence[int]): Candidates checked by each shard's worker in this run
+        Returns:
+            dict: The sample, also kept in self.sample_data
+        """
+        now = time.perf_counter()
+        elapsed = max(now - self.last_time, 1e-9)
+        worker_rates = [(c - last) / elapsed for c, last in zip(checked, self.last_checked)]
+        done_units = sum(min(max(position, start), end) - start
+                         for position, (start, end) in zip(positions, self.bounds))
+        if self.last_units is not None:
+            # smooth the progress rate, batches make it jumpy
+            rate = (done_units - self.last_units) / elapsed
+            self.unit_rate = rate if not self.unit_rate else 0.7 * self.unit_rate + 0.3 * rate
+        remaining = self.total_units - done_units
+        eta = remaining / self.unit_rate if self.unit_rate > 0 else None
+
+        self.last_time = now
+        self.last_checked = list(checked)
+        self.last_units = done_units
+        self.sample_data = {
+            'time': time.time(),
+            'elapsed': now - self.start_time,
+            'checked': sum(checked),
+            'rate': sum(worker_rates),
+            'worker_rates': worker_rates,
+            'percent': 100.0 * done_units / self.total_units,
+            'eta': eta,
+        }
+        return self.sample_data
+
+    def status_line(self) -> str:
+        """format the last sample as a single progress line"""
+        data = self.sample_data
+        eta = format_duration(data['eta']) if data['eta'] is not None else '?'
+        workers = ' '.join(format_rate(rate) for rate in data['worker_rates'])
+        return (f"[{data['percent']:5.1f}%] {data['checked']:,} tried | {format_rate(data['rate'])}/s "
+                f"({workers}) | elapsed {format_duration(data['elapsed'])} | ETA {eta}")
+
+    def report(self, show_line: bool = True) -> None:
+        """write the last sample as a progress line and, if enabled, a JSON line
+
+        Args:
+            show_line (bool, optional): Write the progress line to the stream.
+        """
+        if self.sample_data is None:
+            return
+        if show_line:
+            if self.stream.isatty():
+                self.stream.write('\r' + self.status_line() + '\x1b[K')
+            else:
+                self.stream.write(self.status_line() + '\n')
+            self.stream.flush()
+            self.line_written = True
+        if self.json_file:
+            with open(self.json_file, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(self.sample_data) + '\n')
+
+    def finish(self) -> None:
+        """end the progress line"""
+        if self.line_written and self.stream.isatty():
+            self.stream.write('\n')
+            self.stream.flush()
+
@@ -0,0 +1,103 @@
+import json
+import os
+import time
+from typing import Dict, List, Optional, Sequence, Union
+
+
+class CrackSession:
+    """resumable state of a cracking run, saved as a JSON session file
+
+    Every shard is stored as [start, end, offset, rule_index], where offset
+    and rule_index are the position from which the shard resumes. Positions
+    only move forward once the candidates before them have been checked, so a
+    restored run never skips a candidate. The status only becomes 'cracked'
+    once every archive of the session is cracked.
+    """
+
+    VERSION = 1
+
+    def __init__(self, path: str, zip_files: Union[str, Sequence[str]], wordlist_file: Optional[str], shards: List[List[int]],
+                 rules: Optional[Sequence[str]] = None, backend: str = 'thread', mask: Optional[str] = None,
+                 custom_charsets: Optional[Sequence[str]] = None):
+        """initialize the session
+
+        Args:
+            path (str): Path of the session file
+            zip_files (Union[str, Sequence[str]]): Path to the zip file, or paths to every archive of a batch
+            wordlist_file (Optional[str]): Path to the wordlist file, None in mask mode
+            shards (List[List[int]]): [start, end, offset, rule_index] of each shard
+            rules (Optional[Sequence[str]], optional): Rules applied to every word.
+            backend (str, optional): 'thread' or 'process' (default: 'thread').
+            mask (Optional[str], optional): Mask of a mask attack, offsets are then keyspace indexes.
+            custom_charsets (Optional[Sequence[str]], optional): Charsets referenced by ?1 to ?4 in the mask.
+        """
+        self.path = path
+        self.zip_files = [zip_files] if isinstance(zip_files, str) else list(zip_files)
+        self.wordlist_file = wordlist_file
+        self.shards = shards
+        self.rules = list(rules) if rules else None
+        self.backend = backend
+        self.mask = mask
+        self.custom_charsets = list(custom_charsets) if custom_charsets else None
+        self.status = 'running'
+        # password of every archive cracked so far
+        self.passwords: Dict[str, str] = {}
+
+    @classmethod
+    def load(cls, path: str) -> 'CrackSession':
+        """load a session file
+
+        Args:
+            path (str): Path of the session file
+        Returns:
+            CrackSession: The restored session
+        Raises:
+            ValueError: If the file is not a session file of a supported version
+        """
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        if data.get('version') != cls.VERSION:
+            raise ValueError(f"Unsupported session file: {path}")
+        # sessions written before batch support name a single archive
+        zip_files = data.get('zip_files') or [data['zip_file']]
+        session = cls(path, zip_files, data.get('wordlist_file'), data['shards'],
+                      data.get('rules'), data.get('backend', 'thread'), data.get('mask'),
+                      data.get('custom_charsets'))
+        session.status = data.get('status', 'running')
+        session.passwords = data.get('passwords') or {}
+        if data.get('password'):
+            session.passwords[zip_files[0]] = data['password']
+        return session
+
+    def update(self, offsets: Sequence[int], rule_indexes: Sequence[int]) -> None:
+        """copy the resume positions reported by the workers
+
+        Args:
+            offsets (Sequence[int]): Resume offset of each shard
+            rule_indexes (Sequence[int]): Resume rule index of each shard
+        """
+        for shard, offset, rule_index in zip(self.shards, offsets, rule_indexes):
+            shard[2] = offset
+            shard[3] = rule_index
+
+    def save(self) -> None:
+        """write the session file atomically"""
+        data = {
+            'version': self.VERSION,
+            'zip_files': self.zip_files,
+            'wordlist_file': self.wordlist_file,
+            'rules': self.rules,
+            'mask': self.mask,
+            'custom_charsets': self.custom_charsets,
+            'backend': self.backend,
+            'status': self.status,
+            'passwords': self.passwords,
+            'saved_at': time.time(),
+            'shards': self.shards,
+        }
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
@@ -0,0 +1,137 @@
+import string
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+CHARSETS: Dict[str, bytes] = {
+    'l': string.ascii_lowercase.encode(),
+    'u': string.ascii_uppercase.encode(),
+    'd': string.digits.encode(),
+    'h': b'0123456789abcdef',
+    'H': b'0123456789ABCDEF',
+    's': (' ' + string.punctuation).encode(),
+}
+CHARSETS['a'] = CHARSETS['l'] + CHARSETS['u'] + CHARSETS['d'] + CHARSETS['s']
+
+# positions are shared with the workers as signed 64-bit integers
+MAX_KEYSPACE = 2 ** 63 - 1
+
+
+class MaskGenerator:
+    """index-addressable candidates of a hashcat-style mask such as ?u?l?l?l?d?d
+
+    Every integer in range(size) maps to exactly one candidate, with the last
+    position changing fastest. The keyspace can therefore be split evenly
+    across workers without coordination and a run can resume from a single
+    index.
+    """
+
+    def __init__(self, mask: str, custom_charsets: Optional[Sequence[str]] = None, batch_size: int = 10000):
+        """parse the mask
+
+        Args:
+            mask (str): Mask made of literal characters and ?l ?u ?d ?h ?H ?s ?a ?1-?4 placeholders
+            custom_charsets (Optional[Sequence[Optional[str]]], optional): Charsets referenced by ?1 to ?4,
+                which may themselves use the built-in placeholders, None for the ones not set.
+            batch_size (int, optional): Number of candidates per yielded batch.
+        Raises:
+            ValueError: If the mask is invalid, uses a custom charset not set or empty, or its keyspace is too large
+        """
+        self.mask = mask
+        self.custom_charsets = list(custom_charsets or [])
+        self.batch_size = batch_size
+        charsets = dict(CHARSETS)
+        for i, charset in enumerate(self.custom_charsets, 1):
+            if charset is None:
+                continue
+            charsets[str(i)] = bytes(dict.fromkeys(b''.join(self._parse(charset, CHARSETS))))
+            if not charsets[str(i)]:
+                raise ValueError(f"Custom charset ?{i} is empty")
+        self.positions: List[bytes] = self._parse(mask, charsets)
+        if not self.positions:
+            raise ValueError("Empty mask")
+
+        self.keyspace = 1
+        for charset in self.positions:
+            self.keyspace *= len(charset)
+        if self.keyspace > MAX_KEYSPACE:
+            raise ValueError(f"Keyspace of {mask} is too large: {self.keyspace}")
+
+    @staticmethod
+    def _parse(mask: str, charsets: Dict[str, bytes]) -> List[bytes]:
+        """split a mask into the charset of each position"""
+        positions = []
+        chars = iter(mask)
+        for char in chars:
+            if char != '?':
+                if not char.isascii():
+                    raise ValueError(f"Non-ASCII literal in mask: {char}")
+                positions.append(char.encode())
+                continue
+            name = next(chars, '')
+            if name == '?':
+                positions.append(b'?')
+            elif name in charsets:
+                positions.append(charsets[name])
+            elif name in ('1', '2', '3', '4'):
+                raise ValueError(f"Mask uses custom charset ?{name}, which is not defined")
+            else:
+                raise ValueError(f"Unknown mask placeholder: ?{name}")
+        return positions
+
+    def size(self) -> int:
+        """return the number of candidates in the keyspace"""
+        return self.keyspace
+
+    def candidate(self, index: int) -> bytes:
+        """return the candidate at an index of the keyspace
+
+        Args:
+            index (int): Index in range(size())
+        Returns:
+            bytes: The candidate
+        """
+        out = bytearray(len(self.positions))
+        for i in range(len(self.positions) - 1, -1, -1):
+            charset = self.positions[i]
+            index, digit = divmod(index, len(charset))
+            out[i] = charset[digit]
+        return bytes(out)
+
+    def shards(self, num_shards: int) -> List[Tuple[int, int]]:
+        """split the keyspace into contiguous index ranges of equal size
+
+        Args:
+            num_shards (int): Number of shards to create
+        Returns:
+            List[Tuple[int, int]]: (start, end) indexes of each shard
+        """
+        size = self.size()
+        num_shards = max(1, num_shards)
+        bounds = [size * i // num_shards for i in range(num_shards + 1)]
+        return [(bounds[i], bounds[i + 1]) for i in range(num_shards) if bounds[i] < bounds[i + 1]]
+
+    def batches(self, start: int, end: int) -> Iterator[Tuple[int, List[bytes]]]:
+        """yield the candidates of an index range in batches
+
+        Candidates sharing everything but the last position are built from a
+        single prefix, so only one index is decoded per run of the last charset.
+
+        Args:
+            start (int): First index of the range
+            end (int): Index just past the range
+        Yields:
+            Tuple[int, List[bytes]]: Index of the next candidate and the candidates of one batch
+        """
+        last = self.positions[-1]
+        last_chars = [bytes((c,)) for c in last]
+        radix = len(last)
+        index = start
+        while index < end:
+            batch_end = min(end, index + self.batch_size)
+            batch = []
+            while index < batch_end:
+                prefix_index, digit = divmod(index, radix)
+                prefix = self.candidate(prefix_index * radix)[:-1]
+                stop = min(radix, digit + batch_end - index)
+                batch.extend([prefix + c for c in last_chars[digit:stop]])
+                index += stop - digit
+            yield index, batch
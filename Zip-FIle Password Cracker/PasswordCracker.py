@@ -1,53 +1,238 @@
-import zipfile
 import threading
-from queue import Queue
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
 import argparse
+import itertools
 import time
 from pathlib import Path
-from typing import Optional, List
+from typing import Dict, Iterable, Iterator, Optional, List, Sequence, Tuple, Union
 import logging
 
+from CrackMetrics import CrackMetrics, format_duration
+from CrackSession import CrackSession
+from MaskGenerator import MaskGenerator
+from PasswordGenerator import RuleEngine
+from WordlistReader import DEFAULT_CHUNK_SIZE, WordlistReader
+from ZipVerifier import ArchiveSet, ZipVerifier
+
+BACKENDS = ('thread', 'process')
+
+# values per shard in the shared progress array: offset, rule index, candidates checked
+PROGRESS_FIELDS = 3
+
+# wordlist bytes read at a time when rules are applied; every word expands
+# into many candidates, so smaller chunks keep checkpoints fine grained
+RULES_CHUNK_SIZE = 1024
+
+# candidates per batch generated from rules or masks
+BATCH_SIZE = 10000
+
+# AES key derivation is a few hundred times slower than the ZipCrypto
+# check, so batches shrink to keep stopping and checkpoints responsive
+AES_CHUNK_SIZE = 1024
+AES_BATCH_SIZE = 256
+
+# per-process state set up once by the pool initializer
+_process_archives: Optional[ArchiveSet] = None
+_process_stop = None
+_process_cracked = None
+_process_progress = None
+
+logger = logging.getLogger(__name__)
+
+
+def candidate_batches(source,rules:Optional[Sequence[str]],start:int,end:int,
+                      first_rule:int = 0,batch_size:int = BATCH_SIZE)->Iterator[Tuple[Tuple[int,int],List[bytes]]]:
+    """stream the candidates of one shard, with rules applied if any
+
+    Args:
+        source: WordlistReader or MaskGenerator the shard belongs to
+        rules (Optional[Sequence[str]]): Rules for RuleEngine, or None to try the candidates as they are
+        start (int): First wordlist offset or keyspace index of the shard
+        end (int): Offset or index just past the shard
+        first_rule (int, optional): Rule to resume from at the first offset.
+        batch_size (int, optional): Maximum number of candidates per batch when rules are applied.
+    Returns:
+        Iterator[Tuple[Tuple[int,int],List[bytes]]]: (offset, rule index) and candidates of each batch,
+        then an empty batch at (end, 0) once the whole shard has been yielded
+    """
+    batches = source.batches(start,end)
+    if rules:
+        batches = RuleEngine(rules).expand(batches,start,first_rule,batch_size)
+    else:
+        batches = (((offset,0),batch) for offset,batch in batches)
+    #the last position marks the shard as finished, even if its last line ended past end
+    return itertools.chain(batches,[((end,0),[])])
+
+
+def crack_batches(archives:ArchiveSet,batches:Iterable[Tuple[Tuple[int,int],List[bytes]]],stop_event,
+                  cracked,progress=None,shard_index:int = 0)->Dict[int,str]:
+    """check batches of candidates until every archive is cracked or the stop event is set
+
+    Args:
+        archives (ArchiveSet): Verifiers of the archives
+        batches (Iterable[Tuple[Tuple[int,int],List[bytes]]]): Batches yielded by candidate_batches
+        stop_event: threading or multiprocessing Event shared by all workers
+        cracked: multiprocessing.Array with a flag per archive, set once it is cracked by any worker
+        progress (optional): multiprocessing.Array receiving the position and counters of each shard
+        shard_index (int, optional): Index of this shard in progress
+    Returns:
+        Dict[int,str]: Password of every archive cracked by this worker, by archive index
+    """
+    #decided once, so disabled debug logging costs nothing per batch
+    debug = logger.isEnabledFor(logging.DEBUG)
+    base = PROGRESS_FIELDS * shard_index
+    results = {}
+    pending = [i for i in range(len(archives)) if not cracked[i]]
+    for position, batch in batches:
+        if stop_event.is_set() or not pending:
+            break
+        if debug and batch:
+            logger.debug("Shard %d trying %d candidates from %r", shard_index, len(batch), batch[0])
+        for index, password in archives.find_all(batch, pending):
+            results[index] = password.decode('utf-8',errors='ignore')
+            with cracked.get_lock():
+                cracked[index] = 1
+                if all(cracked):
+                    stop_event.set()
+        if progress is not None:
+            with progress.get_lock():
+                progress[base] = position[0]
+                progress[base + 1] = position[1]
+                progress[base + 2] += len(batch)
+        #drop the archives cracked here or by other workers
+        pending = [i for i in pending if not cracked[i]]
+    return results
+
+
+def _init_process_worker(zip_files:List[str],stop_event,cracked,progress)->None:
+    """parse the archives once per process and keep the shared state"""
+    global _process_archives, _process_stop, _process_cracked, _process_progress
+    _process_archives = ArchiveSet(zip_files)
+    _process_stop = stop_event
+    _process_cracked = cracked
+    _process_progress = progress
+
+
+def _crack_shard(source,rules:Optional[Sequence[str]],shard_index:int,
+                 offset:int,end:int,rule_index:int,batch_size:int)->Dict[int,str]:
+    """check one shard inside a pool process"""
+    batches = candidate_batches(source,rules,offset,end,rule_index,batch_size)
+    return crack_batches(_process_archives,batches,_process_stop,_process_cracked,_process_progress,shard_index)
+
+
 class PasswordCracker:
-    def __init__(self,zip_file:str,wordlist_file:str,num_threads:int = 4):
+    def __init__(self,zip_file:Union[str,Sequence[str]],wordlist_file:Optional[str],num_threads:int = 4,backend:str = 'thread',
+                 rules:Optional[Sequence[str]] = None,session_file:Optional[str] = None,
+                 checkpoint_interval:float = 30.0,mask:Optional[str] = None,
+                 custom_charsets:Optional[Sequence[str]] = None,status_interval:float = 1.0,
+                 stats_file:Optional[str] = None):
         """initialize the zip file password cracker
 
         Args:
-            zip_file (str): Path to the zip file
-            wordlist_file (str): Path to the wordlist fiele
-            num_threads (int, optional): Number of threads to use for cracking.
+            zip_file (Union[str,Sequence[str]]): Path to the zip file, or paths to a batch of archives
+                cracked with one shared candidate stream
+            wordlist_file (Optional[str]): Path to the wordlist fiele, None for a mask attack
+            num_threads (int, optional): Number of threads or processes to use for cracking.
+            backend (str, optional): 'thread' or 'process' (default: 'thread').
+            rules (Optional[Sequence[str]], optional): Rules applied to every word, see PasswordGenerator.RULES.
+            session_file (Optional[str], optional): Session file the progress is checkpointed to.
+            checkpoint_interval (float, optional): Seconds between two session file writes.
+            mask (Optional[str], optional): Mask such as ?u?l?l?l?d?d to search instead of a wordlist.
+            custom_charsets (Optional[Sequence[str]], optional): Charsets referenced by ?1 to ?4 in the mask.
+            status_interval (float, optional): Seconds between two progress lines, 0 to disable them.
+            stats_file (Optional[str], optional): File progress samples are appended to as JSON lines.
         """
-        self.zip_file = zip_file
+        if backend not in BACKENDS:
+            raise ValueError(f"Unknown backend: {backend}")
+        if (wordlist_file is None) == (mask is None):
+            raise ValueError("Exactly one of wordlist_file and mask is required")
+        if mask and rules:
+            raise ValueError("Rules only apply to wordlists")
+        if rules:
+            #fail early on unknown rule names
+            RuleEngine(rules)
+        self.zip_files = [zip_file] if isinstance(zip_file,str) else list(zip_file)
+        if not self.zip_files:
+            raise ValueError("At least one zip file is required")
+        self.zip_file = self.zip_files[0]
         self.wordlist_file = wordlist_file
         self.num_threads = num_threads
-        self.password_queue = Queue()
+        self.backend = backend
+        self.rules = list(rules) if rules else None
+        self.session_file = session_file
+        self.checkpoint_interval = checkpoint_interval
+        self.status_interval = status_interval
+        self.stats_file = stats_file
+        self.metrics: Optional[CrackMetrics] = None
+        self.session: Optional[CrackSession] = None
+        self.mask = mask
+        self.custom_charsets = list(custom_charsets) if custom_charsets else None
+        self.batch_size = BATCH_SIZE
+        self.source = self.make_source()
         self.password_found = threading.Event()
         self.correct_password: Optional[str] = None
+        self.results: Dict[str,str] = {}
+        self.results_lock = threading.Lock()
+        self.archives: Optional[ArchiveSet] = None
+        self.verifier: Optional[ZipVerifier] = None
         # configure logging
         logging.basicConfig(
             level=logging.INFO,
             format='%(asctime)s - %(levelname)s - %(message)s'
         )
         self.logger = logging.getLogger(__name__)
-        
-    def load_wordlist(self) -> int:
-        """load passwords from wordlist file into queue
 
+    @classmethod
+    def restore(cls,session_file:str,checkpoint_interval:float = 30.0,status_interval:float = 1.0,
+                stats_file:Optional[str] = None)->'PasswordCracker':
+        """create a cracker that continues the run recorded in a session file
+
+        Args:
+            session_file (str): Path of the session file
+            checkpoint_interval (float, optional): Seconds between two session file writes.
+            status_interval (float, optional): Seconds between two progress lines, 0 to disable them.
+            stats_file (Optional[str], optional): File progress samples are appended to as JSON lines.
         Returns:
-            int: Number of passwords loaded
+            PasswordCracker: Cracker resuming every shard from its saved position
         """
-        count = 0
-        try:
-            with open(self.wordlist_file,'r',encoding='utf-8',errors='ignore') as f:
-                for line in f:
-                    password = line.strip()
-                    if password:
-                        self.password_queue.put(password)
-                        count += 1
-            return count
-        except Exception as e:
-            self.logger.error(f"Error loading wordlist: {e}")
-            raise
-        
+        session = CrackSession.load(session_file)
+        cracker = cls(session.zip_files,session.wordlist_file,len(session.shards),session.backend,
+                      session.rules,session_file,checkpoint_interval,session.mask,session.custom_charsets,
+                      status_interval,stats_file)
+        cracker.session = session
+        cracker.results = dict(session.passwords)
+        return cracker
+
+    def load_archives(self) -> ArchiveSet:
+        """parse every zip file once and cache its encryption headers
+
+        Returns:
+            ArchiveSet: Verifiers shared by all worker threads
+        """
+        if self.archives is None:
+            self.archives = ArchiveSet(self.zip_files)
+            self.verifier = self.archives.verifiers[0]
+            if self.archives.has_aes:
+                self.batch_size = AES_BATCH_SIZE
+                self.source = self.make_source(AES_CHUNK_SIZE)
+        return self.archives
+
+    def load_verifier(self) -> ZipVerifier:
+        """return the verifier of the first zip file"""
+        self.load_archives()
+        return self.verifier
+
+    def make_source(self,chunk_size:int = DEFAULT_CHUNK_SIZE):
+        """create the WordlistReader or MaskGenerator the candidates come from
+
+        Args:
+            chunk_size (int, optional): Wordlist bytes per batch without rules.
+        """
+        if self.mask:
+            return MaskGenerator(self.mask,self.custom_charsets,self.batch_size)
+        return WordlistReader(self.wordlist_file,min(chunk_size,RULES_CHUNK_SIZE) if self.rules else chunk_size)
+
     def try_password(self,password:str)->bool:
         """try a password on the zip file
         Args:
@@ -55,64 +240,260 @@ class PasswordCracker:
         Returns:
             bool: True if password is correct, False otherwise
         """
-        try:
-            with zipfile.ZipFile(self.zip_file) as zf:
-                zf.extractall(pwd = password.encode())
-                return True
-        except:
-            return False
-        
-    def password_cracker_worker(self):
-        """worker threads that attempts passwords from the queue"""
-        while not self.password_found.is_set() and not self.password_queue.empty():
-            password = self.password_queue.get()
-            self.logger.debug(f"Trying password:  {password}")
-
-            if self.try_password(password):
-                self.correct_password = password
-                self.password_found.set()
-                self.logger.info(f"Password found: {password}")
+        return self.load_verifier().check(password.encode())
+
+    def password_cracker_worker(self,shard_index:int,cracked,progress):
+        """worker thread that checks one contiguous shard of the candidates
+
+        Args:
+            shard_index (int): Index of the shard in the session
+            cracked: multiprocessing.Array with a flag per archive, set once it is cracked
+            progress: multiprocessing.Array receiving the position and counters of each shard
+        """
+        _, end, offset, rule_index = self.session.shards[shard_index]
+        batches = candidate_batches(self.source,self.rules,offset,end,rule_index,self.batch_size)
+        self.record_results(crack_batches(self.load_archives(),batches,self.password_found,cracked,progress,shard_index))
+
+    def record_results(self,found:Dict[int,str])->None:
+        """keep the passwords a worker found, by archive path"""
+        with self.results_lock:
+            for index,password in found.items():
+                zip_file = self.zip_files[index]
+                self.results[zip_file] = password
+                self.session.passwords[zip_file] = password
+                self.logger.info(f"Password found for {zip_file}: {password}")
+            self.correct_password = self.results.get(self.zip_file)
+
+    def new_session(self)->CrackSession:
+        """split the candidates into one shard per worker for a fresh run"""
+        shards = [[start,end,start,0] for start,end in self.source.shards(self.num_threads)]
+        return CrackSession(self.session_file,self.zip_files,self.wordlist_file,shards,self.rules,
+                            self.backend,self.mask,self.custom_charsets)
+
+    def save_session(self,progress)->None:
+        """copy the worker positions into the session and write the session file"""
+        with progress.get_lock():
+            snapshot = progress[:]
+        self.session.update(snapshot[0::PROGRESS_FIELDS],snapshot[1::PROGRESS_FIELDS])
+        if self.session.path:
+            self.session.save()
+
+    def shards_finished(self,progress)->bool:
+        """whether every shard was checked up to its end"""
+        with progress.get_lock():
+            offsets = progress[0::PROGRESS_FIELDS]
+        return all(offset >= end for (_,end,_,_),offset in zip(self.session.shards,offsets))
+
+    def sample_metrics(self,progress)->None:
+        """take a metrics sample and report it"""
+        with progress.get_lock():
+            snapshot = progress[:]
+        self.metrics.sample(snapshot[0::PROGRESS_FIELDS],snapshot[2::PROGRESS_FIELDS])
+        self.metrics.report(show_line=self.status_interval > 0)
+
+    def monitor_loop(self,progress,done:threading.Event)->None:
+        """report progress and checkpoint the session on their timers until done is set"""
+        sampling = self.status_interval > 0 or self.stats_file
+        interval = self.status_interval if self.status_interval > 0 else 1.0
+        interval = min(interval,self.checkpoint_interval) if sampling else self.checkpoint_interval
+        next_checkpoint = time.monotonic() + self.checkpoint_interval
+        while not done.wait(interval):
+            if sampling:
+                self.sample_metrics(progress)
+            if time.monotonic() >= next_checkpoint:
+                self.save_session(progress)
+                next_checkpoint = time.monotonic() + self.checkpoint_interval
+
+    def measure_rate(self,duration:float = 0.5)->float:
+        """measure the guesses per second of a single worker
+
+        Args:
+            duration (float, optional): Approximate number of seconds to measure for.
+        Returns:
+            float: Candidates checked per second
+        """
+        archives = self.load_archives()
+        pending = [i for i,zip_file in enumerate(self.zip_files) if zip_file not in self.results]
+        start,end = self.source.shards(1)[0]
+        checked = 0
+        start_time = time.perf_counter()
+        for _,batch in candidate_batches(self.source,self.rules,start,end,batch_size=self.batch_size):
+            sample = batch[:1000]
+            archives.find_all(sample,pending or [0])
+            checked += len(sample)
+            if time.perf_counter() - start_time >= duration:
                 break
-            self.password_queue.task_done()
-            
+        return checked / max(time.perf_counter() - start_time,1e-9)
+
+    def estimate(self)->Tuple[int,float,float]:
+        """estimate the time needed to search the remaining mask keyspace
+
+        Returns:
+            Tuple[int,float,float]: Remaining keyspace, measured guesses per second
+            across all workers and estimated seconds to exhaust the keyspace
+        Raises:
+            ValueError: If the cracker searches a wordlist, whose keyspace is unknown up front
+        """
+        if not self.mask:
+            raise ValueError("Keyspace estimates need a mask")
+        if self.session is not None:
+            remaining = sum(max(0,end - offset) for _,end,offset,_ in self.session.shards)
+        else:
+            remaining = self.source.size()
+        #worker threads share one interpreter, only processes add throughput,
+        #except for AES whose key derivation runs with the GIL released
+        scales = self.backend == 'process' or self.load_archives().has_aes
+        workers = len(self.source.shards(self.num_threads)) if scales else 1
+        rate = self.measure_rate() * workers
+        return remaining,rate,remaining / rate
+
+    def log_estimate(self)->None:
+        """log the remaining keyspace and the estimated time to exhaust it"""
+        remaining,rate,seconds = self.estimate()
+        self.logger.info(f"Keyspace {self.source.size():,} ({remaining:,} remaining), "
+                         f"{rate:,.0f} guesses/s, ETA {format_duration(seconds)}")
+
     def crack(self)-> Optional[str]:
         """Start the password cracking process
         Returns:
-            Optional[str]: The correct password, or None if the process was cancelled
+            Optional[str]: The password of the (first) zip file, or None if it was not found
+        """
+        return self.crack_all().get(self.zip_file)
+
+    def crack_all(self)->Dict[str,Optional[str]]:
+        """crack every zip file with one shared candidate stream
+
+        Returns:
+            Dict[str,Optional[str]]: Password of every zip file, None for those not found
         """
-        if not Path(self.zip_file).exists():
-            raise FileNotFoundError(f"ZIP file not found: {self.zip_file}")
-        
-        if not Path(self.wordlist_file).exists():
+        for zip_file in self.zip_files:
+            if not Path(zip_file).exists():
+                raise FileNotFoundError(f"ZIP file not found: {zip_file}")
+
+        if self.wordlist_file and not Path(self.wordlist_file).exists():
             raise FileNotFoundError(f"Wordlist file not found: {self.wordlist_file}")
-        
-        #load passwords
-        total_passwords = self.load_wordlist()
-        self.logger.info(f"loaded{total_passwords} passwords from wordlist")
-        
-        #create and start worker threads
-        threads: List[threading.Thread] = []
+
+        #parse the archives before any worker starts
+        self.load_archives()
+
+        if self.session is None:
+            self.session = self.new_session()
+        self.results = dict(self.session.passwords)
+        self.correct_password = self.results.get(self.zip_file)
+        if self.session.status != 'running':
+            self.logger.info(f"Session already finished: {self.session.status}")
+            return {zip_file: self.results.get(zip_file) for zip_file in self.zip_files}
+
+        #resume position and candidate counter of every shard, shared with the workers
+        progress = multiprocessing.Array('q',[value for shard in self.session.shards for value in shard[2:] + [0]])
+        #archives already cracked, pruned from the candidate checks by every worker
+        cracked = multiprocessing.Array('b',[zip_file in self.results for zip_file in self.zip_files])
+        self.metrics = CrackMetrics(self.session.shards,self.stats_file)
+        pending = [i for i,(_,end,offset,_) in enumerate(self.session.shards) if offset < end]
+        if len(self.zip_files) > 1:
+            self.logger.info(f"Cracking {len(self.zip_files) - len(self.results)}/{len(self.zip_files)} archives "
+                             f"with a shared candidate stream")
+        if self.mask:
+            self.log_estimate()
+            self.logger.info(f"Searching mask {self.mask} in {len(pending)}/{len(self.session.shards)} pending shards")
+        else:
+            self.logger.info(f"Streaming {self.source.size()} bytes of wordlist in "
+                             f"{len(pending)}/{len(self.session.shards)} pending shards")
+
+        done = threading.Event()
+        monitor = threading.Thread(target=self.monitor_loop,args=(progress,done),daemon=True)
+        monitor.start()
         start_time = time.time()
-        
-        for _ in range(self.num_threads):
-            thread = threading.Thread(target=self.password_cracker_worker)
-            thread.daemon = True
-            thread.start()
-            threads.append(thread)
-            
-        # wait for password to be found or queue to be empty
-        for thread in threads:
-            thread.join()
-            
-        end_time = time.time()
-        duration = end_time - start_time
-        
-        if self.correct_password:
+        try:
+            if self.backend == 'process':
+                self.crack_with_processes(pending,cracked,progress)
+            else:
+                self.crack_with_threads(pending,cracked,progress)
+        except KeyboardInterrupt:
+            self.password_found.set()
+            self.logger.info("Interrupted, saving session")
+            raise
+        finally:
+            done.set()
+            monitor.join()
+            if self.status_interval > 0 or self.stats_file:
+                self.sample_metrics(progress)
+                self.metrics.finish()
+            #an interrupted or failed run stays 'running' so that it can be restored
+            if len(self.results) == len(self.zip_files):
+                self.session.status = 'cracked'
+            elif self.shards_finished(progress):
+                self.session.status = 'exhausted'
+            self.save_session(progress)
+
+        return self.report(time.time() - start_time)
+
+    def crack_with_threads(self,pending:List[int],cracked,progress)->None:
+        """check the pending shards with one worker thread each
+
+        Args:
+            pending (List[int]): Indexes of the shards left to check
+            cracked: multiprocessing.Array with a flag per archive, set once it is cracked
+            progress: multiprocessing.Array receiving the position and counters of each shard
+        Raises:
+            Exception: The first error raised by a worker, after the other workers stopped
+        """
+        with ThreadPoolExecutor(max_workers=max(1, len(pending))) as executor:
+            try:
+                futures = [executor.submit(self.password_cracker_worker,shard_index,cracked,progress)
+                           for shard_index in pending]
+                # wait for every archive to be cracked or every shard to be exhausted
+                for future in as_completed(futures):
+                    future.result()
+            except BaseException:
+                # stop the other workers before the pool waits for them
+                self.password_found.set()
+                raise
+
+    def crack_with_processes(self,pending:List[int],cracked,progress)->None:
+        """check the pending shards with one pool process each
+
+        Args:
+            pending (List[int]): Indexes of the shards left to check
+            cracked: multiprocessing.Array with a flag per archive, set once it is cracked
+            progress: multiprocessing.Array receiving the position and counters of each shard
+        """
+        stop_event = multiprocessing.Event()
+        with ProcessPoolExecutor(max_workers=max(1, len(pending)),
+                                 initializer=_init_process_worker,
+                                 initargs=(self.zip_files,stop_event,cracked,progress)) as executor:
+            try:
+                futures = []
+                for shard_index in pending:
+                    _, end, offset, rule_index = self.session.shards[shard_index]
+                    futures.append(executor.submit(_crack_shard,self.source,self.rules,
+                                                   shard_index,offset,end,rule_index,self.batch_size))
+                for future in as_completed(futures):
+                    self.record_results(future.result())
+                    if len(self.results) == len(self.zip_files):
+                        stop_event.set()
+                        self.password_found.set()
+            except BaseException:
+                # a failed or interrupted shard stops the others before the pool waits for them
+                stop_event.set()
+                raise
+
+    def report(self,duration:float)->Dict[str,Optional[str]]:
+        """log the outcome of a cracking run
+
+        Args:
+            duration (float): Duration of the run in seconds
+        Returns:
+            Dict[str,Optional[str]]: Password of every zip file, None for those not found
+        """
+        results = {zip_file: self.results.get(zip_file) for zip_file in self.zip_files}
+        missing = [zip_file for zip_file,password in results.items() if password is None]
+        if len(results) > 1:
+            self.logger.info(f"Cracked {len(results) - len(missing)}/{len(results)} archives in {duration:.2f} seconds")
+        elif not missing:
             self.logger.info(f"Cracking completed in {duration:.2f} seconds")
-            return self.correct_password
-        else:
-            self.logger.info("Password not found in wordlist")
-            return None
-                        
-                        
-                        
\ No newline at end of file
+        where = "wordlist" if self.wordlist_file else "keyspace"
+        for zip_file in missing:
+            self.logger.info(f"Password not found in {where}" if len(results) == 1
+                             else f"Password of {zip_file} not found in {where}")
+        return results
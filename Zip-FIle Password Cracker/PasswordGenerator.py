@@ -1,30 +1,230 @@
-from typing import List
+import hashlib
+import math
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+# common special character suffixes and prefixes
+SPECIAL_CHARS = [b'!', b'@', b'#', b'$', b'%', b'*']
+PREFIXES = [b'1', b'!', b'@', b'#']
+
+# leet substitutions applied one at a time and all together
+LEET_SUBSTITUTIONS = [(b'a', b'4'), (b'e', b'3'), (b'i', b'1'), (b'o', b'0'), (b's', b'5'), (b't', b'7')]
+LEET_TABLE = bytes.maketrans(b''.join(a for a, _ in LEET_SUBSTITUTIONS),
+                             b''.join(b for _, b in LEET_SUBSTITUTIONS))
+
+DEFAULT_RULES = [':', 'digits', 'affix', 'case', 'leet', 'case+digits']
+
+
+def _rule_identity(word: bytes) -> Iterable[bytes]:
+    return (word,)
+
+
+def _rule_digits(word: bytes) -> Iterator[bytes]:
+    for i in range(100):
+        yield word + b'%d' % i
+    for i in range(10):
+        yield word + b'%02d' % i
+
+
+def _rule_affix(word: bytes) -> Iterator[bytes]:
+    for char in SPECIAL_CHARS:
+        yield word + char
+        yield word + char + b'!'
+    for prefix in PREFIXES:
+        yield prefix + word
+
+
+def _rule_case(word: bytes) -> Iterable[bytes]:
+    return (word.capitalize(), word.upper(), word.lower(), word.swapcase())
+
+
+def _rule_leet(word: bytes) -> Iterator[bytes]:
+    lower = word.lower()
+    for a, b in LEET_SUBSTITUTIONS:
+        if a in lower:
+            yield lower.replace(a, b)
+    yield lower.translate(LEET_TABLE)
+
+
+RULES: Dict[str, Callable[[bytes], Iterable[bytes]]] = {
+    ':': _rule_identity,
+    'digits': _rule_digits,
+    'affix': _rule_affix,
+    'case': _rule_case,
+    'leet': _rule_leet,
+}
+
+
+class BloomFilter:
+    """bounded Bloom filter used to drop repeated candidates
+
+    Once `capacity` items have been added the filter is cleared, so memory
+    stays fixed while the false positive rate never exceeds `error_rate`.
+    A false positive means a candidate is skipped. The default of 1e-3 sets
+    10 bits per item, all derived from a single digest: a lower rate needs
+    more bits, each a random memory access, and at 1e-6 the filter cost as
+    much as checking the repeats it drops.
+    """
+
+    def __init__(self, capacity: int = 1 << 20, error_rate: float = 1e-3):
+        """initialize the filter
+
+        Args:
+            capacity (int, optional): Number of items kept before the filter is cleared.
+            error_rate (float, optional): Maximum false positive rate.
+        """
+        self.capacity = capacity
+        self.num_bits = max(8, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.num_hashes = max(1, round(self.num_bits / capacity * math.log(2)))
+        self.bits = bytearray((self.num_bits + 7) // 8)
+        self.count = 0
+
+    def add(self, item: bytes) -> bool:
+        """add an item to the filter
+
+        Args:
+            item (bytes): Item to add
+        Returns:
+            bool: True if the item was not seen before, False if it probably was
+        """
+        digest = hashlib.blake2b(item, digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        bits = self.bits
+        num_bits = self.num_bits
+        new = False
+        for i in range(self.num_hashes):
+            index = (h1 + i * h2) % num_bits
+            mask = 1 << (index & 7)
+            if not bits[index >> 3] & mask:
+                bits[index >> 3] |= mask
+                new = True
+        if new:
+            self.count += 1
+            if self.count >= self.capacity:
+                self.bits = bytearray(len(bits))
+                self.count = 0
+        return new
+
+
+class RuleEngine:
+    """lazy hashcat-style rule engine
+
+    A rule is a name from RULES, or several names joined with '+' to chain
+    them (e.g. 'case+digits' appends digits to every case variation).
+    Candidates are produced as a stream and never materialized as a whole.
+    """
+
+    def __init__(self, rules: Sequence[str] = DEFAULT_RULES, dedupe: Optional[BloomFilter] = None):
+        """initialize the rule engine
+
+        Args:
+            rules (Sequence[str], optional): Rules to apply, in order.
+            dedupe (Optional[BloomFilter], optional): Filter used to drop repeated candidates.
+        Raises:
+            ValueError: If a rule name is unknown
+        """
+        self.rules = list(rules)
+        self.chains = []
+        for rule in self.rules:
+            names = rule.split('+')
+            unknown = [name for name in names if name not in RULES]
+            if unknown:
+                raise ValueError(f"Unknown rule: {', '.join(unknown)}")
+            self.chains.append([RULES[name] for name in names])
+        self.dedupe = dedupe if dedupe is not None else BloomFilter()
+
+    @staticmethod
+    def _transform(words: Iterable[bytes], transform) -> Iterator[bytes]:
+        """apply one transform to every word lazily"""
+        for word in words:
+            yield from transform(word)
+
+    def _chain(self, words: Iterable[bytes], transforms) -> Iterator[bytes]:
+        """apply a chain of transforms to every word lazily"""
+        for transform in transforms:
+            words = self._transform(words, transform)
+        return iter(words)
+
+    def apply_rule(self, rule_index: int, words: Iterable[bytes]) -> Iterator[bytes]:
+        """yield the new candidates one rule produces for a sequence of words
+
+        Args:
+            rule_index (int): Index of the rule in self.rules
+            words (Iterable[bytes]): Base words
+        Yields:
+            bytes: Candidates not produced before
+        """
+        add = self.dedupe.add
+        for candidate in self._chain(words, self.chains[rule_index]):
+            if candidate and add(candidate):
+                yield candidate
+
+    def apply(self, word: bytes) -> Iterator[bytes]:
+        """yield the candidates of every rule for a single word
+
+        Args:
+            word (bytes): Base word
+        Yields:
+            bytes: Candidates not produced before
+        """
+        for rule_index in range(len(self.chains)):
+            yield from self.apply_rule(rule_index, (word,))
+
+    def expand(self, batches: Iterable[Tuple[int, List[bytes]]], start: int, first_rule: int = 0,
+               batch_size: int = 10000) -> Iterator[Tuple[Tuple[int, int], List[bytes]]]:
+        """apply every rule to each batch of words yielded by WordlistReader.batches
+
+        Rules are applied one after the other to a whole batch of words. The
+        position yielded with each candidate batch is the (wordlist offset,
+        rule index) from which a run can resume without missing candidates.
+
+        Args:
+            batches (Iterable[Tuple[int, List[bytes]]]): Word batches with the offset after each batch
+            start (int): Wordlist offset of the first batch
+            first_rule (int, optional): Rule to start from in the first batch.
+            batch_size (int, optional): Maximum number of candidates per yielded batch.
+        Yields:
+            Tuple[Tuple[int, int], List[bytes]]: Resume position and candidates
+        """
+        offset = start
+        for next_offset, words in batches:
+            for rule_index in range(first_rule, len(self.chains)):
+                candidates = self.apply_rule(rule_index, words)
+                batch = []
+                for candidate in candidates:
+                    batch.append(candidate)
+                    if len(batch) >= batch_size:
+                        yield (offset, rule_index), batch
+                        batch = []
+                if rule_index + 1 < len(self.chains):
+                    yield (offset, rule_index + 1), batch
+                else:
+                    yield (next_offset, 0), batch
+            first_rule = 0
+            offset = next_offset
+
+
 class PasswordGenerator:
     """Utility class for generating common password patterns"""
     @staticmethod
-    def generate_common_variations(base_word:str)->List[str]:
+    def iter_common_variations(base_word: str, rules: Sequence[str] = DEFAULT_RULES) -> Iterator[str]:
+        """Lazily generate common variations of a given base word
+        Args:
+            base_word (str): The base word to generate variations from
+            rules (Sequence[str], optional): Rules to apply, in order.
+        Returns:
+            Iterator[str]: Unique variations of the base word
+        """
+        engine = RuleEngine(rules, BloomFilter(capacity=4096))
+        for candidate in engine.apply(base_word.encode()):
+            yield candidate.decode('utf-8', errors='ignore')
+
+    @staticmethod
+    def generate_common_variations(base_word: str) -> List[str]:
         """Generate common variations of a given base word
         Args:
             base_word (str): The base word to generate variations from
         Returns:
             List[str]: A list of common variations of the base word
         """
-        variations = []
-        variations.appeand(base_word)
-        
-        # common number suffixes
-        for i in range(100):
-            variations.append(f"{base_word}{i}")
-            variations.append(f"{base_word}{i:02d}")
-            
-        #common special character suffixes
-        special_chars = ['!','@','#','$','%','*']
-        for char in special_chars:
-            variations.append(f"{base_word}{char}")
-            variations.append(f"{base_word}{char}!")
-            
-        # Capitalization variations
-        variations.append(base_word.capitalize())
-        variations.append(base_word.upper())
-        
-        return variations
\ No newline at end of file
+        return list(PasswordGenerator.iter_common_variations(base_word))
@@ -0,0 +1,72 @@
+import os
+from typing import Iterator, List, Tuple
+
+# bytes read per batch; a 64 KiB chunk holds several thousand typical passwords
+DEFAULT_CHUNK_SIZE = 64 * 1024
+
+
+class WordlistReader:
+    """streaming reader that yields a wordlist in batches of candidates
+
+    The file is read in fixed-size chunks that are extended to the next line
+    break, so memory stays flat regardless of the wordlist size and no
+    per-line locking is needed. The wordlist can be split into contiguous
+    byte ranges (shards) that are read independently by each worker.
+    """
+
+    def __init__(self, wordlist_file: str, chunk_size: int = DEFAULT_CHUNK_SIZE):
+        """initialize the reader
+
+        Args:
+            wordlist_file (str): Path to the wordlist file
+            chunk_size (int, optional): Number of bytes read per batch.
+        """
+        self.wordlist_file = wordlist_file
+        self.chunk_size = chunk_size
+
+    def size(self) -> int:
+        """return the size of the wordlist in bytes"""
+        return os.path.getsize(self.wordlist_file)
+
+    def shards(self, num_shards: int) -> List[Tuple[int, int]]:
+        """split the wordlist into contiguous byte ranges of similar size
+
+        A line belongs to the shard its first byte falls into, so the ranges
+        do not have to be aligned to line boundaries.
+
+        Args:
+            num_shards (int): Number of shards to create
+        Returns:
+            List[Tuple[int, int]]: (start, end) byte offsets of each shard
+        """
+        size = self.size()
+        num_shards = max(1, num_shards)
+        bounds = [size * i // num_shards for i in range(num_shards + 1)]
+        return [(bounds[i], bounds[i + 1]) for i in range(num_shards) if bounds[i] < bounds[i + 1]]
+
+    def batches(self, start: int, end: int) -> Iterator[Tuple[int, List[bytes]]]:
+        """yield the passwords of the lines starting inside a byte range
+
+        Args:
+            start (int): First byte offset of the shard
+            end (int): Byte offset just past the shard
+        Yields:
+            Tuple[int, List[bytes]]: Offset of the next unread line and the
+            stripped, non-empty passwords of one chunk
+        """
+        with open(self.wordlist_file, 'rb') as f:
+            if start > 0:
+                # skip the line that started in the previous shard
+                f.seek(start - 1)
+                f.readline()
+            position = f.tell()
+            while position < end:
+                chunk = f.read(min(self.chunk_size, end - position))
+                if not chunk:
+                    break
+                if not chunk.endswith(b'\n'):
+                    # finish the last line, it started inside this shard
+                    chunk += f.readline()
+                position += len(chunk)
+                batch = [line.strip() for line in chunk.split(b'\n')]
+                yield position, [password for password in batch if password]
@@ -0,0 +1,511 @@
+import bz2
+import hashlib
+import hmac
+import struct
+import zipfile
+import zlib
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+# local file header: signature, version, flags, method, mtime, mdate,
+# crc32, compressed size, uncompressed size, name length, extra length
+_LOCAL_HEADER = struct.Struct('<4sHHHHHIIIHH')
+_LOCAL_HEADER_SIGNATURE = b'PK\x03\x04'
+
+_FLAG_ENCRYPTED = 0x1
+_FLAG_DATA_DESCRIPTOR = 0x8
+_FLAG_STRONG_ENCRYPTION = 0x40
+
+ZIPCRYPTO_HEADER_SIZE = 12
+
+# WinZip AES (AE-1/AE-2) entries: compression method 99 with a 0x9901 extra field
+_AES_METHOD = 99
+_AES_EXTRA_ID = 0x9901
+_AES_EXTRA = struct.Struct('<H2sBH')
+AES_SALT_SIZES = {1: 8, 2: 12, 3: 16}
+AES_KEY_SIZES = {1: 16, 2: 24, 3: 32}
+AES_VERIFIER_SIZE = 2
+AES_MAC_SIZE = 10
+AES_ITERATIONS = 1000
+
+# entries larger than this are re-read from disk when a candidate survives
+# the check-byte filter instead of being kept in memory
+MAX_CACHED_ENTRY_SIZE = 4 * 1024 * 1024
+
+_SUPPORTED_METHODS = (zipfile.ZIP_STORED, zipfile.ZIP_DEFLATED, zipfile.ZIP_BZIP2)
+
+
+def _make_crc_table() -> List[int]:
+    """build the CRC-32 lookup table used by the ZipCrypto key schedule"""
+    table = []
+    for i in range(256):
+        crc = i
+        for _ in range(8):
+            crc = (crc >> 1) ^ 0xEDB88320 if crc & 1 else crc >> 1
+        table.append(crc)
+    return table
+
+
+CRC_TABLE = _make_crc_table()
+
+
+def zipcrypto_keys(password: bytes) -> Tuple[int, int, int]:
+    """derive the ZipCrypto key state for a password
+
+    Args:
+        password (bytes): Password to derive the keys from
+    Returns:
+        Tuple[int, int, int]: The three 32-bit keys
+    """
+    crc = CRC_TABLE
+    k0, k1, k2 = 0x12345678, 0x23456789, 0x34567890
+    for c in password:
+        k0 = (k0 >> 8) ^ crc[(k0 ^ c) & 0xff]
+        k1 = ((k1 + (k0 & 0xff)) * 134775813 + 1) & 0xffffffff
+        k2 = (k2 >> 8) ^ crc[(k2 ^ (k1 >> 24)) & 0xff]
+    return k0, k1, k2
+
+
+def zipcrypto_decrypt(keys: Tuple[int, int, int], data: bytes) -> bytes:
+    """decrypt ZipCrypto data starting from the given key state
+
+    Args:
+        keys (Tuple[int, int, int]): Key state returned by zipcrypto_keys
+        data (bytes): Encrypted data, including the 12-byte header
+    Returns:
+        bytes: The decrypted data
+    """
+    crc = CRC_TABLE
+    k0, k1, k2 = keys
+    out = bytearray(len(data))
+    for i, c in enumerate(data):
+        t = (k2 | 2) & 0xffff
+        c ^= ((t * (t ^ 1)) >> 8) & 0xff
+        out[i] = c
+        k0 = (k0 >> 8) ^ crc[(k0 ^ c) & 0xff]
+        k1 = ((k1 + (k0 & 0xff)) * 134775813 + 1) & 0xffffffff
+        k2 = (k2 >> 8) ^ crc[(k2 ^ (k1 >> 24)) & 0xff]
+    return bytes(out)
+
+
+def zipcrypto_encrypt(keys: Tuple[int, int, int], data: bytes) -> bytes:
+    """encrypt data with ZipCrypto starting from the given key state
+
+    Args:
+        keys (Tuple[int, int, int]): Key state returned by zipcrypto_keys
+        data (bytes): Plain data, including the 12-byte header
+    Returns:
+        bytes: The encrypted data
+    """
+    crc = CRC_TABLE
+    k0, k1, k2 = keys
+    out = bytearray(len(data))
+    for i, c in enumerate(data):
+        t = (k2 | 2) & 0xffff
+        out[i] = c ^ (((t * (t ^ 1)) >> 8) & 0xff)
+        k0 = (k0 >> 8) ^ crc[(k0 ^ c) & 0xff]
+        k1 = ((k1 + (k0 & 0xff)) * 134775813 + 1) & 0xffffffff
+        k2 = (k2 >> 8) ^ crc[(k2 ^ (k1 >> 24)) & 0xff]
+    return bytes(out)
+
+
+class ZipEntry:
+    """encrypted entry of a ZIP archive with its cached local data"""
+
+    def __init__(self, info: zipfile.ZipInfo, data_offset: int, check_byte: int,
+                 header: bytes, data: Optional[bytes]):
+        """initialize the cached entry
+
+        Args:
+            info (zipfile.ZipInfo): Central directory record of the entry
+            data_offset (int): Offset of the encrypted data in the archive
+            check_byte (int): Expected last byte of the decrypted header
+            header (bytes): The 12-byte encryption header
+            data (Optional[bytes]): Full encrypted data, or None if too large to cache
+        """
+        self.info = info
+        self.data_offset = data_offset
+        self.check_byte = check_byte
+        self.header = header
+        self.data = data
+
+
+class AesEntry:
+    """WinZip AES encrypted entry of a ZIP archive with its cached local data"""
+
+    def __init__(self, info: zipfile.ZipInfo, data_offset: int, strength: int, salt: bytes,
+                 password_verifier: bytes, auth_code: bytes, data: Optional[bytes]):
+        """initialize the cached entry
+
+        Args:
+            info (zipfile.ZipInfo): Central directory record of the entry
+            data_offset (int): Offset of the encrypted file data in the archive
+            strength (int): AES strength, 1 to 3 for 128 to 256-bit keys
+            salt (bytes): PBKDF2 salt stored before the encrypted data
+            password_verifier (bytes): 2-byte password verification value
+            auth_code (bytes): 10-byte HMAC-SHA1 authentication code of the encrypted data
+            data (Optional[bytes]): Encrypted file data, or None if too large to cache
+        """
+        self.info = info
+        self.data_offset = data_offset
+        self.strength = strength
+        self.salt = salt
+        self.password_verifier = password_verifier
+        self.auth_code = auth_code
+        self.data = data
+        self.key_size = AES_KEY_SIZES[strength]
+        self.data_size = info.compress_size - len(salt) - AES_VERIFIER_SIZE - AES_MAC_SIZE
+
+
+def _aes_strength(info: zipfile.ZipInfo) -> Optional[int]:
+    """return the AES strength from the 0x9901 extra field, if present"""
+    extra = info.extra
+    i = 0
+    while i + 4 <= len(extra):
+        field_id, size = struct.unpack_from('<HH', extra, i)
+        if field_id == _AES_EXTRA_ID and size >= _AES_EXTRA.size:
+            _, vendor, strength, _ = _AES_EXTRA.unpack_from(extra, i + 4)
+            if vendor == b'AE' and strength in AES_SALT_SIZES:
+                return strength
+            return None
+        i += 4 + size
+    return None
+
+
+class ZipVerifier:
+    """in-memory password verifier for ZipCrypto and WinZip AES encrypted archives
+
+    The archive is parsed once and the encryption header of every encrypted
+    entry is cached. For ZipCrypto a candidate is rejected as soon as the
+    check byte of one header does not match, so a wrong password survives
+    with a probability of 1/256 per entry. Survivors are confirmed by
+    decrypting and decompressing the smallest entry in memory and comparing
+    its CRC-32.
+
+    AES entries (AE-1 and AE-2) are only used when the archive has no
+    ZipCrypto entry. The keys are derived with PBKDF2-HMAC-SHA1, the 2-byte
+    password verifier rejects all but 1/65536 wrong candidates and survivors
+    are confirmed with the HMAC-SHA1 authentication code, so the data is
+    never decrypted.
+    """
+
+    def __init__(self, zip_file: str):
+        """parse the archive and cache the encryption headers
+
+        Args:
+            zip_file (str): Path to the zip file
+        Raises:
+            ValueError: If the archive has no entries this verifier can check
+        """
+        self.zip_file = zip_file
+        self.entries, aes_entries = self._load_entries()
+        self.aes_entry: Optional[AesEntry] = None
+        if self.entries:
+            self.method = 'zipcrypto'
+        elif aes_entries:
+            # key derivation dominates, so one entry is enough
+            self.method = 'aes'
+            self.aes_entry = min(aes_entries, key=lambda e: e.data_size)
+            return
+        else:
+            raise ValueError(f"No ZipCrypto or AES encrypted entries in {zip_file}")
+
+        # the cheapest entry to confirm a surviving candidate with
+        candidates = [e for e in self.entries if e.info.compress_type in _SUPPORTED_METHODS]
+        if not candidates:
+            raise ValueError(f"Unsupported compression method in {zip_file}")
+        self.confirm_entry = min(candidates, key=lambda e: e.info.compress_size)
+
+        self._headers = [(e.header, e.check_byte) for e in self.entries]
+
+    def _load_entries(self) -> Tuple[List[ZipEntry], List[AesEntry]]:
+        """read the local header and encrypted data of every encrypted entry"""
+        entries = []
+        aes_entries = []
+        with zipfile.ZipFile(self.zip_file) as zf, open(self.zip_file, 'rb') as f:
+            for info in zf.infolist():
+                if not info.flag_bits & _FLAG_ENCRYPTED:
+                    continue
+                if info.flag_bits & _FLAG_STRONG_ENCRYPTION:
+                    raise ValueError(f"Unsupported strong encryption for entry: {info.filename}")
+                if info.compress_size < ZIPCRYPTO_HEADER_SIZE:
+                    continue
+
+                f.seek(info.header_offset)
+                fields = _LOCAL_HEADER.unpack(f.read(_LOCAL_HEADER.size))
+                if fields[0] != _LOCAL_HEADER_SIGNATURE:
+                    raise zipfile.BadZipFile(f"Bad local header for entry: {info.filename}")
+                data_offset = info.header_offset + _LOCAL_HEADER.size + fields[9] + fields[10]
+
+                if info.compress_type == _AES_METHOD:
+                    entry = self._load_aes_entry(f, info, data_offset)
+                    if entry is not None:
+                        aes_entries.append(entry)
+                    continue
+
+                # the check byte is the high byte of the CRC, or of the
+                # modification time when the CRC follows in a data descriptor
+                if info.flag_bits & _FLAG_DATA_DESCRIPTOR:
+                    check_byte = (fields[4] >> 8) & 0xff
+                else:
+                    check_byte = (info.CRC >> 24) & 0xff
+
+                f.seek(data_offset)
+                if info.compress_size <= MAX_CACHED_ENTRY_SIZE:
+                    data = f.read(info.compress_size)
+                    header = data[:ZIPCRYPTO_HEADER_SIZE]
+                else:
+                    data = None
+                    header = f.read(ZIPCRYPTO_HEADER_SIZE)
+                entries.append(ZipEntry(info, data_offset, check_byte, header, data))
+        return entries, aes_entries
+
+    @staticmethod
+    def _load_aes_entry(f, info: zipfile.ZipInfo, data_offset: int) -> Optional[AesEntry]:
+        """read the salt, password verifier and authentication code of an AES entry"""
+        strength = _aes_strength(info)
+        if strength is None:
+            raise ValueError(f"Unsupported AES extra field for entry: {info.filename}")
+        salt_size = AES_SALT_SIZES[strength]
+        data_size = info.compress_size - salt_size - AES_VERIFIER_SIZE - AES_MAC_SIZE
+        if data_size < 0:
+            return None
+
+        f.seek(data_offset)
+        salt = f.read(salt_size)
+        password_verifier = f.read(AES_VERIFIER_SIZE)
+        data = f.read(data_size) if data_size <= MAX_CACHED_ENTRY_SIZE else None
+        f.seek(data_offset + salt_size + AES_VERIFIER_SIZE + data_size)
+        auth_code = f.read(AES_MAC_SIZE)
+        return AesEntry(info, data_offset + salt_size + AES_VERIFIER_SIZE, strength, salt,
+                        password_verifier, auth_code, data)
+
+    def _read_entry_data(self, entry: ZipEntry) -> bytes:
+        """return the encrypted data of an entry, reading it if it is not cached"""
+        if entry.data is not None:
+            return entry.data
+        with open(self.zip_file, 'rb') as f:
+            f.seek(entry.data_offset)
+            return f.read(entry.info.compress_size)
+
+    def confirm_aes(self, mac_key: bytes) -> bool:
+        """verify the HMAC-SHA1 authentication code of the AES entry
+
+        Args:
+            mac_key (bytes): Authentication key derived from the candidate password
+        Returns:
+            bool: True if the authentication code matches
+        """
+        entry = self.aes_entry
+        mac = hmac.new(mac_key, digestmod=hashlib.sha1)
+        if entry.data is not None:
+            mac.update(entry.data)
+        else:
+            with open(self.zip_file, 'rb') as f:
+                f.seek(entry.data_offset)
+                remaining = entry.data_size
+                while remaining > 0:
+                    chunk = f.read(min(remaining, 1 << 20))
+                    if not chunk:
+                        return False
+                    mac.update(chunk)
+                    remaining -= len(chunk)
+        return hmac.compare_digest(mac.digest()[:AES_MAC_SIZE], entry.auth_code)
+
+    def confirm(self, keys: Tuple[int, int, int]) -> bool:
+        """decrypt the smallest entry in memory and verify its CRC-32
+
+        Args:
+            keys (Tuple[int, int, int]): Key state of the candidate password
+        Returns:
+            bool: True if the entry decrypts to data with the expected CRC-32
+        """
+        entry = self.confirm_entry
+        info = entry.info
+        plain = zipcrypto_decrypt(keys, self._read_entry_data(entry))[ZIPCRYPTO_HEADER_SIZE:]
+        try:
+            if info.compress_type == zipfile.ZIP_DEFLATED:
+                plain = zlib.decompressobj(-15).decompress(plain, info.file_size + 1)
+            elif info.compress_type == zipfile.ZIP_BZIP2:
+                plain = bz2.BZ2Decompressor().decompress(plain, info.file_size + 1)
+        except (zlib.error, OSError, EOFError, ValueError):
+            return False
+        return len(plain) == info.file_size and zlib.crc32(plain) == info.CRC
+
+    def check(self, password: bytes) -> bool:
+        """check a single password against the archive
+
+        Args:
+            password (bytes): Password to try
+        Returns:
+            bool: True if password is correct, False otherwise
+        """
+        return self.find((password,)) is not None
+
+    def check_keys(self, keys: Tuple[int, int, int]) -> bool:
+        """check the key state of a candidate against every ZipCrypto header
+
+        Args:
+            keys (Tuple[int, int, int]): Key state of the candidate password
+        Returns:
+            bool: True if every check byte matches and the entry is confirmed
+        """
+        crc = CRC_TABLE
+        for header, check_byte in self._headers:
+            h0, h1, h2 = keys
+            for c in header:
+                t = (h2 | 2) & 0xffff
+                c ^= ((t * (t ^ 1)) >> 8) & 0xff
+                h0 = (h0 >> 8) ^ crc[(h0 ^ c) & 0xff]
+                h1 = ((h1 + (h0 & 0xff)) * 134775813 + 1) & 0xffffffff
+                h2 = (h2 >> 8) ^ crc[(h2 ^ (h1 >> 24)) & 0xff]
+            if c != check_byte:
+                return False
+        return self.confirm(keys)
+
+    def find(self, candidates: Iterable[bytes]) -> Optional[bytes]:
+        """check candidates in order and return the first correct one
+
+        Args:
+            candidates (Iterable[bytes]): Passwords to try
+        Returns:
+            Optional[bytes]: The correct password, or None if none matched
+        """
+        if self.aes_entry is not None:
+            return self._find_aes(candidates)
+        crc = CRC_TABLE
+        headers = self._headers
+        for password in candidates:
+            k0, k1, k2 = 0x12345678, 0x23456789, 0x34567890
+            for c in password:
+                k0 = (k0 >> 8) ^ crc[(k0 ^ c) & 0xff]
+                k1 = ((k1 + (k0 & 0xff)) * 134775813 + 1) & 0xffffffff
+                k2 = (k2 >> 8) ^ crc[(k2 ^ (k1 >> 24)) & 0xff]
+
+            for header, check_byte in headers:
+                h0, h1, h2 = k0, k1, k2
+                for c in header:
+                    t = (h2 | 2) & 0xffff
+                    c ^= ((t * (t ^ 1)) >> 8) & 0xff
+                    h0 = (h0 >> 8) ^ crc[(h0 ^ c) & 0xff]
+                    h1 = ((h1 + (h0 & 0xff)) * 134775813 + 1) & 0xffffffff
+                    h2 = (h2 >> 8) ^ crc[(h2 ^ (h1 >> 24)) & 0xff]
+                if c != check_byte:
+                    break
+            else:
+                if self.confirm((k0, k1, k2)):
+                    return password
+        return None
+
+    def _find_aes(self, candidates: Iterable[bytes]) -> Optional[bytes]:
+        """check candidates against the AES entry and return the first correct one"""
+        entry = self.aes_entry
+        salt = entry.salt
+        key_size = entry.key_size
+        key_length = 2 * key_size + AES_VERIFIER_SIZE
+        password_verifier = entry.password_verifier
+        pbkdf2_hmac = hashlib.pbkdf2_hmac
+        for password in candidates:
+            # the key material ends with the password verification value
+            key = pbkdf2_hmac('sha1', password, salt, AES_ITERATIONS, key_length)
+            if key[-AES_VERIFIER_SIZE:] != password_verifier:
+                continue
+            if self.confirm_aes(key[key_size:2 * key_size]):
+                return password
+        return None
+
+
+class ArchiveSet:
+    """verifiers of several archives checked against one candidate stream
+
+    Each candidate is key-derived once per batch and tested against every
+    pending archive: the ZipCrypto key state only depends on the password,
+    so it is shared by all ZipCrypto archives. PBKDF2 also depends on the
+    salt, so AES archives only share a derivation when they have the same
+    salt and key size, which is rare since WinZip picks a random salt per
+    entry.
+    """
+
+    def __init__(self, zip_files: Sequence[str]):
+        """parse every archive and cache its encryption headers
+
+        Args:
+            zip_files (Sequence[str]): Paths to the zip files
+        Raises:
+            ValueError: If an archive has no entries a verifier can check
+        """
+        self.zip_files = list(zip_files)
+        self.verifiers = [ZipVerifier(zip_file) for zip_file in self.zip_files]
+
+    def __len__(self) -> int:
+        return len(self.verifiers)
+
+    @property
+    def has_aes(self) -> bool:
+        """whether any archive needs AES key derivation"""
+        return any(verifier.method == 'aes' for verifier in self.verifiers)
+
+    def find_all(self, candidates: Sequence[bytes], pending: Sequence[int]) -> List[Tuple[int, bytes]]:
+        """check candidates against the pending archives
+
+        Args:
+            candidates (Sequence[bytes]): Passwords to try
+            pending (Sequence[int]): Indexes of the archives not cracked yet
+        Returns:
+            List[Tuple[int, bytes]]: (archive index, password) of every archive cracked by the candidates
+        """
+        if len(pending) == 1:
+            index = pending[0]
+            found = self.verifiers[index].find(candidates)
+            return [] if found is None else [(index, found)]
+        zipcrypto = [i for i in pending if self.verifiers[i].method == 'zipcrypto']
+        aes = [i for i in pending if self.verifiers[i].method == 'aes']
+        found = []
+        if zipcrypto:
+            found.extend(self._find_all_zipcrypto(candidates, zipcrypto))
+        if aes:
+            found.extend(self._find_all_aes(candidates, aes))
+        return found
+
+    def _find_all_zipcrypto(self, candidates: Sequence[bytes], pending: List[int]) -> List[Tuple[int, bytes]]:
+        """derive the ZipCrypto keys of each candidate once for all pending archives"""
+        crc = CRC_TABLE
+        verifiers = [(i, self.verifiers[i]) for i in pending]
+        found = []
+        for password in candidates:
+            k0, k1, k2 = 0x12345678, 0x23456789, 0x34567890
+            for c in password:
+                k0 = (k0 >> 8) ^ crc[(k0 ^ c) & 0xff]
+                k1 = ((k1 + (k0 & 0xff)) * 134775813 + 1) & 0xffffffff
+                k2 = (k2 >> 8) ^ crc[(k2 ^ (k1 >> 24)) & 0xff]
+            keys = (k0, k1, k2)
+            cracked = [i for i, verifier in verifiers if verifier.check_keys(keys)]
+            if cracked:
+                found.extend((i, password) for i in cracked)
+                verifiers = [(i, verifier) for i, verifier in verifiers if i not in cracked]
+                if not verifiers:
+                    break
+        return found
+
+    def _find_all_aes(self, candidates: Sequence[bytes], pending: List[int]) -> List[Tuple[int, bytes]]:
+        """derive the AES keys of each candidate once per distinct salt"""
+        groups: Dict[Tuple[bytes, int], List[int]] = {}
+        for i in pending:
+            entry = self.verifiers[i].aes_entry
+            groups.setdefault((entry.salt, entry.key_size), []).append(i)
+        pbkdf2_hmac = hashlib.pbkdf2_hmac
+        found = []
+        for password in candidates:
+            for (salt, key_size), indexes in list(groups.items()):
+                key = pbkdf2_hmac('sha1', password, salt, AES_ITERATIONS, 2 * key_size + AES_VERIFIER_SIZE)
+                for i in list(indexes):
+                    verifier = self.verifiers[i]
+                    if key[-AES_VERIFIER_SIZE:] != verifier.aes_entry.password_verifier:
+                        continue
+                    if verifier.confirm_aes(key[key_size:2 * key_size]):
+                        found.append((i, password))
+                        indexes.remove(i)
+                if not indexes:
+                    del groups[(salt, key_size)]
+            if not groups:
+                break
+        return found
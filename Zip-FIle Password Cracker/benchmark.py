@@ -0,0 +1,336 @@
+import argparse
+import hashlib
+import hmac
+import json
+import logging
+import os
+import platform
+import random
+import struct
+import subprocess
+import sys
+import time
+import zlib
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
+
+from PasswordGenerator import DEFAULT_RULES
+from ZipVerifier import (AES_ITERATIONS, AES_KEY_SIZES, AES_MAC_SIZE, AES_SALT_SIZES,
+                         zipcrypto_encrypt, zipcrypto_keys)
+
+RESULTS_VERSION = 1
+
+# password of every generated archive; the generated words are lowercase hex,
+# so exhausting runs never find it
+PASSWORD = b'Bench-Password!1'
+
+# name: (method, AES strength, number of entries, entry size)
+ARCHIVES: Dict[str, Tuple[str, Optional[int], int, int]] = {
+    'zipcrypto-1x1k': ('zipcrypto', None, 1, 1024),
+    'zipcrypto-16x64k': ('zipcrypto', None, 16, 64 * 1024),
+    'zipcrypto-1x8m': ('zipcrypto', None, 1, 8 * 1024 * 1024),
+    'aes128-1x1k': ('aes', 1, 1, 1024),
+    'aes256-1x1m': ('aes', 3, 1, 1024 * 1024),
+}
+
+_LOCAL_HEADER = struct.Struct('<4sHHHHHIIIHH')
+_CENTRAL_HEADER = struct.Struct('<4sHHHHHHIIIHHHHHII')
+_END_OF_CENTRAL_DIR = struct.Struct('<4sHHHHIIH')
+_DOS_TIME, _DOS_DATE = 0, (2020 - 1980) << 9 | 1 << 5 | 1
+
+
+def _entry_content(rng: random.Random, size: int) -> bytes:
+    """deterministic, moderately compressible entry data"""
+    return rng.randbytes((size + 1) // 2).hex().encode()[:size]
+
+
+def _zipcrypto_entry(rng: random.Random, plain: bytes) -> Tuple[int, int, bytes, bytes]:
+    """return the CRC, method, extra field and encrypted data of a ZipCrypto entry"""
+    crc = zlib.crc32(plain)
+    compressor = zlib.compressobj(6, zlib.DEFLATED, -15)
+    compressed = compressor.compress(plain) + compressor.flush()
+    header = rng.randbytes(11) + bytes(((crc >> 24) & 0xff,))
+    return crc, 8, b'', zipcrypto_encrypt(zipcrypto_keys(PASSWORD), header + compressed)
+
+
+def _aes_entry(rng: random.Random, plain: bytes, strength: int) -> Tuple[int, int, bytes, bytes]:
+    """return the CRC, method, extra field and data of an AE-2 entry
+
+    No AES implementation ships with Python, so the ciphertext is random
+    bytes of the compressed size. Salt, password verifier and authentication
+    code are derived exactly as WinZip does, which is all the cracker reads;
+    other tools will fail to extract the entry.
+    """
+    compressed_size = len(zlib.compress(plain)) - 6
+    salt = rng.randbytes(AES_SALT_SIZES[strength])
+    key_size = AES_KEY_SIZES[strength]
+    key = hashlib.pbkdf2_hmac('sha1', PASSWORD, salt, AES_ITERATIONS, 2 * key_size + 2)
+    ciphertext = rng.randbytes(compressed_size)
+    auth_code = hmac.new(key[key_size:2 * key_size], ciphertext, hashlib.sha1).digest()[:AES_MAC_SIZE]
+    extra = struct.pack('<HHH2sBH', 0x9901, 7, 2, b'AE', strength, 8)
+    return 0, 99, extra, salt + key[-2:] + ciphertext + auth_code
+
+
+def write_archive(path: Path, method: str, strength: Optional[int], entries: int, size: int,
+                  seed: int = 0) -> None:
+    """write an encrypted archive of deflated entries, all sharing PASSWORD
+
+    Args:
+        path (Path): Path of the archive to write
+        method (str): 'zipcrypto' or 'aes'
+        strength (Optional[int]): AES strength, 1 to 3 for 128 to 256-bit keys
+        entries (int): Number of entries
+        size (int): Uncompressed size of every entry
+        seed (int, optional): Seed of the generated content.
+    """
+    rng = random.Random(seed)
+    central = []
+    with open(path, 'wb') as f:
+        for i in range(entries):
+            name = f'file{i:04d}.txt'.encode()
+            plain = _entry_content(rng, size)
+            if method == 'aes':
+                crc, compress_type, extra, data = _aes_entry(rng, plain, strength)
+            else:
+                crc, compress_type, extra, data = _zipcrypto_entry(rng, plain)
+            offset = f.tell()
+            f.write(_LOCAL_HEADER.pack(b'PK\x03\x04', 51 if extra else 20, 0x1, compress_type,
+                                       _DOS_TIME, _DOS_DATE, crc, len(data), len(plain),
+                                       len(name), len(extra)))
+            f.write(name + extra + data)
+            central.append(_CENTRAL_HEADER.pack(b'PK\x01\x02', 51 if extra else 20, 51 if extra else 20,
+                                                0x1, compress_type, _DOS_TIME, _DOS_DATE, crc, len(data),
+                                                len(plain), len(name), len(extra), 0, 0, 0, 0, offset)
+                           + name + extra)
+        directory_offset = f.tell()
+        directory = b''.join(central)
+        f.write(directory)
+        f.write(_END_OF_CENTRAL_DIR.pack(b'PK\x05\x06', 0, 0, entries, entries,
+                                         len(directory), directory_offset, 0))
+
+
+def write_wordlist(path: Path, words: int, seed: int = 0) -> None:
+    """write a wordlist of 8-character lowercase hex words
+
+    Args:
+        path (Path): Path of the wordlist to write
+        words (int): Number of words
+        seed (int, optional): Seed of the generated words.
+    """
+    rng = random.Random(seed)
+    with open(path, 'wb') as f:
+        remaining = words
+        while remaining > 0:
+            count = min(remaining, 100000)
+            data = rng.randbytes(4 * count).hex().encode()
+            f.write(b'\n'.join(data[i:i + 8] for i in range(0, len(data), 8)) + b'\n')
+            remaining -= count
+
+
+def prepare(workdir: Path, archives: Sequence[str], word_counts: Sequence[int]) -> None:
+    """generate the missing archives and wordlists, existing files are reused"""
+    workdir.mkdir(parents=True, exist_ok=True)
+    for name in archives:
+        path = workdir / f'{name}.zip'
+        if not path.exists():
+            print(f"Generating {path}", file=sys.stderr)
+            write_archive(path, *ARCHIVES[name])
+    for words in word_counts:
+        path = workdir / f'words-{words}.txt'
+        if not path.exists():
+            print(f"Generating {path}", file=sys.stderr)
+            write_wordlist(path, words)
+    first = workdir / 'first.txt'
+    if not first.exists():
+        first.write_bytes(PASSWORD + b'\n')
+
+
+def run_one(spec: dict) -> dict:
+    """crack one archive in this process and return the timings and peak memory
+
+    Args:
+        spec (dict): archive, wordlist, backend, workers and rules of the run
+    Returns:
+        dict: Duration of the run inside this process, the candidates checked, the passwords found and the peak RSS
+    """
+    from PasswordCracker import PasswordCracker
+
+    logging.disable(logging.INFO)
+    rules = spec.get('rules')
+    start = time.perf_counter()
+    # with rules the candidates checked are counted by the final metrics sample
+    cracker = PasswordCracker(spec['archive'], spec['wordlist'], spec['workers'], spec['backend'], rules=rules,
+                              checkpoint_interval=3600, status_interval=0,
+                              stats_file=os.devnull if rules else None)
+    results = cracker.crack_all()
+    result = {
+        'crack_s': time.perf_counter() - start,
+        'candidates': cracker.metrics.sample_data['checked'] if rules else None,
+        'found': results[spec['archive']] is not None,
+        'peak_rss_kb': None,
+        'peak_worker_rss_kb': None,
+    }
+    if resource is not None:
+        # ru_maxrss is the largest single process, in KiB on Linux
+        result['peak_rss_kb'] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        result['peak_worker_rss_kb'] = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss or None
+    return result
+
+
+def spawn(spec: dict) -> Tuple[float, dict]:
+    """run one spec in a fresh interpreter
+
+    Returns:
+        Tuple[float, dict]: Wall time including interpreter start and the result of run_one
+    """
+    start = time.perf_counter()
+    output = subprocess.run([sys.executable, __file__, '--run-one', json.dumps(spec)],
+                            check=True, capture_output=True, text=True,
+                            cwd=os.path.dirname(os.path.abspath(__file__))).stdout
+    return time.perf_counter() - start, json.loads(output.splitlines()[-1])
+
+
+def benchmark(workdir: Path, archives: Sequence[str], word_counts: Sequence[int], aes_words: int,
+              backends: Sequence[str], workers: Sequence[int], repeat: int = 1,
+              rules: Optional[Sequence[str]] = None) -> List[dict]:
+    """run every combination and return one result per run
+
+    Startup latency is the wall time of a run whose password is the first
+    candidate, from process launch to exit. Throughput comes from runs that
+    exhaust a wordlist without finding the password, timed inside the
+    process so interpreter start is not counted. With rules, throughput
+    counts the candidates checked after deduplication, and the cost of
+    generating and deduplicating them is part of the run.
+    """
+    results = []
+    for name in archives:
+        method, strength, entries, size = ARCHIVES[name]
+        archive = str((workdir / f'{name}.zip').resolve())
+        counts = sorted({min(words, aes_words) for words in word_counts}) if method == 'aes' else word_counts
+        for backend in backends:
+            for worker_count in workers:
+                base = {'archive': archive, 'backend': backend, 'workers': worker_count, 'rules': rules}
+                startup = [spawn(dict(base, wordlist=str((workdir / 'first.txt').resolve())))
+                           for _ in range(repeat)]
+                if not all(run['found'] for _, run in startup):
+                    raise RuntimeError(f"Password of {archive} not found by the {backend} backend")
+                for words in counts:
+                    wordlist = str((workdir / f'words-{words}.txt').resolve())
+                    runs = [spawn(dict(base, wordlist=wordlist))[1] for _ in range(repeat)]
+                    crack_s = min(run['crack_s'] for run in runs)
+                    candidates = runs[0]['candidates'] or words
+                    result = {
+                        'archive': name,
+                        'method': method,
+                        'aes_strength': strength,
+                        'entries': entries,
+                        'entry_size': size,
+                        'words': words,
+                        'backend': backend,
+                        'workers': worker_count,
+                        'rules': ','.join(rules) if rules else None,
+                        'candidates': candidates,
+                        'startup_s': min(wall for wall, _ in startup),
+                        'crack_s': crack_s,
+                        'guesses_per_s': candidates / crack_s,
+                        'peak_rss_kb': max((run['peak_rss_kb'] or 0) for run in runs) or None,
+                        'peak_worker_rss_kb': max((run['peak_worker_rss_kb'] or 0) for run in runs) or None,
+                    }
+                    results.append(result)
+                    print(f"{name:18} {backend:7} x{worker_count:<3} {words:>9,} words  "
+                          f"{result['guesses_per_s']:>12,.0f} guesses/s  startup {result['startup_s']:.3f}s  "
+                          f"rss {result['peak_rss_kb']} KiB", file=sys.stderr)
+    return results
+
+
+def result_key(result: dict) -> Tuple:
+    # results files written before rules were benchmarked have no rules entry
+    return result['archive'], result['words'], result['backend'], result['workers'], result.get('rules')
+
+
+def compare(results: List[dict], baseline_file: str, threshold: float) -> int:
+    """print the throughput change against a baseline results file
+
+    Returns:
+        int: Number of runs whose throughput dropped by more than threshold
+    """
+    with open(baseline_file, 'r', encoding='utf-8') as f:
+        baseline = {result_key(r): r for r in json.load(f)['results']}
+    regressions = 0
+    for result in results:
+        old = baseline.get(result_key(result))
+        if old is None:
+            continue
+        change = result['guesses_per_s'] / old['guesses_per_s'] - 1
+        regressed = change < -threshold
+        regressions += regressed
+        print(f"{' '.join(map(str, result_key(result)))}: {change:+.1%}{'  REGRESSION' if regressed else ''}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the ZIP password cracker on synthetic archives')
+    parser.add_argument('--workdir', default='bench-data',
+                        help='Directory the generated archives and wordlists are cached in (default: bench-data)')
+    parser.add_argument('--output', help='Results JSON file (default: benchmark-<timestamp>.json)')
+    parser.add_argument('--archives', default=','.join(ARCHIVES),
+                        help=f'Comma-separated archives to benchmark (default: {",".join(ARCHIVES)})')
+    parser.add_argument('--words', default='10000,100000,1000000',
+                        help='Comma-separated wordlist sizes, up to 10000000 (default: 10000,100000,1000000)')
+    parser.add_argument('--aes-words', type=int, default=2000,
+                        help='Largest wordlist used for AES archives, whose key derivation is slow (default: 2000)')
+    parser.add_argument('--backends', default='thread,process', help='Comma-separated backends (default: both)')
+    parser.add_argument('--workers', default=f'1,{os.cpu_count() or 1}',
+                        help='Comma-separated worker counts (default: 1 and the CPU count)')
+    parser.add_argument('--rules', nargs='?', const=','.join(DEFAULT_RULES),
+                        help='Comma-separated rules applied to every word, all of them if no value is given '
+                             '(default: none)')
+    parser.add_argument('--repeat', type=int, default=1, help='Runs per combination, the fastest is kept (default: 1)')
+    parser.add_argument('--compare', metavar='BASELINE', help='Compare the throughput with a previous results file')
+    parser.add_argument('--threshold', type=float, default=0.1,
+                        help='Throughput drop reported as a regression (default: 0.1)')
+    parser.add_argument('--run-one', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run_one:
+        print(json.dumps(run_one(json.loads(args.run_one))))
+        return
+
+    archives = [name for name in args.archives.split(',') if name]
+    unknown = [name for name in archives if name not in ARCHIVES]
+    if unknown:
+        parser.error(f"unknown archives: {', '.join(unknown)}")
+    word_counts = sorted({int(words) for words in args.words.split(',')})
+    if any(method == 'aes' for method, *_ in map(ARCHIVES.get, archives)):
+        aes_counts = {min(words, args.aes_words) for words in word_counts}
+    else:
+        aes_counts = set()
+    workdir = Path(args.workdir)
+    prepare(workdir, archives, sorted(set(word_counts) | aes_counts))
+
+    results = benchmark(workdir, archives, word_counts, args.aes_words, args.backends.split(','),
+                        [int(n) for n in args.workers.split(',')], args.repeat,
+                        args.rules.split(',') if args.rules else None)
+    output = args.output or time.strftime('benchmark-%Y%m%d-%H%M%S.json')
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump({
+            'version': RESULTS_VERSION,
+            'created': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'results': results,
+        }, f, indent=2)
+    print(f"Results written to {output}", file=sys.stderr)
+
+    if args.compare and compare(results, args.compare, args.threshold):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
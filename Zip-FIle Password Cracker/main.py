@@ -1,22 +1,81 @@
 import argparse
+from pathlib import Path
 
+from CrackMetrics import format_duration
 from PasswordCracker import PasswordCracker
+from PasswordGenerator import DEFAULT_RULES
 
 
 def main():
     parser = argparse.ArgumentParser(description='ZIP File Password cracker')
-    parser.add_argument('zip_file',help='Path to the ZIP file')
-    parser.add_argument('wordlist', help='Path to the wordlist file')
-    parser.add_argument('--threads', type=int, default=4, help='Number of threads (default: 4)')
+    parser.add_argument('zip_file',nargs='?',help='Path to the ZIP file, or a directory of ZIP files to crack as a batch')
+    parser.add_argument('wordlist',nargs='?',help='Path to the wordlist file')
+    parser.add_argument('--archive', action='append', default=[],
+                        help='Additional ZIP file cracked with the same candidates (repeatable)')
+    parser.add_argument('--workers', '--threads', dest='workers', type=int, default=4,
+                        help='Number of worker threads or processes (default: 4)')
+    parser.add_argument('--backend', choices=['thread', 'process'], default='thread',
+                        help='Run workers as threads or as processes (default: thread)')
+    parser.add_argument('--rules', nargs='?', const=','.join(DEFAULT_RULES),
+                        help='Comma-separated rules applied to every word, e.g. digits,leet,case+digits '
+                             '(default set when given without a value)')
+    parser.add_argument('--mask', help='Search a mask such as ?u?l?l?l?d?d instead of a wordlist')
+    for i in range(1, 5):
+        parser.add_argument(f'-{i}', f'--custom-charset{i}', dest=f'charset{i}',
+                            help=f'Custom charset referenced by ?{i} in the mask')
+    parser.add_argument('--keyspace', action='store_true',
+                        help='Print the keyspace size and estimated duration, then exit')
+    parser.add_argument('--session', help='Session file the progress is checkpointed to')
+    parser.add_argument('--restore', metavar='SESSION', help='Continue the run recorded in a session file')
+    parser.add_argument('--checkpoint-interval', type=float, default=30.0,
+                        help='Seconds between two session file writes (default: 30)')
+    parser.add_argument('--status-interval', type=float, default=1.0,
+                        help='Seconds between two progress lines, 0 to disable them (default: 1)')
+    parser.add_argument('--stats-json', help='Append progress samples to this file as JSON lines')
     args = parser.parse_args()
+    if not args.restore and (not args.zip_file or not (args.wordlist or args.mask)):
+        parser.error('zip_file and a wordlist or --mask are required unless --restore is given')
+    if args.wordlist and args.mask:
+        parser.error('a wordlist and --mask cannot be combined')
+    charsets = [args.charset1, args.charset2, args.charset3, args.charset4]
+    while charsets and charsets[-1] is None:
+        charsets.pop()
+    zip_files = []
+    if args.zip_file and Path(args.zip_file).is_dir():
+        zip_files = sorted(str(path) for path in Path(args.zip_file).glob('*.zip'))
+        if not zip_files:
+            parser.error(f'no ZIP files in {args.zip_file}')
+    elif args.zip_file:
+        zip_files = [args.zip_file]
+    zip_files += args.archive
     
     try:
-        cracker = PasswordCracker(args.zip_file,args.wordlist,args.threads)
-        password = cracker.crack()
-        if password:
-            print(f"Password found: {password}")
+        if args.restore:
+            cracker = PasswordCracker.restore(args.restore,args.checkpoint_interval,
+                                              args.status_interval,args.stats_json)
         else:
-            print("Password not found")
+            cracker = PasswordCracker(zip_files,args.wordlist,args.workers,args.backend,
+                                      rules=args.rules.split(',') if args.rules else None,
+                                      session_file=args.session,
+                                      checkpoint_interval=args.checkpoint_interval,
+                                      mask=args.mask,
+                                      custom_charsets=charsets,
+                                      status_interval=args.status_interval,
+                                      stats_file=args.stats_json)
+        if args.keyspace:
+            remaining, rate, seconds = cracker.estimate()
+            print(f"Keyspace: {remaining} candidates")
+            print(f"Speed: {rate:.0f} guesses/s, estimated duration: {format_duration(seconds)}")
+            return
+        results = cracker.crack_all()
+        if len(results) == 1:
+            password = results[cracker.zip_file]
+            print(f"Password found: {password}" if password else "Password not found")
+        else:
+            for zip_file, password in results.items():
+                print(f"{zip_file}: {password}" if password else f"{zip_file}: password not found")
+    except KeyboardInterrupt:
+        print("\nCracking interrupted by user")
     except Exception as e:
         print(f"An error occurred: {e}")
         